@@ -0,0 +1,135 @@
+import logging
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class _TenantAnswers:
+    """Cached answers of one business, in LRU order."""
+
+    def __init__(self):
+        # entry id -> (normalized question vector, answer, knowledge version, stored at)
+        self.entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self.next_id = 0
+        self._matrix: Optional[np.ndarray] = None
+        self._ids: List[int] = []
+
+    def matrix(self):
+        # Rebuilt lazily after inserts/evictions; lookups far outnumber writes
+        if self._matrix is None and self.entries:
+            self._ids = list(self.entries.keys())
+            self._matrix = np.stack([self.entries[i][0] for i in self._ids])
+        return self._matrix, self._ids
+
+    def changed(self):
+        self._matrix = None
+
+
+class SemanticAnswerCache:
+    """
+    Opt-in, per-business cache of chat answers keyed by question embedding.
+
+    A question whose embedding has cosine similarity >= ANSWER_CACHE_THRESHOLD
+    with a cached question gets the cached answer, provided the business'
+    knowledge version is unchanged since the answer was stored and the entry
+    is younger than ANSWER_CACHE_TTL_SECONDS. Each business holds at most
+    ANSWER_CACHE_MAX_ENTRIES answers, evicted least-recently-used first.
+
+    Entries live in process memory; ingests in other workers are caught by
+    the knowledge-version check on lookup.
+    """
+
+    def __init__(self):
+        self._tenants: Dict[str, _TenantAnswers] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def enabled_for(self, business_id: str) -> bool:
+        allowed = {b.strip() for b in settings.ANSWER_CACHE_BUSINESSES.split(",") if b.strip()}
+        return "*" in allowed or business_id in allowed
+
+    def lookup(self, business_id: str, query_vec: List[float], version: int) -> Optional[str]:
+        """
+        Return a cached answer for a close-enough question, or None.
+        """
+        query = _normalize(query_vec)
+        if query is None:
+            return None
+
+        with self._lock:
+            tenant = self._tenants.get(business_id)
+            matrix, ids = tenant.matrix() if tenant else (None, [])
+            if matrix is None or matrix.shape[1] != query.shape[0]:
+                self.misses += 1
+                return None
+
+            similarities = matrix @ query
+            best = int(np.argmax(similarities))
+            entry_id = ids[best]
+            _, answer, entry_version, stored_at = tenant.entries[entry_id]
+
+            if entry_version != version:
+                # The knowledge base changed since these answers were cached
+                del self._tenants[business_id]
+                self.invalidations += 1
+                self.misses += 1
+                return None
+
+            if time.time() - stored_at > settings.ANSWER_CACHE_TTL_SECONDS:
+                del tenant.entries[entry_id]
+                tenant.changed()
+                self.misses += 1
+                return None
+
+            if similarities[best] < settings.ANSWER_CACHE_THRESHOLD:
+                self.misses += 1
+                return None
+
+            tenant.entries.move_to_end(entry_id)
+            self.hits += 1
+            return answer
+
+    def store(self, business_id: str, query_vec: List[float], answer: str, version: int):
+        query = _normalize(query_vec)
+        if query is None or not answer:
+            return
+
+        with self._lock:
+            tenant = self._tenants.setdefault(business_id, _TenantAnswers())
+            tenant.entries[tenant.next_id] = (query, answer, version, time.time())
+            tenant.next_id += 1
+            while len(tenant.entries) > settings.ANSWER_CACHE_MAX_ENTRIES:
+                tenant.entries.popitem(last=False)
+            tenant.changed()
+
+    def invalidate(self, business_id: str):
+        """Drop every cached answer of a business (e.g. after an ingest)."""
+        with self._lock:
+            if self._tenants.pop(business_id, None) is not None:
+                self.invalidations += 1
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "entries": sum(len(t.entries) for t in self._tenants.values())
+        }
+
+
+def _normalize(vector: List[float]) -> Optional[np.ndarray]:
+    if not vector:
+        return None
+    query = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(query)
+    return None if norm == 0 else query / norm
+
+answer_cache = SemanticAnswerCache()
@@ -0,0 +1,81 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Dict, List, NamedTuple, Optional
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.memory import AsyncMemoryManager
+from app.rag import rag_manager
+from app.store_residency import store_residency
+from app.answer_cache import answer_cache
+from app.llm.openai import FALLBACK_MESSAGES
+
+logger = logging.getLogger(__name__)
+
+class StageTimeout(Exception):
+    """Raised when a required chat stage exceeds its latency budget."""
+    def __init__(self, stage: str, timeout: float):
+        super().__init__(f"Stage '{stage}' exceeded its {timeout}s budget")
+        self.stage = stage
+        self.timeout = timeout
+
+_REQUIRED = object()
+
+async def run_stage(name: str, awaitable: Awaitable, timeout: float, fallback: Any = _REQUIRED) -> Any:
+    """
+    Await one pipeline stage under an optional budget (timeout <= 0 disables it).
+    On timeout an optional stage returns `fallback`; a stage without a
+    fallback raises StageTimeout.
+    """
+    if not timeout or timeout <= 0:
+        return await awaitable
+
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        if fallback is _REQUIRED:
+            raise StageTimeout(name, timeout)
+        logger.warning(f"Chat stage '{name}' exceeded its {timeout}s budget. Continuing without it.")
+        return fallback
+
+class ChatInputs(NamedTuple):
+    history: List[Dict[str, str]]
+    # Scored search results; the LLM prompt builder trims them to budget
+    context_chunks: List[Dict]
+    # Set when the semantic answer cache already has a reply for this question
+    cached_answer: Optional[str] = None
+    query_vec: Optional[List[float]] = None
+    knowledge_version: int = 0
+
+async def gather_inputs(memory: AsyncMemoryManager, business_id: str, message: str) -> ChatInputs:
+    """
+    Fetch chat history and RAG context concurrently, each under its own budget.
+    """
+    history, retrieved = await asyncio.gather(
+        run_stage("history", memory.get_history(), settings.CHAT_HISTORY_TIMEOUT, fallback=[]),
+        run_stage("rag", _retrieve(business_id, message), settings.CHAT_RAG_TIMEOUT, fallback=ChatInputs([], []))
+    )
+    return retrieved._replace(history=history)
+
+async def _retrieve(business_id: str, message: str) -> ChatInputs:
+    if not answer_cache.enabled_for(business_id):
+        return ChatInputs([], await rag_manager.retrieve(business_id, message, settings.RAG_TOP_K))
+
+    # The query is embedded once and shared by the cache lookup and the search;
+    # a store not used for a while is opened meanwhile
+    query_vec, _ = await asyncio.gather(rag_manager.embed_query(message), store_residency.aget(business_id))
+    # Reading the version maps rows other workers committed; keep it off the loop
+    version = await run_in_threadpool(rag_manager.knowledge_version, business_id)
+    cached = answer_cache.lookup(business_id, query_vec, version)
+    if cached is not None:
+        return ChatInputs([], [], cached_answer=cached, query_vec=query_vec, knowledge_version=version)
+
+    chunks = await rag_manager.retrieve(business_id, message, settings.RAG_TOP_K, query_vec=query_vec)
+    return ChatInputs([], chunks, query_vec=query_vec, knowledge_version=version)
+
+def remember_answer(business_id: str, inputs: ChatInputs, answer: str):
+    """
+    Offer a freshly generated answer to the semantic cache.
+    Canned error replies are never cached.
+    """
+    if inputs.query_vec and inputs.cached_answer is None and answer not in FALLBACK_MESSAGES:
+        answer_cache.store(business_id, inputs.query_vec, answer, inputs.knowledge_version)
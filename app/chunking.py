@@ -0,0 +1,274 @@
+import logging
+import re
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Type
+from app.core.config import settings
+from app.llm.prompt import make_token_counter
+
+logger = logging.getLogger(__name__)
+
+# Text without any boundary is cut here, so one huge "paragraph" cannot
+# make a streaming chunker buffer a whole document
+MAX_BUFFER_CHARS = 64 * 1024
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+_WORD_BREAK = re.compile(r"\s+")
+_HEADING = re.compile(r"^(#{1,6})\s+\S")
+
+class BaseChunker(ABC):
+    """
+    Splits a document, given as a stream of text sections (pages, blocks),
+    into chunks for embedding. Section boundaries may fall anywhere, even
+    mid-word; chunkers carry the unfinished tail over to the next section.
+    """
+
+    name = ""
+
+    @property
+    def signature(self) -> str:
+        """Strategy and parameters. Part of a source's fingerprint, so
+        re-ingesting with different settings is not mistaken for unchanged."""
+        return self.name
+
+    @abstractmethod
+    def iter_chunks(self, sections: Iterable[str]) -> Iterator[str]:
+        pass
+
+    def chunk(self, text: str) -> List[str]:
+        return list(self.iter_chunks([text]))
+
+
+class FixedChunker(BaseChunker):
+    """
+    Fixed-size character slices, cut regardless of words or sentences.
+    """
+
+    name = "fixed"
+
+    def __init__(self, size: int = 1000):
+        self.size = size
+
+    @property
+    def signature(self) -> str:
+        return f"{self.name}:{self.size}"
+
+    def iter_chunks(self, sections: Iterable[str]) -> Iterator[str]:
+        carry = ""
+        for section in sections:
+            if not section:
+                continue
+            buffer = carry + section
+            end = len(buffer) - len(buffer) % self.size
+            for i in range(0, end, self.size):
+                yield buffer[i:i + self.size]
+            carry = buffer[end:]
+        if carry:
+            yield carry
+
+
+class PackingChunker(BaseChunker):
+    """
+    Splits text into units (paragraphs, sentences or words) and packs
+    consecutive units into chunks of up to `target_tokens`. A unit that is
+    larger than a whole chunk is split further by `_split_long`.
+    With `overlap_tokens`, each chunk repeats the trailing units of the
+    previous one, up to that many tokens.
+    """
+
+    boundary = _WORD_BREAK
+    separator = " "
+
+    def __init__(self, target_tokens: int, overlap_tokens: int = 0, count: Callable[[str], int] = None):
+        self.target_tokens = max(1, target_tokens)
+        self.overlap_tokens = max(0, min(overlap_tokens, self.target_tokens // 2))
+        self.count = count or token_counter(settings.EMBEDDING_MODEL)
+
+    @property
+    def signature(self) -> str:
+        return f"{self.name}:{self.target_tokens}:{self.overlap_tokens}"
+
+    def iter_chunks(self, sections: Iterable[str]) -> Iterator[str]:
+        return self._pack(self._iter_units(sections))
+
+    def _iter_units(self, sections: Iterable[str]) -> Iterator[str]:
+        buffer = ""
+        for section in sections:
+            buffer += section
+            end = None
+            for match in self.boundary.finditer(buffer):
+                end = match.end()
+            if end is None and len(buffer) > MAX_BUFFER_CHARS:
+                end = len(buffer)
+            if end:
+                yield from self._split(buffer[:end])
+                buffer = buffer[end:]
+        if buffer:
+            yield from self._split(buffer)
+
+    def _split(self, text: str) -> Iterator[str]:
+        for unit in self.boundary.split(text):
+            unit = unit.strip()
+            if unit:
+                yield unit
+
+    def _heading_level(self, unit: str) -> int:
+        """Level of a heading unit, 0 for body text."""
+        return 0
+
+    def _split_long(self, unit: str, budget: int) -> Iterator[str]:
+        # Last resort: pack the unit's words
+        return WordWindowChunker(budget, 0, self.count).iter_chunks([unit])
+
+    def _pack(self, units: Iterator[str]) -> Iterator[str]:
+        headings: List[Tuple[int, str]] = []
+        prefix = ""
+        budget = self.target_tokens
+        current: List[Tuple[str, int]] = []
+        tokens = 0
+        fresh = False  # current holds units not yet emitted
+
+        for unit in units:
+            level = self._heading_level(unit)
+            if level:
+                # A heading closes the chunk and prefixes the chunks under it
+                if fresh:
+                    yield self._join(prefix, current)
+                headings = [h for h in headings if h[0] < level] + [(level, unit)]
+                prefix = "\n".join(text for _, text in headings)
+                budget = max(self.target_tokens // 2, self.target_tokens - self.count(prefix))
+                current, tokens, fresh = [], 0, False
+                continue
+
+            unit_tokens = self.count(unit)
+            if unit_tokens > budget:
+                if fresh:
+                    yield self._join(prefix, current)
+                for piece in self._split_long(unit, budget):
+                    yield self._join(prefix, [(piece, 0)])
+                current, tokens, fresh = [], 0, False
+                continue
+
+            if fresh and tokens + unit_tokens > budget:
+                yield self._join(prefix, current)
+                current = self._overlap(current)
+                tokens = sum(t for _, t in current)
+                fresh = False
+            current.append((unit, unit_tokens))
+            tokens += unit_tokens
+            fresh = True
+
+        if fresh:
+            yield self._join(prefix, current)
+
+    def _overlap(self, units: List[Tuple[str, int]]) -> List[Tuple[str, int]]:
+        kept: List[Tuple[str, int]] = []
+        tokens = 0
+        for unit, unit_tokens in reversed(units):
+            if tokens + unit_tokens > self.overlap_tokens:
+                break
+            kept.append((unit, unit_tokens))
+            tokens += unit_tokens
+        kept.reverse()
+        return kept
+
+    def _join(self, prefix: str, units: List[Tuple[str, int]]) -> str:
+        body = self.separator.join(unit for unit, _ in units)
+        return f"{prefix}\n\n{body}" if prefix else body
+
+
+class WordWindowChunker(PackingChunker):
+    """
+    Sliding window of words: chunks of `target_tokens`, each starting
+    `overlap_tokens` before the previous one ended.
+    """
+
+    name = "sliding"
+
+    def _split_long(self, unit: str, budget: int) -> Iterator[str]:
+        # A single word over budget (CJK text, base64, long URLs): cut it by characters
+        return _split_chars(unit, budget, self.count)
+
+
+class SentenceChunker(PackingChunker):
+    """
+    Whole sentences packed up to `target_tokens`.
+    """
+
+    name = "sentence"
+    boundary = _SENTENCE_BREAK
+
+
+class ParagraphChunker(PackingChunker):
+    """
+    Paragraphs packed up to `target_tokens`, never across a Markdown
+    heading. Each chunk starts with the headings it sits under, so a chunk
+    deep in a section still says what the section is about. Paragraphs
+    longer than a chunk are packed by sentence.
+    """
+
+    name = "paragraph"
+    boundary = _PARAGRAPH_BREAK
+    separator = "\n\n"
+
+    def _split(self, text: str) -> Iterator[str]:
+        for block in _PARAGRAPH_BREAK.split(text):
+            # Headings often sit directly on top of their first paragraph
+            body: List[str] = []
+            for line in block.split("\n"):
+                if _HEADING.match(line.strip()):
+                    if any(part.strip() for part in body):
+                        yield "\n".join(body).strip()
+                    body = []
+                    yield line.strip()
+                else:
+                    body.append(line)
+            if any(part.strip() for part in body):
+                yield "\n".join(body).strip()
+
+    def _heading_level(self, unit: str) -> int:
+        match = _HEADING.match(unit)
+        return len(match.group(1)) if match and "\n" not in unit else 0
+
+    def _split_long(self, unit: str, budget: int) -> Iterator[str]:
+        return SentenceChunker(budget, 0, self.count).iter_chunks([unit])
+
+
+CHUNKERS: Dict[str, Type[BaseChunker]] = {
+    "fixed": FixedChunker,
+    "paragraph": ParagraphChunker,
+    "sentence": SentenceChunker,
+    "sliding": WordWindowChunker
+}
+
+def get_chunker(strategy: Optional[str] = None) -> BaseChunker:
+    """
+    Chunker for a strategy name (default CHUNK_STRATEGY), sized from
+    CHUNK_TARGET_TOKENS / CHUNK_OVERLAP_TOKENS.
+    """
+    strategy = (strategy or settings.CHUNK_STRATEGY).lower()
+    if strategy not in CHUNKERS:
+        raise ValueError(f"Unknown chunking strategy '{strategy}'. Expected one of {tuple(CHUNKERS)}")
+
+    if strategy == "fixed":
+        return FixedChunker()
+    overlap = settings.CHUNK_OVERLAP_TOKENS if strategy == "sliding" else 0
+    return CHUNKERS[strategy](settings.CHUNK_TARGET_TOKENS, overlap)
+
+def _split_chars(text: str, budget: int, count: Callable[[str], int]) -> Iterator[str]:
+    """Consecutive slices of `text` of at most `budget` tokens each."""
+    start = 0
+    while start < len(text):
+        piece = text[start:start + budget * 4]
+        tokens = count(piece)
+        while tokens > budget and len(piece) > 1:
+            piece = piece[:max(1, len(piece) * budget // tokens)]
+            tokens = count(piece)
+        yield piece
+        start += len(piece)
+
+@lru_cache(maxsize=None)
+def token_counter(model: str) -> Callable[[str], int]:
+    # Loading an encoding is slow; share one per model
+    return make_token_counter(model)
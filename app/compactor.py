@@ -0,0 +1,56 @@
+import asyncio
+import logging
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.store_residency import store_residency
+from app.vector_store import VectorStore
+
+logger = logging.getLogger(__name__)
+
+class StoreCompactor:
+    """
+    Background task that reclaims the space held by deleted chunks.
+
+    Every VECTOR_COMPACT_INTERVAL_SECONDS it compacts each open store whose
+    share of deleted rows is at least VECTOR_COMPACT_DEAD_FRACTION. The
+    rebuild runs in a worker thread and searches keep being served from the
+    old rows until it is done. With several uvicorn workers, whichever gets
+    there first compacts a shared store; the others find nothing to do.
+    """
+
+    def __init__(self):
+        self._task = None
+
+    async def start(self):
+        if settings.VECTOR_COMPACT_INTERVAL_SECONDS > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def compact_all(self) -> int:
+        """Compact every store over the threshold; returns rows reclaimed."""
+        reclaimed = 0
+        for business_id, store in store_residency.items():
+            try:
+                reclaimed += await run_in_threadpool(_compact_if_due, store)
+            except Exception as e:
+                logger.error(f"Compaction failed for {business_id}: {e}")
+        return reclaimed
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(settings.VECTOR_COMPACT_INTERVAL_SECONDS)
+            await self.compact_all()
+
+def _compact_if_due(store: VectorStore) -> int:
+    # Refreshing maps rows other workers appended, which may quantize or index them
+    store.refresh()
+    if store.dead_fraction < settings.VECTOR_COMPACT_DEAD_FRACTION:
+        return 0
+    return store.compact(settings.VECTOR_COMPACT_DEAD_FRACTION)
+
+store_compactor = StoreCompactor()
@@ -11,19 +11,113 @@ class Settings(BaseSettings):
     # LLM Keys
     # GOOGLE_API_KEY removed
     OPENAI_API_KEY: str
+    OPENAI_BASE_URL: str = ""  # Empty = api.openai.com; e.g. a local mock for load tests
+
+    # OpenAI call scheduling (all chat and embeddings calls share one client and queue)
+    OPENAI_CHAT_RPM: int = 0  # Client-side limits, set to the account's; 0 = unlimited
+    OPENAI_CHAT_TPM: int = 0
+    OPENAI_EMBEDDING_RPM: int = 0
+    OPENAI_EMBEDDING_TPM: int = 0
+    OPENAI_BULK_SHARE: float = 0.8  # Share of each limit ingestion may use; the rest is kept for chat
+    OPENAI_MAX_RETRIES: int = 3  # On 429, 5xx and connection errors, honouring Retry-After
+    OPENAI_TIMEOUT_SECONDS: float = 60.0
+    OPENAI_MAX_CONNECTIONS: int = 100
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = 50
+    OPENAI_KEEPALIVE_SECONDS: float = 30.0  # Idle connections kept for the next burst (saves TLS handshakes)
 
     # Redis
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
     REDIS_DB: int = 0
     REDIS_PASSWORD: str = ""
+    REDIS_MAX_CONNECTIONS: int = 50  # Async pool size per worker process
+    REDIS_POOL_TIMEOUT: float = 5.0  # Seconds to wait for a free pooled connection
+    REDIS_SOCKET_TIMEOUT: float = 2.0
+    REDIS_SOCKET_CONNECT_TIMEOUT: float = 2.0
 
     # Memory
     CHAT_HISTORY_WINDOW: int = 20
     CHAT_TTL_SECONDS: int = 3600  # 1 hour default
 
+    # Prompt token budget per LLM request
+    PROMPT_MAX_TOKENS: int = 8000  # System prompt + context + history + question
+    PROMPT_CONTEXT_TOKENS: int = 3000  # Cap for retrieved chunks
+    PROMPT_HISTORY_TOKENS: int = 2000  # Cap for previous turns
+    RAG_TOP_K: int = 5  # Chunks retrieved per question before budgeting
+    RAG_SEARCH_MODE: str = "vector"  # vector | hybrid (BM25 + vector, rank-fused) | lexical (BM25 only)
+    RAG_HYBRID_CANDIDATES: int = 20  # Results taken from each retriever before fusion
+    RAG_LEXICAL_FAST_PATH: bool = False  # hybrid: answer queries naming codes/SKUs found verbatim from BM25 alone
+
+    # Chat pipeline stage budgets in seconds (0 disables the limit)
+    CHAT_HISTORY_TIMEOUT: float = 1.0  # On timeout, answer without history
+    CHAT_RAG_TIMEOUT: float = 3.0  # On timeout, answer without retrieved context
+    CHAT_LLM_TIMEOUT: float = 0  # On timeout, fail the request with 504
+
     # RAG
-    VECTOR_DB_TYPE: str = "redis"
+    VECTOR_DB_TYPE: str = "numpy"  # numpy | faiss | faiss_ivf | faiss_hnsw
+    VECTOR_ANN_MIN_VECTORS: int = 10000  # Tenant size at which IVF/HNSW takes over from exact search
+    VECTOR_IVF_NPROBE: int = 16
+    VECTOR_HNSW_M: int = 32
+    VECTOR_HNSW_EF_CONSTRUCTION: int = 200
+    VECTOR_HNSW_EF_SEARCH: int = 64
+    VECTOR_QUANTIZATION: str = "none"  # none | float16 | int8 (numpy/faiss exact indexes)
+    VECTOR_QUANTIZATION_BUSINESSES: str = ""  # Per-business overrides, e.g. "shop-1:int8,shop-2:none"
+    VECTOR_RERANK_FACTOR: int = 4  # Quantized search re-scores k * this many candidates at full precision; 0 disables
+    VECTOR_STORE_PERSIST: bool = True  # Memory-mapped on-disk store shared by all workers
+    VECTOR_STORE_DIR: str = "data/vector_store"
+    VECTOR_STORE_MEMORY_BUDGET_MB: int = 0  # Per worker; least recently used stores are evicted beyond it (0 = unlimited)
+    VECTOR_COMPACT_DEAD_FRACTION: float = 0.2  # Compact a store once this share of its rows is deleted
+    VECTOR_COMPACT_INTERVAL_SECONDS: int = 60  # 0 disables background compaction
+
+    # Chunking (per-ingest override: `chunking` form field)
+    CHUNK_STRATEGY: str = "paragraph"  # fixed | paragraph | sentence | sliding
+    CHUNK_TARGET_TOKENS: int = 256
+    CHUNK_OVERLAP_TOKENS: int = 32  # sliding only
+
+    # Semantic answer cache (opt-in per business)
+    ANSWER_CACHE_BUSINESSES: str = ""  # Comma-separated business ids, or "*" for all
+    ANSWER_CACHE_THRESHOLD: float = 0.95  # Min cosine similarity between questions
+    ANSWER_CACHE_MAX_ENTRIES: int = 1000  # Per business, LRU eviction
+    ANSWER_CACHE_TTL_SECONDS: int = 86400
+
+    # Background ingestion
+    INGEST_WORKERS: int = 4  # Jobs processed concurrently per process
+    INGEST_QUEUE_SIZE: int = 100  # Waiting jobs before new submissions get 503
+    INGEST_CONCURRENCY_PER_BUSINESS: int = 2
+    INGEST_JOB_TTL_SECONDS: int = 86400  # How long job status stays queryable
+    INGEST_PIPELINE_DEPTH: int = 4  # Embedding batches buffered between chunker and embedder
+
+    # Web pages (/ingest/url, /ingest/crawl)
+    HTML_EXTRACTOR: str = "lxml"  # lxml (main content only) | soup (all text, original)
+    CRAWL_MAX_PAGES: int = 200
+    CRAWL_MAX_DEPTH: int = 3  # Link hops from the start page (sitemap pages count as 1)
+    CRAWL_CONCURRENCY: int = 8  # Pages fetched at once; also the connection pool size
+    CRAWL_PER_HOST_CONCURRENCY: int = 4
+    CRAWL_TIMEOUT_SECONDS: float = 10.0
+    CRAWL_USE_SITEMAP: bool = True
+    CRAWL_CACHE_TTL_SECONDS: int = 2592000  # How long ETag/Last-Modified are kept for re-crawls
+
+    # OCR
+    OCR_PARALLEL: bool = True  # OCR PDF images in a process pool
+    OCR_WORKERS: int = 0  # Pool size, 0 = number of CPU cores
+    OCR_MIN_PAGE_TEXT_CHARS: int = 200  # Pages with this much text layer are not OCRed
+    OCR_MIN_IMAGE_PIXELS: int = 40000  # Smaller images (~200x200) are treated as decorative
+
+    # Embeddings
+    EMBEDDING_MODEL: str = "text-embedding-3-small"
+    EMBEDDING_BATCH_SIZE: int = 128  # Max inputs per embeddings request (provider cap is 2048)
+    EMBEDDING_BATCH_MAX_TOKENS: int = 250000  # Provider rejects requests above 300k tokens
+    EMBEDDING_MAX_INPUT_TOKENS: int = 8191  # Per-input limit of text-embedding-3-*
+    EMBEDDING_CONCURRENCY: int = 4  # Batches in flight at once during ingestion
+    EMBEDDING_QUERY_BATCH_WAIT_MS: float = 5.0  # Chat queries arriving within this window share one request; 0 disables
+    EMBEDDING_QUERY_BATCH_SIZE: int = 64  # A batch is sent early once this many queries wait
+    EMBEDDING_CACHE_SIZE: int = 5000  # In-process LRU entries (~6 KB each), 0 disables
+    EMBEDDING_CACHE_REDIS: bool = True  # Shared Redis tier
+    EMBEDDING_CACHE_TTL_SECONDS: int = 604800  # 7 days
+
+    # Metrics (GET /metrics, Prometheus text format, per worker process)
+    METRICS_ENABLED: bool = True
+    METRICS_BUSINESS_LABELS: bool = False  # Also label by business; one series per tenant and stage
 
     class Config:
         env_file = ".env"
@@ -1,4 +1,5 @@
 import redis
+import redis.asyncio as aioredis
 import logging
 from app.core.config import settings
 
@@ -31,9 +32,66 @@ class RedisClient:
         except Exception:
             return False
 
-# Singleton instance
+class AsyncRedisClient:
+    """
+    asyncio counterpart of RedisClient for use inside request handlers.
+    Commands await the socket instead of blocking the event loop. The pool
+    is bounded: when all connections are busy, callers wait up to
+    REDIS_POOL_TIMEOUT for one to free up rather than opening more.
+    Pass decode_responses=False for a client that reads raw bytes.
+    """
+    def __init__(self, decode_responses: bool = True):
+        self._pool = None
+        self._decode_responses = decode_responses
+
+    def get_connection(self) -> aioredis.Redis:
+        if not self._pool:
+            try:
+                self._pool = aioredis.BlockingConnectionPool(
+                    host=settings.REDIS_HOST,
+                    port=settings.REDIS_PORT,
+                    db=settings.REDIS_DB,
+                    password=settings.REDIS_PASSWORD or None,
+                    max_connections=settings.REDIS_MAX_CONNECTIONS,
+                    timeout=settings.REDIS_POOL_TIMEOUT,
+                    socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                    socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+                    decode_responses=self._decode_responses
+                )
+                logger.info(
+                    f"Async Redis pool created for {settings.REDIS_HOST}:{settings.REDIS_PORT} "
+                    f"(max {settings.REDIS_MAX_CONNECTIONS} connections)"
+                )
+            except Exception as e:
+                logger.error(f"Failed to create async Redis pool: {e}")
+                raise e
+        return aioredis.Redis(connection_pool=self._pool)
+
+    async def is_alive(self) -> bool:
+        try:
+            client = self.get_connection()
+            return await client.ping()
+        except Exception:
+            return False
+
+    async def close(self):
+        if self._pool:
+            await self._pool.disconnect()
+            self._pool = None
+
+# Singleton instances
 redis_client = RedisClient()
+async_redis_client = AsyncRedisClient()
+async_redis_binary_client = AsyncRedisClient(decode_responses=False)
 
 def get_redis() -> redis.Redis:
     """Dependency for FastAPI to get redis connection"""
     return redis_client.get_connection()
+
+def get_async_redis() -> aioredis.Redis:
+    """Dependency for FastAPI to get an asyncio redis connection"""
+    return async_redis_client.get_connection()
+
+def get_async_redis_binary() -> aioredis.Redis:
+    """asyncio redis connection returning raw bytes (e.g. packed vectors)"""
+    return async_redis_binary_client.get_connection()
\ No newline at end of file
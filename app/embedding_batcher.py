@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+import numpy as np
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Recent batches kept for the percentile stats
+STATS_WINDOW = 1024
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent single-text embedding requests.
+
+    Callers await `embed(text)`. The first request of a batch starts a timer
+    of `max_wait_ms`; everything that arrives before it fires, or until
+    `max_batch` texts are waiting, goes out as one embeddings request and
+    each caller gets its own vector back. Identical texts in a batch are
+    sent once. Under load this trades a few milliseconds of queueing for a
+    fraction of the HTTP requests (and rate-limit budget).
+
+    `send` embeds a list of texts and returns vectors aligned with it, empty
+    lists for failures, like RAGManager._embed_batch.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[List[str]], Awaitable[List[List[float]]]],
+        max_batch: Optional[int] = None,
+        max_wait_ms: Optional[float] = None
+    ):
+        self._send = send
+        self.max_batch = max(1, settings.EMBEDDING_QUERY_BATCH_SIZE if max_batch is None else max_batch)
+        self.max_wait = max(0.0, settings.EMBEDDING_QUERY_BATCH_WAIT_MS if max_wait_ms is None else max_wait_ms) / 1000
+        # (text, future, enqueue time) of the batch being collected
+        self._pending: List[Tuple[str, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Running sends; asyncio only keeps weak references to tasks
+        self._tasks: Set[asyncio.Task] = set()
+        self._in_flight = 0
+        self.requests = 0
+        self.batches = 0
+        self.failures = 0
+        self._sizes: Deque[int] = deque(maxlen=STATS_WINDOW)
+        self._waits: Deque[float] = deque(maxlen=STATS_WINDOW)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_wait > 0 and self.max_batch > 1
+
+    async def embed(self, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # A batch collected on a closed loop can never be sent
+            self._loop, self._pending, self._timer = loop, [], None
+        future = loop.create_future()
+        self._pending.append((text, future, time.perf_counter()))
+        self.requests += 1
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def stats(self) -> Dict[str, float]:
+        sizes, waits = list(self._sizes), list(self._waits)
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "failures": self.failures,
+            "in_flight": self._in_flight,
+            "avg_batch_size": round(self.requests / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size": max(sizes, default=0),
+            "avg_wait_ms": round(float(np.mean(waits)) * 1000, 3) if waits else 0.0,
+            "p95_wait_ms": round(float(np.percentile(waits, 95)) * 1000, 3) if waits else 0.0
+        }
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future, float]]):
+        # Callers that timed out while queued have cancelled their future
+        batch = [entry for entry in batch if not entry[1].done()]
+        if not batch:
+            return
+        sent = time.perf_counter()
+        texts = list(dict.fromkeys(text for text, _, _ in batch))
+        self.batches += 1
+        self._sizes.append(len(batch))
+        self._waits.extend(sent - queued for _, _, queued in batch)
+
+        self._in_flight += 1
+        try:
+            vectors = dict(zip(texts, await self._send(texts)))
+        except Exception as e:
+            logger.error(f"Query embedding batch of {len(texts)} failed: {e}")
+            vectors = {}
+        finally:
+            self._in_flight -= 1
+
+        for text, future, _ in batch:
+            vector = vectors.get(text) or []
+            if not vector:
+                self.failures += 1
+            if not future.done():
+                future.set_result(vector)
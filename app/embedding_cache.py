@@ -0,0 +1,125 @@
+import hashlib
+import logging
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import List, Optional, Dict
+from app.core.config import settings
+from app.core.redis_client import get_async_redis_binary
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache keyed by model name + hash of the text.
+
+    Chat questions are looked up by their normalized text (case and spacing
+    folded), so "Opening hours?" and "opening  hours?" share one entry.
+    Everything else, document chunks included, is keyed by the exact text:
+    chunks differing only in case ("US" vs "us", SKUs, code) must keep their
+    own vectors. The two kinds of keys never collide.
+
+    Tier 1 is a bounded in-process LRU. Tier 2 is Redis, shared by all
+    workers, holding raw float32 bytes (6 KB for a 1536-dim vector) with a
+    TTL. Redis hits are promoted into the LRU. Redis errors are logged and
+    treated as misses so the cache can never fail a request.
+    """
+
+    def __init__(self, max_entries: int = None, ttl_seconds: int = None, use_redis: bool = None):
+        self.max_entries = settings.EMBEDDING_CACHE_SIZE if max_entries is None else max_entries
+        self.ttl_seconds = settings.EMBEDDING_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.use_redis = settings.EMBEDDING_CACHE_REDIS if use_redis is None else use_redis
+        self._lru: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(text: str, model: str, normalize: bool = False) -> str:
+        if normalize:
+            normalized = " ".join(text.split()).casefold()
+            digest = hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).hexdigest()
+            return f"emb:{model}:{digest}"
+        digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+        return f"emb:{model}:exact:{digest}"
+
+    async def get(self, text: str, model: str, normalize: bool = False) -> Optional[List[float]]:
+        return (await self.get_many([text], model, normalize))[0]
+
+    async def set(self, text: str, vector: List[float], model: str, normalize: bool = False):
+        await self.set_many([text], [vector], model, normalize)
+
+    async def get_many(self, texts: List[str], model: str, normalize: bool = False) -> List[Optional[List[float]]]:
+        """
+        Look up texts in order. Misses come back as None. With `normalize`,
+        texts differing only in case and whitespace share an entry.
+        """
+        keys = [self.make_key(text, model, normalize) for text in texts]
+        found: List[Optional[np.ndarray]] = [self._lru_get(key) for key in keys]
+        self.memory_hits += sum(1 for vector in found if vector is not None)
+
+        missing = [i for i, vector in enumerate(found) if vector is None]
+        if missing and self.use_redis:
+            try:
+                values = await get_async_redis_binary().mget([keys[i] for i in missing])
+                for i, value in zip(missing, values):
+                    if value:
+                        vector = np.frombuffer(value, dtype=np.float32)
+                        found[i] = vector
+                        self._lru_put(keys[i], vector)
+                        self.redis_hits += 1
+            except Exception as e:
+                logger.warning(f"Embedding cache Redis read failed: {e}")
+
+        self.misses += sum(1 for vector in found if vector is None)
+        return [None if vector is None else vector.tolist() for vector in found]
+
+    async def set_many(self, texts: List[str], vectors: List[List[float]], model: str, normalize: bool = False):
+        """
+        Store embeddings in both tiers. Empty vectors (failed embeds) are skipped.
+        """
+        entries = {}
+        for text, vector in zip(texts, vectors):
+            if vector:
+                key = self.make_key(text, model, normalize)
+                packed = np.asarray(vector, dtype=np.float32)
+                self._lru_put(key, packed)
+                entries[key] = packed.tobytes()
+
+        if entries and self.use_redis:
+            try:
+                pipe = get_async_redis_binary().pipeline(transaction=False)
+                for key, value in entries.items():
+                    pipe.set(key, value, ex=self.ttl_seconds)
+                await pipe.execute()
+            except Exception as e:
+                logger.warning(f"Embedding cache Redis write failed: {e}")
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.memory_hits + self.redis_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.redis_hits) / lookups, 4) if lookups else 0.0,
+            "entries": len(self._lru)
+        }
+
+    def _lru_get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._lru.get(key)
+            if vector is not None:
+                self._lru.move_to_end(key)
+            return vector
+
+    def _lru_put(self, key: str, vector: np.ndarray):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._lru[key] = vector
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+embedding_cache = EmbeddingCache()
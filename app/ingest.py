@@ -0,0 +1,66 @@
+import logging
+import os
+from typing import Optional
+from starlette.concurrency import run_in_threadpool
+from app.chunking import BaseChunker
+from app.jobs import IngestJob
+from app.rag import rag_manager
+from app.utils.loaders import loader
+
+logger = logging.getLogger(__name__)
+
+# Work functions run by the ingestion queue (app.jobs). Each receives its job
+# and reports progress through job.progress; raising marks the job failed.
+
+async def ingest_text_job(job: IngestJob, text: str, chunker: Optional[BaseChunker] = None, replace: bool = True):
+    await rag_manager.ingest_document(
+        job.business_id, text, job.source, progress=job.progress, chunker=chunker, replace=replace
+    )
+
+async def ingest_url_job(job: IngestJob, url: str, chunker: Optional[BaseChunker] = None):
+    from app.utils.web import web_loader
+
+    # Run blocking scraping in threadpool
+    content = await run_in_threadpool(web_loader.load, url)
+    job.progress.page_done(1, 1)
+    await rag_manager.ingest_document(job.business_id, content, url, progress=job.progress, chunker=chunker)
+
+async def ingest_crawl_job(
+    job: IngestJob,
+    url: str,
+    max_pages: Optional[int] = None,
+    max_depth: Optional[int] = None,
+    chunker: Optional[BaseChunker] = None
+):
+    from app.utils.crawler import web_crawler
+
+    # Each page is its own source, so re-crawls update pages incrementally
+    async def on_page(page):
+        await rag_manager.ingest_document(job.business_id, page.text, page.url, progress=job.progress, chunker=chunker)
+
+    stats = await web_crawler.crawl(
+        job.business_id,
+        url,
+        on_page,
+        max_pages=max_pages,
+        max_depth=max_depth,
+        # Read once: pages ingested during this crawl are not visited again
+        known=await rag_manager.known_sources(job.business_id),
+        on_progress=lambda stats: job.progress.page_done(stats.done, stats.discovered)
+    )
+    if not stats.fetched and not stats.not_modified:
+        raise ValueError(f"No page of {url} could be crawled.")
+
+async def ingest_file_job(job: IngestJob, file_path: str, chunker: Optional[BaseChunker] = None):
+    try:
+        # Pages are extracted, chunked and embedded as a stream
+        sections = loader.iter_load(file_path, on_page=job.progress.page_done)
+        stored = await rag_manager.ingest_stream(
+            job.business_id, sections, job.source, progress=job.progress, chunker=chunker
+        )
+        if not stored and not job.progress.chunks_total:
+            raise ValueError("Could not extract text from file.")
+    finally:
+        # The upload was saved for this job only
+        if os.path.exists(file_path):
+            os.remove(file_path)
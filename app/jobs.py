@@ -0,0 +1,224 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional
+from app.core.config import settings
+from app.core.redis_client import get_async_redis
+from app.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class QueueFull(Exception):
+    """Raised when the ingestion queue cannot take more jobs."""
+    pass
+
+
+class IngestProgress:
+    """
+    Mutable progress counters for one ingestion.
+    Updated from worker threads as well as the event loop; every field is a
+    plain int assignment, so no locking is needed.
+    """
+    def __init__(self):
+        self.pages_total = 0
+        self.pages_done = 0
+        self.chunks_total = 0
+        self.chunks_embedded = 0
+
+    def page_done(self, page: int, total: int):
+        self.pages_total = total
+        self.pages_done = page
+
+    def to_dict(self) -> Dict[str, int]:
+        return {
+            "pages_total": self.pages_total,
+            "pages_done": self.pages_done,
+            "chunks_total": self.chunks_total,
+            "chunks_embedded": self.chunks_embedded
+        }
+
+
+class IngestJob:
+    def __init__(self, business_id: str, kind: str, source: str, work: Callable[["IngestJob"], Awaitable[None]]):
+        self.id = uuid.uuid4().hex
+        self.business_id = business_id
+        self.kind = kind
+        self.source = source
+        self.status = "queued"  # queued | running | completed | failed
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.progress = IngestProgress()
+        self._work = work
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "business_id": self.business_id,
+            "kind": self.kind,
+            "source": self.source,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            **self.progress.to_dict()
+        }
+
+
+class IngestJobQueue:
+    """
+    Bounded ingestion queue served by a fixed pool of asyncio workers.
+
+    - At most INGEST_QUEUE_SIZE jobs wait at once; submit raises QueueFull
+      beyond that, which the API turns into 503 + Retry-After.
+    - At most INGEST_CONCURRENCY_PER_BUSINESS jobs of one business run at
+      once. Jobs wait in per-business lines and only runnable businesses are
+      handed to workers, so one tenant's bulk upload cannot occupy every
+      worker or block other tenants.
+    - Job status is mirrored to Redis (INGEST_JOB_TTL_SECONDS) so any worker
+      process can answer status requests.
+    """
+
+    def __init__(self):
+        self._jobs: Dict[str, IngestJob] = {}
+        self._pending: Dict[str, Deque[IngestJob]] = {}
+        self._running: Dict[str, int] = {}
+        self._scheduled: Dict[str, int] = {}
+        self._ready: Optional[asyncio.Queue] = None
+        self._workers = []
+        self._queued = 0
+
+    async def start(self):
+        self._ready = asyncio.Queue()
+        self._workers = [
+            asyncio.create_task(self._worker(i)) for i in range(max(1, settings.INGEST_WORKERS))
+        ]
+        logger.info(f"Ingestion queue started with {len(self._workers)} workers")
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def submit(
+        self,
+        business_id: str,
+        kind: str,
+        source: str,
+        work: Callable[[IngestJob], Awaitable[None]]
+    ) -> IngestJob:
+        """
+        Queue `work(job)` for background execution and return the job at once.
+        """
+        self.check_capacity()
+
+        self._prune()
+        job = IngestJob(business_id, kind, source, work)
+        self._jobs[job.id] = job
+        self._pending.setdefault(business_id, deque()).append(job)
+        self._queued += 1
+        self._schedule(business_id)
+        await self._publish(job)
+        return job
+
+    def check_capacity(self):
+        """
+        Raise QueueFull if a job submitted now would be rejected, so callers
+        can refuse before doing costly work such as saving an upload.
+        """
+        if self._queued >= settings.INGEST_QUEUE_SIZE:
+            raise QueueFull(f"Ingestion queue is full ({self._queued} jobs waiting)")
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        # Possibly submitted to another worker process
+        try:
+            raw = await get_async_redis().get(self._key(job_id))
+            return json.loads(raw) if raw else None
+        except Exception as e:
+            logger.error(f"Failed to read job {job_id} from Redis: {e}")
+            return None
+
+    def _schedule(self, business_id: str):
+        # Hand out at most one ready token per runnable job, up to the limit
+        limit = max(1, settings.INGEST_CONCURRENCY_PER_BUSINESS)
+        running = self._running.get(business_id, 0)
+        scheduled = self._scheduled.get(business_id, 0)
+        pending = len(self._pending.get(business_id, ()))
+        if running + scheduled < limit and scheduled < pending:
+            self._scheduled[business_id] = scheduled + 1
+            self._ready.put_nowait(business_id)
+
+    async def _worker(self, worker_id: int):
+        while True:
+            business_id = await self._ready.get()
+            self._scheduled[business_id] -= 1
+            job = self._pending[business_id].popleft()
+            self._queued -= 1
+            self._running[business_id] = self._running.get(business_id, 0) + 1
+            try:
+                await self._run(job)
+            finally:
+                self._running[business_id] -= 1
+                if not self._pending[business_id] and not self._running[business_id]:
+                    # Forget idle businesses so the dicts do not grow forever
+                    del self._pending[business_id], self._running[business_id], self._scheduled[business_id]
+                else:
+                    self._schedule(business_id)
+
+    async def _run(self, job: IngestJob):
+        job.status = "running"
+        job.started_at = time.time()
+        await self._publish(job)
+        publisher = asyncio.create_task(self._publish_while_running(job))
+        # Embedding, OCR... of this job are recorded under its ingest endpoint
+        metrics.bind(f"ingest_{job.kind}", job.business_id)
+        metrics.observe("queue", job.started_at - job.created_at)
+        try:
+            await job._work(job)
+            job.status = "completed"
+        except Exception as e:
+            logger.error(f"Ingest job {job.id} ({job.kind} {job.source}) failed: {e}")
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            metrics.observe("total", job.finished_at - job.started_at)
+            publisher.cancel()
+            await self._publish(job)
+
+    async def _publish_while_running(self, job: IngestJob):
+        while True:
+            await asyncio.sleep(1.0)
+            await self._publish(job)
+
+    async def _publish(self, job: IngestJob):
+        try:
+            await get_async_redis().set(
+                self._key(job.id), json.dumps(job.to_dict()), ex=settings.INGEST_JOB_TTL_SECONDS
+            )
+        except Exception as e:
+            logger.warning(f"Failed to publish status of job {job.id}: {e}")
+
+    def _prune(self):
+        cutoff = time.time() - settings.INGEST_JOB_TTL_SECONDS
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    @staticmethod
+    def _key(job_id: str) -> str:
+        return f"ingest_job:{job_id}"
+
+ingest_queue = IngestJobQueue()
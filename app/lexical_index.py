@@ -0,0 +1,161 @@
+import math
+import re
+from array import array
+from typing import Dict, Iterable, List, Sequence, Tuple
+import numpy as np
+
+# BM25 parameters (Robertson/Sparck Jones defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Reciprocal rank fusion constant; 60 is the value from the original paper
+RRF_K = 60
+# Rough bytes per distinct term: the key string, the postings tuple and its
+# two arrays (for memory accounting only)
+TERM_OVERHEAD_BYTES = 250
+
+# Words joined by - _ . / also make one compound term ("ks-2040", "v2.1"),
+# so "KS-2040" matches the exact code as well as "ks" and "2040"
+_WORD = re.compile(r"[^\W_]+")
+_COMPOUND = re.compile(r"[^\W_]+(?:[-_./][^\W_]+)+")
+_JOINERS = re.compile(r"[-_./]")
+_STOPWORDS = frozenset(
+    "a an and are as at be by do does for from has have how i in is it its me my of on or our "
+    "the this to was what when where which who why will with you your".split()
+)
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase terms of `text` in no particular order, stopwords removed."""
+    text = text.lower()
+    terms = _WORD.findall(text)
+    if _JOINERS.search(text):
+        terms += _COMPOUND.findall(text)
+    return [term for term in terms if term not in _STOPWORDS]
+
+def exact_terms(query: str) -> List[str]:
+    """
+    Terms of `query` that name one specific thing: codes containing digits
+    ("ks-2040", "a113"). Embeddings match these poorly; an inverted index
+    matches them exactly. Hyphenated words ("heavy-duty") are not codes.
+    """
+    query = query.lower()
+    compounds = _COMPOUND.findall(query)
+    words = _WORD.findall(_COMPOUND.sub(" ", query))
+    return [term for term in compounds + words if any(c.isdigit() for c in term)]
+
+def contains_terms(text: str, terms: Iterable[str]) -> bool:
+    return set(terms) <= set(tokenize(text))
+
+
+class BM25Index:
+    """
+    Append-only BM25 inverted index over row ids 0..n-1.
+
+    Postings are compact typed arrays (row id, term frequency) per term, so
+    adding a row only appends, and a query scores every matching row with a
+    few vectorized numpy operations per term. Removed rows are not taken out;
+    callers skip them like they skip tombstones in the vector index. They
+    still count towards document frequencies until the store is compacted
+    and the index rebuilt, which only nudges IDF.
+
+    Not thread-safe: callers serialize `add` and `search`.
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._lengths = array("I")
+        self._total_length = 0
+        self._nbytes = 0
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the postings and row lengths."""
+        return self._nbytes
+
+    def add(self, text: str):
+        """Index `text` as the next row id."""
+        self.add_many([text])
+
+    def add_many(self, texts: Sequence[str]):
+        """Index `texts` as the next row ids."""
+        start = len(self._lengths)
+        vocabulary: Dict[str, int] = {}
+        term_ids: List[int] = []
+        lengths = array("I")
+        for text in texts:
+            terms = tokenize(text)
+            lengths.append(len(terms))
+            term_ids.extend([vocabulary.setdefault(term, len(vocabulary)) for term in terms])
+        if not len(lengths):
+            return
+
+        # One (term, row) pair per occurrence; counting unique pairs gives term
+        # frequencies already grouped by term, so each term is extended once
+        rows = np.repeat(np.arange(start, start + len(lengths), dtype=np.int64), np.asarray(lengths, dtype=np.int64))
+        pairs, tf = np.unique(np.asarray(term_ids, dtype=np.int64) * (start + len(lengths)) + rows, return_counts=True)
+        pair_terms = pairs // (start + len(lengths))
+        pair_rows = (pairs % (start + len(lengths))).astype(np.uint32)
+        tf = np.minimum(tf, 0xFFFF).astype(np.uint16)
+        bounds = np.flatnonzero(np.diff(pair_terms)) + 1
+
+        terms = list(vocabulary)
+        for first, end in zip(np.concatenate(([0], bounds)).tolist(), np.concatenate((bounds, [len(pairs)])).tolist()):
+            term = terms[int(pair_terms[first])]
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = (array("I"), array("H"))
+                self._nbytes += TERM_OVERHEAD_BYTES
+            postings[0].frombytes(pair_rows[first:end].tobytes())
+            postings[1].frombytes(tf[first:end].tobytes())
+
+        self._lengths.extend(lengths)
+        self._total_length += sum(lengths)
+        # 4 bytes per row length, 6 per posting (row id + term frequency)
+        self._nbytes += 4 * len(lengths) + 6 * len(pairs)
+
+    def search(self, terms: Sequence[str], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Up to k (scores, ids) of rows matching any of `terms`, best first.
+        """
+        n = len(self._lengths)
+        if n == 0 or k <= 0:
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+
+        # Copies, not views: a view would pin the arrays against appends
+        lengths = np.array(self._lengths, dtype=np.float32)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(1.0, self._total_length / n))
+        scores = np.zeros(n, dtype=np.float32)
+        for term in set(terms):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            ids = np.array(postings[0], dtype=np.int64)
+            tf = np.array(postings[1], dtype=np.float32)
+            idf = math.log(1 + (n - len(ids) + 0.5) / (len(ids) + 0.5))
+            # A row appears once per term, so plain fancy-index addition is exact
+            scores[ids] += idf * tf * (BM25_K1 + 1) / (tf + norm[ids])
+
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        order = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return scores[order], order
+
+
+def reciprocal_rank_fusion(rankings: Sequence[List[Dict]], top_k: int) -> List[Dict]:
+    """
+    Merge ranked result lists by reciprocal rank fusion: each result scores
+    sum(1 / (RRF_K + rank)) over the lists it appears in. Results are the
+    same chunk when source and text match.
+    """
+    fused: Dict[Tuple, Dict] = {}
+    for ranking in rankings:
+        for rank, result in enumerate(ranking, start=1):
+            key = (result.get("metadata", {}).get("source"), result["text"])
+            entry = fused.get(key)
+            if entry is None:
+                entry = fused[key] = {**result, "score": 0.0}
+            entry["score"] += 1.0 / (RRF_K + rank)
+    return sorted(fused.values(), key=lambda r: r["score"], reverse=True)[:top_k]
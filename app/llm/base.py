@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator
 
 class BaseLLM(ABC):
     """Abstract Base Class for LLM Providers"""
@@ -10,7 +10,8 @@ class BaseLLM(ABC):
         prompt: str, 
         history: List[Dict[str, str]] = [], 
         context: str = "",
-        system_instruction: Optional[str] = None
+        system_instruction: Optional[str] = None,
+        context_chunks: Optional[List[Dict[str, Any]]] = None
     ) -> str:
         """
         Generate a response from the LLM.
@@ -20,8 +21,37 @@ class BaseLLM(ABC):
             history: List of previous messages [{'role': 'user', 'content': '...'}, ...].
             context: Retrieved knowledge/business context.
             system_instruction: Optional override for system prompt.
+            context_chunks: Scored search results ({'text', 'metadata', 'score'}).
+                When given, they replace `context` and are trimmed to the
+                prompt token budget lowest score first.
         
         Returns:
             The text response.
         """
         pass
+
+    async def stream_response(
+        self, 
+        prompt: str, 
+        history: List[Dict[str, str]] = [], 
+        context: str = "",
+        system_instruction: Optional[str] = None,
+        context_chunks: Optional[List[Dict[str, Any]]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream the response as text fragments while it is generated.
+        Providers without native streaming yield the full response once.
+
+        Args:
+            Same as generate_response.
+
+        Yields:
+            Consecutive pieces of the response text.
+        """
+        yield await self.generate_response(
+            prompt=prompt,
+            history=history,
+            context=context,
+            system_instruction=system_instruction,
+            context_chunks=context_chunks
+        )
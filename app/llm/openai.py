@@ -1,96 +1,158 @@
 from app.llm.base import BaseLLM
+from app.llm.scheduler import openai_scheduler, INTERACTIVE
 from app.core.config import settings
-from typing import List, Dict, Optional
+from app.llm.prompt import PromptBuilder, BuiltPrompt
+from app.metrics import metrics
+from typing import Any, List, Dict, Optional, AsyncIterator
 import logging
-import asyncio
-from openai import AsyncOpenAI
-import traceback
+import time
 
 logger = logging.getLogger(__name__)
 
+MISSING_KEY_MESSAGE = "Error: OPENAI_API_KEY is missing in environment variables."
+CONNECTION_ERROR_MESSAGE = "I apologize, but I am currently experiencing connection issues. Please try again later."
+# Canned replies returned instead of a generated answer
+FALLBACK_MESSAGES = (MISSING_KEY_MESSAGE, CONNECTION_ERROR_MESSAGE)
+MAX_COMPLETION_TOKENS = 1000
+
 class OpenAILLM(BaseLLM):
     """
     Production-ready OpenAI Provider.
+
+    Calls go through the shared scheduler (app.llm.scheduler) in the
+    interactive lane, which handles rate limits and retries.
     """
     def __init__(self):
         if not settings.OPENAI_API_KEY:
             logger.error("OPENAI_API_KEY is missing. AI will fail.")
-            self.client = None
-        else:
-            self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
-            # Configurable model, default to high-performance/cost-effective mix if needed
-            self.model_name = "gpt-4o" 
+        # Configurable model, default to high-performance/cost-effective mix if needed
+        self.model_name = "gpt-4o"
+        self.prompt_builder = PromptBuilder(self.model_name)
 
     async def generate_response(
         self, 
         prompt: str, 
         history: List[Dict[str, str]] = [], 
         context: str = "",
-        system_instruction: Optional[str] = None
+        system_instruction: Optional[str] = None,
+        context_chunks: Optional[List[Dict]] = None
     ) -> str:
         
-        if not self.client:
-            return "Error: OPENAI_API_KEY is missing in environment variables."
+        if not openai_scheduler.enabled:
+            return MISSING_KEY_MESSAGE
 
-        # Construct System Prompt (Same strict behavior as Gemini)
-        default_system = (
-            f"Role: You are an intelligent business assistant. \n"
-            f"Context: Use the following business knowledge to answer: \n{context}\n"
-            f"Instructions:\n"
-            f"1. Understand the user's question first.\n"
-            f"2. If the answer is not in the context or chat history, ask for clarification.\n"
-            f"3. Do NOT hallucinate. Stick to facts.\n"
-            f"4. Be professional but human-like. Vary your greetings.\n"
-            f"5. IMPORTANT: If unclear, ask a question back.\n" 
-        )
+        built = self._build_prompt(prompt, history, context, system_instruction, context_chunks)
 
-        if system_instruction:
-            # If custom instruction provided, overlay it
-            full_system_prompt = system_instruction
-        else:
-            full_system_prompt = default_system
+        try:
+            logger.info(f"Sending to OpenAI ({self.model_name})")
+            with metrics.stage("llm"):
+                response = await openai_scheduler.call(
+                    "chat",
+                    lambda: openai_scheduler.client.chat.completions.create(
+                        model=self.model_name,
+                        messages=built.messages,
+                        temperature=0.7,
+                        max_tokens=MAX_COMPLETION_TOKENS
+                    ),
+                    # The provider counts max_tokens against TPM up front
+                    tokens=built.total_tokens + MAX_COMPLETION_TOKENS,
+                    priority=INTERACTIVE
+                )
+            self._record_usage(response.usage, built)
+            return response.choices[0].message.content
+        except Exception as e:
+            # Not retryable, or retries ran out
+            logger.error(f"OpenAI Error: {e}")
+            return CONNECTION_ERROR_MESSAGE
 
-        # Prepare messages
-        messages = [{"role": "system", "content": full_system_prompt}]
+    async def stream_response(
+        self, 
+        prompt: str, 
+        history: List[Dict[str, str]] = [], 
+        context: str = "",
+        system_instruction: Optional[str] = None,
+        context_chunks: Optional[List[Dict]] = None
+    ) -> AsyncIterator[str]:
         
-        # Add history
-        # Ensure strict role compliance (user, assistant)
-        for msg in history:
-            role = msg.get('role', 'user')
-            content = msg.get('content', '').strip()
-            if not content:
-                continue
-            if role not in ['user', 'assistant', 'system']:
-                role = 'user' # Fallback
-            messages.append({"role": role, "content": content})
+        if not openai_scheduler.enabled:
+            yield MISSING_KEY_MESSAGE
+            return
 
-        # Add current prompt
-        messages.append({"role": "user", "content": prompt})
+        built = self._build_prompt(prompt, history, context, system_instruction, context_chunks)
 
-        # Retry Logic for Rate Limits / Transient Errors
-        retries = 3
-        
-        for attempt in range(retries):
-            try:
-                logger.info(f"Sending to OpenAI ({self.model_name}). Attempt {attempt+1}")
-                response = await self.client.chat.completions.create(
+        # The scheduler retries opening the stream; once tokens have been
+        # forwarded a failure ends the stream.
+        stream = None
+        started = False
+        usage = None
+        streamed: List[str] = []
+        sent_at = time.perf_counter()
+        try:
+            logger.info(f"Streaming from OpenAI ({self.model_name})")
+            stream = await openai_scheduler.call(
+                "chat",
+                lambda: openai_scheduler.client.chat.completions.create(
                     model=self.model_name,
-                    messages=messages,
+                    messages=built.messages,
                     temperature=0.7,
-                    max_tokens=1000
-                )
-                return response.choices[0].message.content
-            except Exception as e:
-                error_str = str(e)
-                logger.error(f"OpenAI Error (Attempt {attempt+1}): {error_str}")
-                
-                # Check for rate limits or server errors
-                if "429" in error_str or "500" in error_str or "503" in error_str:
-                    if attempt < retries - 1:
-                        wait = 2 * (attempt + 1)
-                        logger.warning(f"Retrying in {wait}s...")
-                        await asyncio.sleep(wait)
-                        continue
-                
-                # Fatal or max retries reached
-                return "I apologize, but I am currently experiencing connection issues. Please try again later."
+                    max_tokens=MAX_COMPLETION_TOKENS,
+                    stream=True,
+                    # Token counts arrive in a last chunk without choices
+                    stream_options={"include_usage": True}
+                ),
+                tokens=built.total_tokens + MAX_COMPLETION_TOKENS,
+                priority=INTERACTIVE
+            )
+            async for chunk in stream:
+                if chunk.usage:
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    if not started:
+                        metrics.observe("llm_first_token", time.perf_counter() - sent_at)
+                    started = True
+                    streamed.append(delta)
+                    yield delta
+        except Exception as e:
+            logger.error(f"OpenAI Stream Error: {e}")
+            if started:
+                raise
+            yield CONNECTION_ERROR_MESSAGE
+        finally:
+            # Also runs when the client disconnects and the generator is
+            # cancelled or closed, which aborts the upstream HTTP request.
+            if stream is not None:
+                await stream.close()
+                self._record_usage(usage, built, "".join(streamed))
+            metrics.observe("llm", time.perf_counter() - sent_at)
+
+    def _record_usage(self, usage: Any, built: BuiltPrompt, completion: str = ""):
+        # Estimated when the API reported no usage (e.g. a stream cut short)
+        if usage is not None:
+            metrics.inc("llm_prompt_tokens_total", usage.prompt_tokens)
+            metrics.inc("llm_completion_tokens_total", usage.completion_tokens)
+        else:
+            metrics.inc("llm_prompt_tokens_total", built.total_tokens)
+            metrics.inc("llm_completion_tokens_total", self.prompt_builder.count(completion) if completion else 0)
+
+    def _build_prompt(
+        self,
+        prompt: str,
+        history: List[Dict[str, str]],
+        context: str,
+        system_instruction: Optional[str],
+        context_chunks: Optional[List[Dict]] = None
+    ) -> BuiltPrompt:
+        if context_chunks is None:
+            context_chunks = [{"text": context, "score": 1.0}] if context else []
+
+        built = self.prompt_builder.build(prompt, history, context_chunks, system_instruction)
+        logger.info(
+            f"Prompt: {built.total_tokens} tokens "
+            f"(system {built.system_tokens}, context {built.context_tokens} from "
+            f"{built.chunks_used} chunks, {built.chunks_dropped} dropped, history "
+            f"{built.history_tokens} from {built.history_used} msgs, {built.history_dropped} dropped)"
+        )
+        return built
@@ -0,0 +1,176 @@
+import logging
+from typing import Callable, Dict, List, NamedTuple, Optional
+from app.core.config import settings
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Chat format adds a few tokens per message for role and separators
+MESSAGE_OVERHEAD_TOKENS = 4
+# Below this, a truncated chunk is more noise than context
+MIN_TRUNCATED_CHUNK_TOKENS = 64
+
+DEFAULT_SYSTEM_TEMPLATE = (
+    "Role: You are an intelligent business assistant. \n"
+    "Context: Use the following business knowledge to answer: \n{context}\n"
+    "Instructions:\n"
+    "1. Understand the user's question first.\n"
+    "2. If the answer is not in the context or chat history, ask for clarification.\n"
+    "3. Do NOT hallucinate. Stick to facts.\n"
+    "4. Be professional but human-like. Vary your greetings.\n"
+    "5. IMPORTANT: If unclear, ask a question back.\n"
+)
+
+def format_chunk(chunk: Dict) -> str:
+    """
+    Render one retrieved chunk the way it appears in the system prompt.
+    Chunks without a source (e.g. a caller-supplied context string) are used as-is.
+    """
+    source = chunk.get("metadata", {}).get("source")
+    if source is None:
+        return chunk["text"]
+    return f"---\nSource: {source}\nContent: {chunk['text']}\n"
+
+
+class BuiltPrompt(NamedTuple):
+    messages: List[Dict[str, str]]
+    total_tokens: int
+    system_tokens: int
+    context_tokens: int
+    history_tokens: int
+    chunks_used: int
+    chunks_dropped: int
+    history_used: int
+    history_dropped: int
+
+
+class PromptBuilder:
+    """
+    Assembles chat messages within a token budget.
+
+    The system prompt and the user's question are always sent. What is left
+    of PROMPT_MAX_TOKENS goes first to retrieved context (capped at
+    PROMPT_CONTEXT_TOKENS) and then to history (capped at
+    PROMPT_HISTORY_TOKENS). Context is filled best-scoring chunk first and
+    the last chunk that does not fit is truncated; history is filled newest
+    turn first, so the oldest turns are dropped.
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        self._count = make_token_counter(model)
+
+    def count(self, text: str) -> int:
+        return self._count(text)
+
+    def build(
+        self,
+        prompt: str,
+        history: List[Dict[str, str]],
+        context_chunks: List[Dict],
+        system_instruction: Optional[str] = None
+    ) -> BuiltPrompt:
+        template = system_instruction or DEFAULT_SYSTEM_TEMPLATE
+        uses_context = system_instruction is None
+
+        fixed = (
+            self.count(template.replace("{context}", ""))
+            + self.count(prompt)
+            + 2 * MESSAGE_OVERHEAD_TOKENS
+        )
+        available = max(0, settings.PROMPT_MAX_TOKENS - fixed)
+
+        # 1. Context, best-scoring chunks first
+        context_parts: List[str] = []
+        context_tokens = 0
+        if uses_context:
+            budget = min(settings.PROMPT_CONTEXT_TOKENS, available)
+            ranked = sorted(context_chunks, key=lambda c: c.get("score", 0.0), reverse=True)
+            for chunk in ranked:
+                text = format_chunk(chunk)
+                tokens = self.count(text)
+                if context_tokens + tokens > budget:
+                    remaining = budget - context_tokens
+                    if remaining >= MIN_TRUNCATED_CHUNK_TOKENS:
+                        text = self._truncate(text, remaining)
+                        context_parts.append(text)
+                        context_tokens += self.count(text)
+                    break
+                context_parts.append(text)
+                context_tokens += tokens
+
+        # 2. History, newest turns first
+        history_budget = min(settings.PROMPT_HISTORY_TOKENS, available - context_tokens)
+        kept_history: List[Dict[str, str]] = []
+        history_tokens = 0
+        for msg in reversed(history):
+            role = msg.get('role', 'user')
+            content = msg.get('content', '').strip()
+            if not content:
+                continue
+            if role not in ['user', 'assistant', 'system']:
+                role = 'user' # Fallback
+            tokens = self.count(content) + MESSAGE_OVERHEAD_TOKENS
+            if history_tokens + tokens > history_budget:
+                break
+            kept_history.append({"role": role, "content": content})
+            history_tokens += tokens
+        kept_history.reverse()
+
+        system_prompt = template.replace("{context}", "".join(context_parts)) if uses_context else template
+        messages = [{"role": "system", "content": system_prompt}]
+        messages.extend(kept_history)
+        messages.append({"role": "user", "content": prompt})
+
+        system_tokens = self.count(system_prompt) + MESSAGE_OVERHEAD_TOKENS
+        total = system_tokens + history_tokens + self.count(prompt) + MESSAGE_OVERHEAD_TOKENS
+
+        return BuiltPrompt(
+            messages=messages,
+            total_tokens=total,
+            system_tokens=system_tokens,
+            context_tokens=context_tokens,
+            history_tokens=history_tokens,
+            chunks_used=len(context_parts),
+            chunks_dropped=len(context_chunks) - len(context_parts) if uses_context else len(context_chunks),
+            history_used=len(kept_history),
+            history_dropped=len(history) - len(kept_history)
+        )
+
+    def _truncate(self, text: str, max_tokens: int) -> str:
+        if self._encoding is not None:
+            return self._encoding.decode(self._encoding.encode(text, disallowed_special=())[:max_tokens])
+        return text[:max_tokens * 4]
+
+    @property
+    def _encoding(self):
+        return getattr(self._count, "encoding", None)
+
+
+def make_token_counter(model: str) -> Callable[[str], int]:
+    """
+    Exact counts via tiktoken when available; otherwise ~4 chars per token,
+    which is close for English text.
+    """
+    if tiktoken is not None:
+        try:
+            try:
+                encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                encoding = tiktoken.get_encoding("o200k_base")
+
+            def count(text: str) -> int:
+                return len(encoding.encode(text, disallowed_special=()))
+            count.encoding = encoding
+            return count
+        except Exception as e:
+            # e.g. the encoding file cannot be downloaded
+            logger.warning(f"tiktoken unavailable ({e}). Estimating token counts.")
+
+    def estimate(text: str) -> int:
+        return len(text) // 4 + 1
+    return estimate
@@ -0,0 +1,333 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+import numpy as np
+import openai
+from openai import AsyncOpenAI
+from app.core.config import settings
+
+try:
+    import httpx2 as sdk_httpx  # openai>=3 runs on httpx2
+except ImportError:  # older openai releases run on httpx
+    import httpx as sdk_httpx
+
+logger = logging.getLogger(__name__)
+
+# Priority lanes, lowest served first
+INTERACTIVE = 0  # Chat completions and query embeddings: a user is waiting
+BULK = 1  # Ingestion embeddings
+LANES = {INTERACTIVE: "interactive", BULK: "bulk"}
+
+# Statuses worth retrying; anything else (400, 401, 404...) fails at once
+RETRY_STATUSES = frozenset({408, 409, 429, 500, 502, 503, 504})
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 20.0
+# Longest Retry-After honoured; chat stage budgets cut in well before
+MAX_RETRY_AFTER_SECONDS = 60.0
+# Recent queueing delays kept per lane for the percentile stats
+STATS_WINDOW = 1024
+
+T = TypeVar("T")
+
+class RateWindow:
+    """
+    At most `per_minute` / 60 units in any one-second window (0 = unlimited;
+    limits under 60 per minute get a longer window holding one unit).
+
+    OpenAI enforces limits over short quantized windows (600 RPM may mean
+    10 per second), so a client spending a minute's budget in a burst would
+    draw 429s. A token bucket still lets a full bucket plus a second of
+    refill through within one window; a sliding window never does.
+
+    A call larger than the window allows (a 9k-token completion against
+    30k TPM) goes out once the window is empty, then holds it for as long
+    as the limit takes to cover it (18 s here), so the per-minute rate
+    holds for oversized calls too.
+    """
+
+    def __init__(self, per_minute: int):
+        per_minute = max(0, per_minute)
+        self.window = max(1.0, 60 / per_minute) if per_minute else 1.0
+        self.limit = per_minute * self.window / 60
+        # (expiry, amount) of what was taken and still counts, a heap
+        self._taken: List[Tuple[float, float]] = []
+        self._used = 0.0
+
+    @property
+    def unlimited(self) -> bool:
+        return self.limit == 0
+
+    def wait_time(self, amount: float, reserve: float = 0.0) -> float:
+        """
+        Seconds until `amount` can be taken while leaving `reserve` (a share
+        of the limit) unused.
+        """
+        if self.unlimited:
+            return 0.0
+        now = time.monotonic()
+        self._expire(now)
+        allowed = self._allowed(reserve)
+        # Larger than the limit: wait for an empty window rather than forever
+        excess = self._used + min(amount, allowed) - allowed
+        if excess <= 0:
+            return 0.0
+        for expires, taken in sorted(self._taken):
+            excess -= taken
+            if excess <= 0:
+                return max(0.0, expires - now)
+        return 0.0
+
+    def take(self, amount: float, reserve: float = 0.0):
+        if not self.unlimited:
+            now = time.monotonic()
+            self._expire(now)
+            # What exceeds the allowance is paid for with the windows after this one
+            held = self.window * max(1.0, amount / self._allowed(reserve))
+            heapq.heappush(self._taken, (now + held, amount))
+            self._used += amount
+
+    def _allowed(self, reserve: float) -> float:
+        return max(1.0, self.limit * (1 - reserve))
+
+    def _expire(self, now: float):
+        while self._taken and self._taken[0][0] <= now:
+            self._used -= heapq.heappop(self._taken)[1]
+        if not self._taken:
+            self._used = 0.0
+
+
+class _Limiter:
+    """Rate limits and waiting requests of one API (chat, embeddings)."""
+
+    def __init__(self, rpm: int, tpm: int):
+        self.requests = RateWindow(rpm)
+        self.tokens = RateWindow(tpm)
+        # (priority, arrival, tokens, future) of requests waiting for capacity
+        self.waiters: List[Tuple[int, int, int, asyncio.Future]] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+        # Set by a 429: every request to this API waits it out
+        self.paused_until = 0.0
+
+    def wait_time(self, tokens: int, priority: int) -> float:
+        reserve = _reserve(priority)
+        return max(
+            self.paused_until - time.monotonic(),
+            self.requests.wait_time(1, reserve),
+            self.tokens.wait_time(tokens, reserve)
+        )
+
+    def take(self, tokens: int, priority: int):
+        reserve = _reserve(priority)
+        self.requests.take(1, reserve)
+        self.tokens.take(tokens, reserve)
+
+
+def _reserve(priority: int) -> float:
+    # Bulk work may not dip into the share of each limit kept for chat
+    return 1 - min(1.0, max(0.0, settings.OPENAI_BULK_SHARE)) if priority == BULK else 0.0
+
+
+class _LaneStats:
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.failures = 0
+        self.waits: Deque[float] = deque(maxlen=STATS_WINDOW)
+
+    def to_dict(self) -> Dict[str, float]:
+        waits = list(self.waits)
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "failures": self.failures,
+            "avg_wait_ms": round(float(np.mean(waits)) * 1000, 3) if waits else 0.0,
+            "p95_wait_ms": round(float(np.percentile(waits, 95)) * 1000, 3) if waits else 0.0
+        }
+
+
+class OpenAIScheduler:
+    """
+    One gate for every OpenAI call of this worker.
+
+    Each API has requests-per-minute and tokens-per-minute limits
+    (OPENAI_CHAT_RPM/TPM, OPENAI_EMBEDDING_RPM/TPM; 0 = no client-side
+    limit). A call that does not fit waits in a priority queue: INTERACTIVE
+    calls (chat, query embeddings) go before BULK ones (ingestion), and bulk
+    calls may only use OPENAI_BULK_SHARE of each limit, so a large ingest
+    never leaves a chat waiting for a refill.
+
+    Failed calls are retried up to OPENAI_MAX_RETRIES times on rate limits,
+    server errors and connection errors. The delay follows the Retry-After
+    header when there is one, else exponential backoff with jitter. A 429
+    also pauses every queued call to that API for the same time, instead
+    of letting them each hit the limit.
+
+    All calls share one AsyncOpenAI client over a pooled HTTP client that
+    keeps connections alive between bursts.
+    """
+
+    def __init__(self):
+        self._client: Optional[AsyncOpenAI] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._limiters: Dict[str, _Limiter] = {}
+        self._arrivals = itertools.count()
+        self._lanes = {priority: _LaneStats() for priority in LANES}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(settings.OPENAI_API_KEY)
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        self._check_loop()
+        if self._client is None:
+            self._client = AsyncOpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                base_url=settings.OPENAI_BASE_URL or None,
+                timeout=settings.OPENAI_TIMEOUT_SECONDS,
+                # Retries are ours, so they respect the limits and priorities
+                max_retries=0,
+                http_client=openai.DefaultAsyncHttpxClient(
+                    limits=sdk_httpx.Limits(
+                        max_connections=settings.OPENAI_MAX_CONNECTIONS,
+                        max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+                        keepalive_expiry=settings.OPENAI_KEEPALIVE_SECONDS
+                    )
+                )
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    async def call(
+        self,
+        api: str,
+        request: Callable[[], Awaitable[T]],
+        tokens: int = 0,
+        priority: int = INTERACTIVE
+    ) -> T:
+        """
+        Run `request` (a call on `client`) once the `api` limits allow it,
+        retrying transient failures. `tokens` is what the call counts
+        against the TPM limit. Raises the last error once retries run out.
+        """
+        self._check_loop()
+        limiter = self._limiter(api)
+        lane = self._lanes[priority]
+        for attempt in range(max(0, settings.OPENAI_MAX_RETRIES) + 1):
+            queued = time.perf_counter()
+            await self._admit(limiter, tokens, priority)
+            lane.waits.append(time.perf_counter() - queued)
+            lane.requests += 1
+            try:
+                return await request()
+            except Exception as e:
+                status = getattr(e, "status_code", None)
+                if status == 429:
+                    lane.rate_limited += 1
+                delay = _retry_delay(e, attempt)
+                if delay is None or attempt >= settings.OPENAI_MAX_RETRIES:
+                    lane.failures += 1
+                    raise
+                lane.retries += 1
+                if status == 429:
+                    limiter.paused_until = max(limiter.paused_until, time.monotonic() + delay)
+                logger.warning(f"OpenAI {api} call failed ({status or e.__class__.__name__}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    def stats(self) -> Dict:
+        return {
+            **{name: self._lanes[priority].to_dict() for priority, name in LANES.items()},
+            "queued": sum(len(limiter.waiters) for limiter in self._limiters.values())
+        }
+
+    async def _admit(self, limiter: _Limiter, tokens: int, priority: int):
+        if not limiter.waiters and limiter.wait_time(tokens, priority) <= 0:
+            limiter.take(tokens, priority)
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(limiter.waiters, (priority, next(self._arrivals), tokens, future))
+        self._dispatch(limiter)
+        await future
+
+    def _dispatch(self, limiter: _Limiter):
+        """Admit waiting calls, best priority first, while capacity lasts."""
+        if limiter.timer is not None:
+            limiter.timer.cancel()
+            limiter.timer = None
+        while limiter.waiters:
+            priority, _, tokens, future = limiter.waiters[0]
+            if future.done():
+                # Its caller was cancelled (e.g. a chat stage timed out)
+                heapq.heappop(limiter.waiters)
+                continue
+            wait = limiter.wait_time(tokens, priority)
+            if wait > 0:
+                limiter.timer = asyncio.get_running_loop().call_later(wait, self._dispatch, limiter)
+                return
+            heapq.heappop(limiter.waiters)
+            limiter.take(tokens, priority)
+            future.set_result(None)
+
+    def _limiter(self, api: str) -> _Limiter:
+        limiter = self._limiters.get(api)
+        if limiter is None:
+            if api == "chat":
+                limiter = _Limiter(settings.OPENAI_CHAT_RPM, settings.OPENAI_CHAT_TPM)
+            else:
+                limiter = _Limiter(settings.OPENAI_EMBEDDING_RPM, settings.OPENAI_EMBEDDING_TPM)
+            self._limiters[api] = limiter
+        return limiter
+
+    def _check_loop(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if loop is not self._loop:
+            # Pooled connections and queued calls belong to the old loop
+            self._loop, self._client, self._limiters = loop, None, {}
+
+
+def _retry_delay(error: Exception, attempt: int) -> Optional[float]:
+    """Seconds to wait before retrying after `error`, or None if it is final."""
+    if isinstance(error, openai.APIStatusError):
+        if error.status_code not in RETRY_STATUSES:
+            return None
+        retry_after = _retry_after(error.response.headers)
+        if retry_after is not None:
+            # A little jitter so callers told the same time do not return together
+            return min(retry_after, MAX_RETRY_AFTER_SECONDS) + random.uniform(0, BACKOFF_BASE_SECONDS)
+    elif not isinstance(error, openai.APIConnectionError):
+        return None
+    # Equal jitter: at least half the exponential step, never a busy retry
+    step = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt)
+    return step / 2 + random.uniform(0, step / 2)
+
+def _retry_after(headers) -> Optional[float]:
+    """Retry-After (seconds or HTTP date) or retry-after-ms, in seconds."""
+    try:
+        if headers.get("retry-after-ms"):
+            return max(0.0, float(headers["retry-after-ms"]) / 1000)
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+openai_scheduler = OpenAIScheduler()
@@ -1,14 +1,31 @@
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, Response
 from app.core.config import settings
-from app.schemas import ChatRequest, ChatResponse, IngestResponse
+from app.schemas import ChatRequest, ChatResponse, IngestResponse, IngestJobStatus, KnowledgeDeleteResponse
 from app.llm.openai import OpenAILLM
-from app.memory import MemoryManager
+from app.llm.scheduler import openai_scheduler
+from app.memory import AsyncMemoryManager
+from app.chat import gather_inputs, remember_answer, run_stage, StageTimeout
+from app.core.redis_client import async_redis_client, async_redis_binary_client
+from app.embedding_cache import embedding_cache
+from app.answer_cache import answer_cache
 from app.rag import rag_manager
-from app.utils.loaders import loader
+from app.chunking import get_chunker
+from app.compactor import store_compactor
+from app.store_residency import store_residency
+from app.metrics import metrics
+from app.jobs import ingest_queue, QueueFull
+from app.ingest import ingest_text_job, ingest_url_job, ingest_crawl_job, ingest_file_job
+from app.utils.ocr import ocr_processor
+from app.utils.crawler import web_crawler
+import json
 import logging
 import os
 import shutil
+import time
+import uuid
+from typing import Optional
 
 # Setup Logging
 logging.basicConfig(level=logging.INFO)
@@ -31,108 +48,298 @@ openai_llm = OpenAILLM()
 def get_llm():
     return openai_llm
 
+# Read from their owners on each scrape of /metrics; the listed keys are running totals
+metrics.register("embedding_cache", embedding_cache.stats, counters=("memory_hits", "redis_hits", "misses"))
+metrics.register(
+    "query_embedding_batcher", rag_manager.query_batcher.stats, counters=("requests", "batches", "failures")
+)
+metrics.register(
+    "openai_scheduler", openai_scheduler.stats, counters=("requests", "retries", "rate_limited", "failures")
+)
+metrics.register(
+    "vector_stores", store_residency.stats,
+    counters=("hits", "loads", "coalesced_loads", "evictions", "evicted_bytes")
+)
+metrics.register("answer_cache", answer_cache.stats, counters=("hits", "misses", "invalidations"))
+
+@app.on_event("startup")
+async def startup():
+    await ingest_queue.start()
+    await store_compactor.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await ingest_queue.stop()
+    await store_compactor.stop()
+    ocr_processor.shutdown()
+    await web_crawler.close()
+    await openai_scheduler.close()
+    await async_redis_client.close()
+    await async_redis_binary_client.close()
+
 @app.get("/health")
 async def health_check():
-    return {"status": "ok", "version": settings.VERSION}
+    return {
+        "status": "ok",
+        "version": settings.VERSION,
+        "embedding_cache": embedding_cache.stats(),
+        "query_embedding_batcher": rag_manager.query_batcher.stats(),
+        "openai_scheduler": openai_scheduler.stats(),
+        "vector_stores": store_residency.stats(),
+        "answer_cache": answer_cache.stats()
+    }
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """
+    Prometheus scrape target: per-stage latency histograms and counters of
+    this worker process, labelled by endpoint (and business, if enabled).
+    """
+    if not metrics.enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled.")
+    from starlette.concurrency import run_in_threadpool
+
+    # Large with per-business labels; keep it off the loop
+    text = await run_in_threadpool(metrics.render)
+    return Response(text, media_type="text/plain; version=0.0.4; charset=utf-8")
 
 @app.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest):
+async def chat_endpoint(request: ChatRequest, background_tasks: BackgroundTasks):
     """
     Main Chat Endpoint.
-    1. Retrieve History
-    2. Retrieve Context (RAG)
-    3. LLM Generation
-    4. Save History
+    1. Retrieve History and Context (RAG) concurrently, each within its budget
+    2. LLM Generation (skipped on a semantic answer cache hit)
+    3. Save History (one Redis round-trip, after the response is sent)
     """
+    started = time.perf_counter()
+    metrics.bind("chat", request.business_id)
     try:
-        memory = MemoryManager(request.business_id, request.session_id)
-        history = memory.get_history()
-        
-        # RAG Search
-        context = await rag_manager.search(request.business_id, request.message)
-        
-        llm = get_llm()
-        response_text = await llm.generate_response(
-            prompt=request.message,
-            history=history,
-            context=context
-        )
-        
+        memory = AsyncMemoryManager(request.business_id, request.session_id)
+        inputs = await gather_inputs(memory, request.business_id, request.message)
+
+        if inputs.cached_answer is not None:
+            response_text = inputs.cached_answer
+        else:
+            llm = get_llm()
+            response_text = await run_stage(
+                "llm",
+                llm.generate_response(
+                    prompt=request.message,
+                    history=inputs.history,
+                    context_chunks=inputs.context_chunks
+                ),
+                settings.CHAT_LLM_TIMEOUT
+            )
+            remember_answer(request.business_id, inputs, response_text)
+
         # Update Memory
-        memory.add_message("user", request.message)
-        memory.add_message("assistant", response_text)
-        
+        background_tasks.add_task(
+            memory.add_messages,
+            [("user", request.message), ("assistant", response_text)]
+        )
+
         return ChatResponse(
             response=response_text,
             session_id=request.session_id,
             business_id=request.business_id
         )
 
+    except StageTimeout as e:
+        logger.error(f"Chat Timeout: {e}")
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         logger.error(f"Chat Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        metrics.observe("total", time.perf_counter() - started)
 
-@app.post("/ingest/text")
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """
+    Streaming Chat Endpoint (Server-Sent Events).
+    Same pipeline as /chat, but response tokens are forwarded as they arrive:
+    - data: {"token": "..."}     one per fragment
+    - event: done                once the response is complete
+    - event: error               if generation fails mid-stream
+    History is saved only when the stream completes. If the client
+    disconnects, the upstream OpenAI request is cancelled.
+    """
+    started = time.perf_counter()
+    metrics.bind("chat_stream", request.business_id)
+    try:
+        memory = AsyncMemoryManager(request.business_id, request.session_id)
+        inputs = await gather_inputs(memory, request.business_id, request.message)
+    except Exception as e:
+        logger.error(f"Chat Stream Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    llm = get_llm()
+
+    async def event_stream():
+        parts = []
+        try:
+            if inputs.cached_answer is not None:
+                parts.append(inputs.cached_answer)
+                yield _sse({"token": inputs.cached_answer})
+            else:
+                try:
+                    async for token in llm.stream_response(
+                        prompt=request.message,
+                        history=inputs.history,
+                        context_chunks=inputs.context_chunks
+                    ):
+                        parts.append(token)
+                        yield _sse({"token": token})
+                except Exception as e:
+                    logger.error(f"Chat Stream Error: {e}")
+                    yield _sse({"detail": str(e)}, event="error")
+                    return
+
+            response_text = "".join(parts)
+            yield _sse({"session_id": request.session_id, "business_id": request.business_id}, event="done")
+            remember_answer(request.business_id, inputs, response_text)
+            await memory.add_messages([("user", request.message), ("assistant", response_text)])
+        finally:
+            # Also when the client disconnects mid-stream
+            metrics.observe("total", time.perf_counter() - started)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # Keep proxies (e.g. nginx) from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _sse(data: dict, event: str = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+@app.post("/ingest/text", status_code=202)
 async def ingest_text(
     business_id: str = Form(...),
-    text: str = Form(...)
+    text: str = Form(...),
+    source: Optional[str] = Form(None),
+    chunking: Optional[str] = Form(None)
 ):
-    await rag_manager.ingest_document(business_id, text, "Manual Text Input")
-    return {"status": "success", "message": "Text ingested."}
+    """
+    With a `source` name, re-posting replaces that source's previous text;
+    without one, every text is added to the knowledge base.
+    """
+    chunker = _get_chunker(chunking)
+    replace = source is not None
+    job = await _submit_job(
+        business_id, "text", source or "Manual Text Input",
+        lambda job: ingest_text_job(job, text, chunker, replace)
+    )
+    return {"status": "queued", "job_id": job.id, "message": "Text queued for ingestion."}
 
-@app.post("/ingest/url")
+@app.post("/ingest/url", status_code=202)
 async def ingest_url(
     business_id: str = Form(...),
-    url: str = Form(...)
+    url: str = Form(...),
+    chunking: Optional[str] = Form(None)
 ):
-    try:
-        from app.utils.web import web_loader
-        from starlette.concurrency import run_in_threadpool
-        
-        # Run blocking scraping in threadpool
-        content = await run_in_threadpool(web_loader.load, url)
-        
-        await rag_manager.ingest_document(business_id, content, url)
-        return {"status": "success", "message": f"Website Content Ingested: {url}"}
-    except Exception as e:
-        logger.error(f"URL Ingestion Error: {e}")
-        raise HTTPException(status_code=400, detail=str(e))
+    chunker = _get_chunker(chunking)
+    job = await _submit_job(business_id, "url", url, lambda job: ingest_url_job(job, url, chunker))
+    return {"status": "queued", "job_id": job.id, "message": f"Website queued for ingestion: {url}"}
+
+@app.post("/ingest/crawl", status_code=202)
+async def ingest_crawl(
+    business_id: str = Form(...),
+    url: str = Form(...),
+    max_pages: Optional[int] = Form(None),
+    max_depth: Optional[int] = Form(None),
+    chunking: Optional[str] = Form(None)
+):
+    """
+    Crawl a whole website (sitemap and same-site links) and ingest every page.
+    """
+    chunker = _get_chunker(chunking)
+    job = await _submit_job(
+        business_id, "crawl", url,
+        lambda job: ingest_crawl_job(job, url, max_pages, max_depth, chunker)
+    )
+    return {"status": "queued", "job_id": job.id, "message": f"Website queued for crawling: {url}"}
 
-@app.post("/ingest/file")
+@app.post("/ingest/file", status_code=202)
 async def ingest_file(
     business_id: str = Form(...),
-    file: UploadFile = File(...)
+    file: UploadFile = File(...),
+    chunking: Optional[str] = Form(None)
 ):
+    chunker = _get_chunker(chunking)
+    try:
+        # A full queue answers before the upload is written to disk
+        ingest_queue.check_capacity()
+    except QueueFull as e:
+        raise _queue_full(business_id, "file", e)
+
     try:
         from starlette.concurrency import run_in_threadpool
-        
-        # Save temp file
+
+        # Save temp file; the upload stream is closed once we respond.
+        # A random prefix keeps concurrent uploads of the same name apart.
         temp_dir = "temp_ingest"
         os.makedirs(temp_dir, exist_ok=True)
-        file_path = f"{temp_dir}/{file.filename}"
-        
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-            
-        # Load content (Non-blocking now)
-        content = await run_in_threadpool(loader.load, file_path)
-        
-        if not content:
-            os.remove(file_path)
-            raise HTTPException(status_code=400, detail="Could not extract text from file.")
-            
-        # Ingest
-        await rag_manager.ingest_document(business_id, content, file.filename)
-        
-        # Cleanup
-        os.remove(file_path)
-        
-        return {"status": "success", "message": f"File {file.filename} processed."}
+        file_path = f"{temp_dir}/{uuid.uuid4().hex}_{os.path.basename(file.filename)}"
+
+        def save():
+            with open(file_path, "wb") as buffer:
+                shutil.copyfileobj(file.file, buffer)
+        await run_in_threadpool(save)
 
     except Exception as e:
         logger.error(f"Ingest Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+    try:
+        job = await _submit_job(business_id, "file", file.filename, lambda job: ingest_file_job(job, file_path, chunker))
+    except HTTPException:
+        # The queue filled up while the file was being saved
+        os.remove(file_path)
+        raise
+    return {"status": "queued", "job_id": job.id, "message": f"File {file.filename} queued for processing."}
+
+@app.get("/ingest/jobs/{job_id}", response_model=IngestJobStatus)
+async def ingest_job_status(job_id: str):
+    status = await ingest_queue.get(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return status
+
+@app.delete("/knowledge/{business_id}/source", response_model=KnowledgeDeleteResponse)
+async def delete_knowledge_source(business_id: str, source: str):
+    """
+    Remove everything ingested from one source (URL, file name or
+    "Manual Text Input"), e.g. before re-uploading a corrected document.
+    """
+    deleted = await rag_manager.delete_source(business_id, source)
+    return {"business_id": business_id, "source": source, "chunks_deleted": deleted}
+
+@app.delete("/knowledge/{business_id}", response_model=KnowledgeDeleteResponse)
+async def delete_knowledge(business_id: str):
+    """
+    Remove a business' whole knowledge base.
+    """
+    deleted = await rag_manager.delete_business(business_id)
+    return {"business_id": business_id, "chunks_deleted": deleted}
+
+def _get_chunker(strategy: Optional[str]):
+    try:
+        return get_chunker(strategy)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def _submit_job(business_id: str, kind: str, source: str, work):
+    try:
+        return await ingest_queue.submit(business_id, kind, source, work)
+    except QueueFull as e:
+        raise _queue_full(business_id, kind, e)
+
+def _queue_full(business_id: str, kind: str, error: QueueFull) -> HTTPException:
+    logger.warning(f"Rejecting {kind} ingest for {business_id}: {error}")
+    return HTTPException(status_code=503, detail=str(error), headers={"Retry-After": "30"})
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
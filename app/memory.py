@@ -1,7 +1,8 @@
 import json
-from app.core.redis_client import get_redis
+from app.core.redis_client import get_redis, get_async_redis
 from app.core.config import settings
-from typing import List, Dict
+from app.metrics import metrics
+from typing import List, Dict, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
@@ -48,3 +49,63 @@ class MemoryManager:
 
     def clear_history(self):
         self.redis.delete(self.key)
+
+
+class AsyncMemoryManager:
+    """
+    asyncio variant of MemoryManager backed by redis.asyncio.
+    Same key layout, window and TTL, so both can be used on the same session.
+    """
+    def __init__(self, business_id: str, session_id: str):
+        self.business_id = business_id
+        self.session_id = session_id
+        self.redis = get_async_redis()
+        # Key: memory:{business_id}:{session_id}
+        self.key = f"memory:{business_id}:{session_id}"
+
+    async def add_message(self, role: str, content: str):
+        """
+        Add a message to the history (RPUSH + LTRIM + EXPIRE in one pipeline).
+        """
+        try:
+            msg = json.dumps({"role": role, "content": content})
+            pipe = self.redis.pipeline()
+            pipe.rpush(self.key, msg)
+            pipe.ltrim(self.key, -settings.CHAT_HISTORY_WINDOW, -1)
+            pipe.expire(self.key, settings.CHAT_TTL_SECONDS)
+            with metrics.stage("history_write"):
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to add message to memory: {e}")
+
+    async def add_messages(self, messages: List[Tuple[str, str]]):
+        """
+        Append several (role, content) messages in a single round-trip.
+        """
+        if not messages:
+            return
+        try:
+            items = [json.dumps({"role": role, "content": content}) for role, content in messages]
+            pipe = self.redis.pipeline()
+            pipe.rpush(self.key, *items)
+            pipe.ltrim(self.key, -settings.CHAT_HISTORY_WINDOW, -1)
+            pipe.expire(self.key, settings.CHAT_TTL_SECONDS)
+            with metrics.stage("history_write"):
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to add messages to memory: {e}")
+
+    async def get_history(self) -> List[Dict[str, str]]:
+        """
+        Retrieve chat history.
+        """
+        try:
+            with metrics.stage("history_read"):
+                items = await self.redis.lrange(self.key, 0, -1)
+            return [json.loads(i) for i in items]
+        except Exception as e:
+            logger.error(f"Failed to retrieve history: {e}")
+            return []
+
+    async def clear_history(self):
+        await self.redis.delete(self.key)
@@ -0,0 +1,187 @@
+import bisect
+import logging
+import math
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, FrozenSet, Iterable, List, Tuple
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "agent"
+# Upper bounds of the latency buckets, in seconds: Redis round trips to slow LLM answers
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNTERS = {
+    "chunks_embedded_total": "Chunks embedded and stored by ingestion.",
+    "llm_prompt_tokens_total": "Prompt tokens sent to the chat model.",
+    "llm_completion_tokens_total": "Completion tokens received from the chat model."
+}
+
+# (endpoint, business) that the work of the current request or job is recorded under
+_request: ContextVar[Tuple[str, str]] = ContextVar("metrics_request", default=("other", ""))
+
+Labels = Tuple[str, ...]
+
+class _Series:
+    __slots__ = ("buckets", "sum", "count")
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)  # The last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+
+class _StageTimer:
+    # A plain class: a generator-based context manager costs twice as much per block
+    __slots__ = ("_metrics", "_name", "_started")
+
+    def __init__(self, metrics: "Metrics", name: str):
+        self._metrics = metrics
+        self._name = name
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self._metrics.observe(self._name, time.perf_counter() - self._started)
+
+
+class Metrics:
+    """
+    Latency histograms and counters of this worker, in Prometheus text format.
+
+    Every observation is labelled with the endpoint (and, with
+    METRICS_BUSINESS_LABELS, the business) it was made for. `bind` sets
+    these for the current request or ingest job; they follow it into tasks
+    and threadpool calls through a context variable, so the code recording
+    a stage (a Redis read, a vector search...) does not need to be told.
+
+    Recording is a dict lookup and a few additions under a lock. Stats of
+    the caches, batcher, scheduler and store residency are not copied here
+    but read from their owners when /metrics is scraped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (stage, endpoint, business) -> latency histogram
+        self._stages: Dict[Labels, _Series] = {}
+        # counter name -> (endpoint, business) -> value
+        self._counters: Dict[str, Dict[Labels, float]] = {name: {} for name in COUNTERS}
+        # name -> (stats function, keys that only ever grow)
+        self._collectors: Dict[str, Tuple[Callable[[], Dict], FrozenSet[str]]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return settings.METRICS_ENABLED
+
+    def bind(self, endpoint: str, business_id: str = ""):
+        """Record what the current request or job does under `endpoint` (and `business_id`)."""
+        _request.set((endpoint, business_id if settings.METRICS_BUSINESS_LABELS else ""))
+
+    def stage(self, name: str) -> "_StageTimer":
+        """`with metrics.stage(name):` times the block as stage `name`, whether or not it raises."""
+        return _StageTimer(self, name)
+
+    def observe(self, stage: str, seconds: float):
+        if not settings.METRICS_ENABLED:
+            return
+        key = (stage,) + _request.get()
+        index = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+        with self._lock:
+            series = self._stages.get(key)
+            if series is None:
+                series = self._stages[key] = _Series()
+            series.buckets[index] += 1
+            series.sum += seconds
+            series.count += 1
+
+    def inc(self, counter: str, amount: float = 1):
+        if not settings.METRICS_ENABLED or not amount:
+            return
+        key = _request.get()
+        with self._lock:
+            values = self._counters[counter]
+            values[key] = values.get(key, 0) + amount
+
+    def stage_totals(self) -> Dict[Tuple[str, str], Tuple[int, float]]:
+        """(endpoint, stage) -> (observations, seconds), summed over businesses."""
+        totals: Dict[Tuple[str, str], Tuple[int, float]] = {}
+        with self._lock:
+            for (stage, endpoint, _), series in self._stages.items():
+                count, seconds = totals.get((endpoint, stage), (0, 0.0))
+                totals[(endpoint, stage)] = (count + series.count, seconds + series.sum)
+        return totals
+
+    def register(self, name: str, stats: Callable[[], Dict], counters: Iterable[str] = ()):
+        """
+        Export the numbers of `stats()` (e.g. a cache's stats) as gauges
+        `<name>_<key>`. Keys named in `counters` (totals such as hits or
+        retries, at any nesting level) are exported as counters
+        `<name>_<key>_total` instead.
+        """
+        self._collectors[name] = (stats, frozenset(counters))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            stages = [(key, list(series.buckets), series.sum, series.count) for key, series in self._stages.items()]
+            counters = {name: dict(values) for name, values in self._counters.items()}
+
+        name = f"{PREFIX}_stage_seconds"
+        lines += [f"# HELP {name} Latency of each stage of chat and ingest requests.", f"# TYPE {name} histogram"]
+        for (stage, endpoint, business), buckets, total, count in sorted(stages):
+            labels = _labels(stage=stage, endpoint=endpoint, business=business)
+            cumulative = 0
+            for bound, bucket in zip(LATENCY_BUCKETS + (math.inf,), buckets):
+                cumulative += bucket
+                le = "+Inf" if bound == math.inf else repr(bound)
+                lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f"{name}_sum{{{labels}}} {total!r}")
+            lines.append(f"{name}_count{{{labels}}} {count}")
+
+        for counter, help_text in COUNTERS.items():
+            name = f"{PREFIX}_{counter}"
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            for (endpoint, business), value in sorted(counters[counter].items()):
+                lines.append(f"{name}{{{_labels(endpoint=endpoint, business=business)}}} {_number(value)}")
+
+        for collector, (stats, monotonic) in self._collectors.items():
+            try:
+                values = _flatten(stats())
+            except Exception as e:
+                logger.warning(f"Metrics collector {collector} failed: {e}")
+                continue
+            for key, leaf, value in values:
+                name = f"{PREFIX}_{collector}_{key}"
+                if leaf in monotonic:
+                    lines += [f"# TYPE {name}_total counter", f"{name}_total {_number(value)}"]
+                else:
+                    lines += [f"# TYPE {name} gauge", f"{name} {_number(value)}"]
+        return "\n".join(lines) + "\n"
+
+
+def _labels(**labels: str) -> str:
+    return ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+def _flatten(stats: Dict, prefix: str = "") -> List[Tuple[str, str, float]]:
+    """
+    Numeric leaves of nested stats dicts as (key, leaf key, value), e.g.
+    ("interactive_retries", "retries", 3.0).
+    """
+    values = []
+    for leaf, value in stats.items():
+        key = f"{prefix}{leaf}"
+        if isinstance(value, dict):
+            values += _flatten(value, f"{key}_")
+        elif isinstance(value, (int, float)):
+            values.append((key, leaf, float(value)))
+    return values
+
+metrics = Metrics()
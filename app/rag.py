@@ -1,133 +1,496 @@
+import asyncio
+import hashlib
 import logging
-import numpy as np
-import openai
-from typing import List, Dict, Any
+import weakref
+from typing import List, Dict, Iterable, Iterator, Optional, Set, Tuple
 from app.core.config import settings
-from openai import OpenAI
+from app.vector_store import VectorStore
+from app.store_residency import store_residency
+from app.embedding_cache import embedding_cache
+from app.embedding_batcher import EmbeddingBatcher
+from app.llm.scheduler import openai_scheduler, INTERACTIVE, BULK
+from app.answer_cache import answer_cache
+from app.metrics import metrics
+from app.llm.prompt import format_chunk
+from app.chunking import BaseChunker, get_chunker
+from app.lexical_index import contains_terms, exact_terms, reciprocal_rank_fusion
+from app.jobs import IngestProgress
 
 logger = logging.getLogger(__name__)
 
-# Temporary in-memory store for POC if FAISS/Redis fails
-# Structure: { business_id: { "vectors": np.array, "texts": [], "metadata": [] } }
-GLOBAL_VECTOR_STORE = {}
+SEARCH_MODES = ("vector", "hybrid", "lexical")
 
 class RAGManager:
     def __init__(self):
-        if settings.OPENAI_API_KEY:
-            self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
-        else:
+        if not settings.OPENAI_API_KEY:
             logger.warning("No OPENAI_API_KEY. RAG will not work.")
-            self.client = None
+        self._source_locks: "weakref.WeakValueDictionary[Tuple[str, str], asyncio.Lock]" = weakref.WeakValueDictionary()
+        # Concurrent chat queries share embeddings requests
+        self.query_batcher = EmbeddingBatcher(self._embed_query_batch)
 
     async def embed_text(self, text: str) -> List[float]:
-        from starlette.concurrency import run_in_threadpool
-        return await run_in_threadpool(self._embed_sync, text)
+        return (await self._embed_batch([text], INTERACTIVE))[0]
 
     async def embed_query(self, text: str) -> List[float]:
-        from starlette.concurrency import run_in_threadpool
-        return await run_in_threadpool(self._embed_sync, text)
+        with metrics.stage("query_embedding"):
+            # Widget traffic repeats the same questions, give or take case and spacing;
+            # a hit skips the network call
+            cached = await embedding_cache.get(text, settings.EMBEDDING_MODEL, normalize=True)
+            if cached is not None:
+                return cached
+
+            if self.query_batcher.enabled:
+                vector = await self.query_batcher.embed(text)
+            else:
+                vector = (await self._embed_batch([text], INTERACTIVE))[0]
+            await embedding_cache.set(text, vector, settings.EMBEDDING_MODEL, normalize=True)
+            return vector
 
-    def _embed_sync(self, text: str) -> List[float]:
-        if not self.client:
+    async def embed_batch(
+        self,
+        texts: List[str],
+        progress: Optional[IngestProgress] = None,
+        priority: int = BULK
+    ) -> List[List[float]]:
+        """
+        Embed many texts with as few embeddings requests as possible.
+        Cached texts and duplicates within `texts` are embedded only once.
+        The rest are packed into batches that respect the per-request input
+        and token limits, and up to EMBEDDING_CONCURRENCY batches run at once,
+        in the scheduler's `priority` lane (ingestion by default).
+        The result is aligned with `texts`; failed entries are empty lists.
+        """
+        if not texts:
             return []
+
+        vectors = await embedding_cache.get_many(texts, settings.EMBEDDING_MODEL)
+
+        # Unique texts still to embed, in first-seen order
+        pending = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if progress is not None:
+            progress.chunks_embedded += len(texts) - len(pending)
+        if pending:
+            embedded = dict(zip(pending, await self._embed_uncached(pending, progress, priority)))
+            await embedding_cache.set_many(pending, [embedded[text] for text in pending], settings.EMBEDDING_MODEL)
+            vectors = [embedded[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+
+        return vectors
+
+    async def _embed_uncached(
+        self,
+        texts: List[str],
+        progress: Optional[IngestProgress] = None,
+        priority: int = BULK
+    ) -> List[List[float]]:
+        batches = self._make_batches(texts)
+        semaphore = asyncio.Semaphore(max(1, settings.EMBEDDING_CONCURRENCY))
+
+        async def run(batch: List[str]) -> List[List[float]]:
+            async with semaphore:
+                vectors = await self._embed_batch(batch, priority)
+            if progress is not None:
+                progress.chunks_embedded += len(batch)
+            return vectors
+
+        results = await asyncio.gather(*(run(batch) for batch in batches))
+        # gather preserves batch order, so flattening restores chunk order
+        return [vector for batch in results for vector in batch]
+
+    async def _embed_query_batch(self, texts: List[str]) -> List[List[float]]:
+        return await self._embed_batch(texts, INTERACTIVE)
+
+    async def _embed_batch(self, texts: List[str], priority: int) -> List[List[float]]:
+        if not openai_scheduler.enabled:
+            return [[] for _ in texts]
         try:
-            # OpenAI Embedding Model
-            response = self.client.embeddings.create(
-                input=text,
-                model="text-embedding-3-small"
+            response = await openai_scheduler.call(
+                "embeddings",
+                lambda: openai_scheduler.client.embeddings.create(input=texts, model=settings.EMBEDDING_MODEL),
+                tokens=sum(_estimate_tokens(text) for text in texts),
+                priority=priority
             )
-            return response.data[0].embedding
+            # The API tags each embedding with its input index
+            vectors: List[List[float]] = [[] for _ in texts]
+            for item in response.data:
+                vectors[item.index] = item.embedding
+            return vectors
         except Exception as e:
-            logger.error(f"Embedding error: {e}")
-            return []
+            logger.error(f"Batch embedding error ({len(texts)} inputs): {e}")
+            return [[] for _ in texts]
+
+    def _make_batches(self, texts: List[str]) -> List[List[str]]:
+        """
+        Greedily pack texts into request-sized batches, in order.
+        """
+        max_inputs = max(1, settings.EMBEDDING_BATCH_SIZE)
+        max_tokens = settings.EMBEDDING_BATCH_MAX_TOKENS
+        max_input_chars = settings.EMBEDDING_MAX_INPUT_TOKENS * 3
+
+        batches: List[List[str]] = []
+        current: List[str] = []
+        current_tokens = 0
+        for text in texts:
+            if len(text) > max_input_chars:
+                logger.warning(f"Truncating {len(text)}-char input to the embedding model limit")
+                text = text[:max_input_chars]
+            tokens = _estimate_tokens(text)
+            if current and (len(current) >= max_inputs or current_tokens + tokens > max_tokens):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(text)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
 
-    async def ingest_document(self, business_id: str, text: str, source: str):
+    async def ingest_document(
+        self,
+        business_id: str,
+        text: str,
+        source: str,
+        progress: Optional[IngestProgress] = None,
+        chunker: Optional[BaseChunker] = None,
+        replace: bool = True
+    ):
         """
         Chunk and store document.
+        An unchanged re-ingest of `source` is skipped without chunking.
+        """
+        from starlette.concurrency import run_in_threadpool
+
+        chunker = chunker or get_chunker()
+        store = await store_residency.aget(business_id)
+        # sources.json is read from disk, under a lock a compaction may hold
+        if replace and store is not None and await run_in_threadpool(self._is_unchanged, store, source, text, chunker):
+            logger.info(f"Skipping unchanged source {source} for {business_id}")
+            return
+        await self.ingest_stream(business_id, [text], source, progress, chunker, replace)
+
+    async def ingest_stream(
+        self,
+        business_id: str,
+        sections: Iterable[str],
+        source: str,
+        progress: Optional[IngestProgress] = None,
+        chunker: Optional[BaseChunker] = None,
+        replace: bool = True
+    ) -> int:
+        """
+        Chunk, embed and store a document given as an iterable of text
+        sections (e.g. DocumentLoader.iter_load), returning the number of
+        chunks stored. `chunker` defaults to the CHUNK_STRATEGY chunker.
+
+        Sections are pulled and chunked in a worker thread while earlier
+        chunks are being embedded and stored, so extraction/OCR and
+        embedding overlap. At most INGEST_PIPELINE_DEPTH embedding batches
+        wait between the two, which keeps memory flat however long the
+        document is. `progress.chunks_total` grows as chunks are produced.
+
+        Re-ingesting a source is incremental: chunks are identified by a
+        content hash, only chunks the source did not already have are
+        embedded, and chunks its previous version had but this one lacks are
+        removed afterwards. An unchanged source therefore costs no
+        embeddings and no writes. With `replace=False` the content is added
+        to what the source already holds and nothing is removed.
+        """
+        from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+
+        batch_size = max(1, settings.EMBEDDING_BATCH_SIZE)
+        consumers = max(1, settings.EMBEDDING_CONCURRENCY)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, settings.INGEST_PIPELINE_DEPTH))
+        chunker = chunker or get_chunker()
+        fingerprint = _new_fingerprint(chunker)
+        seen = set()
+        stored = 0
+        failed = 0
+
+        async def produce(existing: Dict[Optional[str], List[int]]):
+            batch: List[Tuple[str, str]] = []
+            async for chunk, chunk_hash in iterate_in_threadpool(_iter_hashed_chunks(sections, fingerprint, chunker)):
+                if chunk_hash in seen:
+                    continue  # Repeated within this source
+                seen.add(chunk_hash)
+                if progress is not None:
+                    progress.chunks_total += 1
+                if chunk_hash in existing:
+                    if progress is not None:
+                        progress.chunks_embedded += 1
+                    continue
+                batch.append((chunk, chunk_hash))
+                if len(batch) >= batch_size:
+                    await queue.put(batch)
+                    batch = []
+            if batch:
+                await queue.put(batch)
+            for _ in range(consumers):
+                await queue.put(None)
+
+        async def consume():
+            nonlocal stored, failed
+            while True:
+                batch = await queue.get()
+                if batch is None:
+                    return
+                with metrics.stage("chunk_embedding"):
+                    vectors = await self.embed_batch([chunk for chunk, _ in batch], progress)
+                embedded = [(chunk, chunk_hash, vector) for (chunk, chunk_hash), vector in zip(batch, vectors) if vector]
+                # Store writes take file locks and may wait out a compaction
+                await run_in_threadpool(
+                    self._save_many_to_store,
+                    business_id,
+                    [vector for _, _, vector in embedded],
+                    [chunk for chunk, _, _ in embedded],
+                    [{"source": source, "hash": chunk_hash} for _, chunk_hash, _ in embedded]
+                )
+                stored += len(embedded)
+                failed += len(batch) - len(embedded)
+                metrics.inc("chunks_embedded_total", len(embedded))
+
+        async with self._source_lock(business_id, source):
+            store = await store_residency.aget(business_id)
+            existing = dict(await run_in_threadpool(store.source_rows, source)) if store is not None else {}
+
+            tasks = [asyncio.create_task(produce(existing))] + [asyncio.create_task(consume()) for _ in range(consumers)]
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                # A failed stage must not leave the others blocked on the queue
+                for task in tasks:
+                    task.cancel()
+
+            removed = 0
+            if replace:
+                removed = await run_in_threadpool(self._remove_stale_chunks, business_id, source, seen)
+            store = await store_residency.aget(business_id)
+            if replace and store is not None and not failed:
+                # Recorded only once the store fully reflects this content. Writing
+                # sources.json takes the store's file lock and may wait out a compaction
+                await run_in_threadpool(self._record_fingerprint, store, source, fingerprint.hexdigest())
+
+        logger.info(
+            f"Ingested {source} for {business_id}: {stored} new, "
+            f"{len(seen) - stored - failed} unchanged, {removed} removed, {failed} failed chunks"
+        )
+        return stored
+
+    async def delete_source(self, business_id: str, source: str) -> int:
+        """
+        Remove every chunk ingested from `source`. Returns the chunks removed.
+        Search stops returning them at once; space is reclaimed by compaction.
         """
-        # Simple chunking by paragraphs or fixed size
-        chunks = self._chunk_text(text)
-        
-        logger.info(f"Ingesting {len(chunks)} chunks for {business_id} from {source}")
+        from starlette.concurrency import run_in_threadpool
+
+        async with self._source_lock(business_id, source):
+            store = await store_residency.aget(business_id)
+            if store is None:
+                return 0
+            removed = await run_in_threadpool(store.remove, lambda metadata: metadata.get("source") == source)
+            await run_in_threadpool(store.drop_fingerprints, [source])
 
-        for chunk in chunks:
-            vector = await self.embed_text(chunk)
-            if vector:
-                self._save_to_store(business_id, vector, chunk, {"source": source})
+        answer_cache.invalidate(business_id)
+        logger.info(f"Deleted {removed} chunks of {source} for {business_id}")
+        return removed
 
-    async def search(self, business_id: str, query: str, top_k: int = 3) -> str:
+    async def delete_business(self, business_id: str) -> int:
+        """
+        Remove a business' whole knowledge base. Returns the chunks removed.
+        """
+        from starlette.concurrency import run_in_threadpool
+
+        store = await store_residency.aget(business_id)
+        if store is None:
+            return 0
+        removed = await run_in_threadpool(store.remove, lambda metadata: True)
+        await run_in_threadpool(store.drop_fingerprints)
+
+        answer_cache.invalidate(business_id)
+        logger.info(f"Deleted knowledge base of {business_id} ({removed} chunks)")
+        return removed
+
+    async def search(self, business_id: str, query: str, top_k: int = 3, query_vec: List[float] = None) -> str:
         """
         Retrieve relevant context.
+        Pass `query_vec` when the query has already been embedded.
+        """
+        results = await self.retrieve(business_id, query, top_k, query_vec)
+        return "".join(format_chunk(res) for res in results)
+
+    async def retrieve(self, business_id: str, query: str, top_k: int = 3, query_vec: List[float] = None) -> List[Dict]:
         """
-        query_vec = await self.embed_query(query)
+        Retrieve relevant chunks as {'text', 'metadata', 'score'}, best first.
+
+        RAG_SEARCH_MODE picks the retrievers: `vector` (embeddings only),
+        `lexical` (BM25 only, no embeddings call) or `hybrid` (both, merged by
+        reciprocal rank fusion; scores are then fusion scores).
+        """
+        from starlette.concurrency import run_in_threadpool
+
+        mode = settings.RAG_SEARCH_MODE.lower()
+        if mode not in SEARCH_MODES:
+            logger.warning(f"Unknown RAG_SEARCH_MODE '{mode}'. Using vector search.")
+            mode = "vector"
+
+        # A store not used for a while is opened off the loop, once however many chats wait for it
+        if await store_residency.aget(business_id) is None:
+            return []
+
+        lexical: List[Dict] = []
+        if mode != "vector":
+            # The first lexical search of a store indexes its texts; keep that off the loop
+            candidates = top_k if mode == "lexical" else max(top_k, settings.RAG_HYBRID_CANDIDATES)
+            lexical = await run_in_threadpool(self._lexical_search_store, business_id, query, candidates)
+            if mode == "lexical":
+                return lexical
+            if query_vec is None and settings.RAG_LEXICAL_FAST_PATH and _exact_hit(query, lexical):
+                # A SKU or code found verbatim needs no embedding round trip
+                return lexical[:top_k]
+
+        if query_vec is None:
+            query_vec = await self.embed_query(query)
         if not query_vec:
-            return ""
+            return lexical[:top_k]
+
+        # Searching maps rows other workers committed, which may sync the index; keep it off the loop
+        if mode == "vector":
+            return await run_in_threadpool(self._search_store, business_id, query_vec, top_k)
+        vector = await run_in_threadpool(
+            self._search_store, business_id, query_vec, max(top_k, settings.RAG_HYBRID_CANDIDATES)
+        )
+        return reciprocal_rank_fusion([vector, lexical], top_k)
+
+    async def known_sources(self, business_id: str) -> Set[str]:
+        """Sources whose content was fully ingested and not deleted."""
+        from starlette.concurrency import run_in_threadpool
 
-        results = self._search_store(business_id, query_vec, top_k)
-        
-        # Format context
-        context = ""
-        for res in results:
-            context += f"---\nSource: {res['metadata']['source']}\nContent: {res['text']}\n"
-        
-        return context
+        store = await store_residency.aget(business_id)
+        return await run_in_threadpool(store.sources) if store is not None else set()
 
-    def _chunk_text(self, text: str, chunk_size: int = 1000) -> List[str]:
-        # Very basic chunking. In production, use LangChain text splitters.
-        return [text[i:i+chunk_size] for i in range(0, len(text), chunk_size)]
+    def knowledge_version(self, business_id: str) -> int:
+        """
+        Version of a business' knowledge base; changes whenever it is modified,
+        including by other worker processes.
+        """
+        store = self._get_store(business_id)
+        if store is None:
+            return 0
+        store.refresh()
+        return store.version
 
     def _save_to_store(self, business_id: str, vector: List[float], text: str, metadata: Dict):
-        # NOTE: Ideally implementation uses FAISS or Redis VSS here.
-        # For this standalone POC without Docker complexity, we might use a simple in-memory dict 
-        # backed by a file or just in-memory (per user request for POC).
-        # We will implement a numpy cosine similarity search for reliability.
-        
-        if business_id not in GLOBAL_VECTOR_STORE:
-            GLOBAL_VECTOR_STORE[business_id] = {
-                "vectors": [],
-                "texts": [],
-                "metadata": []
-            }
-        
-        GLOBAL_VECTOR_STORE[business_id]["vectors"].append(vector)
-        GLOBAL_VECTOR_STORE[business_id]["texts"].append(text)
-        GLOBAL_VECTOR_STORE[business_id]["metadata"].append(metadata)
+        self._save_many_to_store(business_id, [vector], [text], [metadata])
+
+    def _save_many_to_store(
+        self,
+        business_id: str,
+        vectors: List[List[float]],
+        texts: List[str],
+        metadatas: List[Dict]
+    ):
+        if not vectors:
+            return
+
+        store = self._get_store(business_id, create=True)
+        store.add(vectors, texts, metadatas)
+        if settings.RAG_SEARCH_MODE.lower() != "vector":
+            store.update_lexical_index()
+        # The store grew; other businesses may have to make room
+        store_residency.enforce(keep=business_id)
+        answer_cache.invalidate(business_id)
+
+    def _is_unchanged(self, store: VectorStore, source: str, text: str, chunker: BaseChunker) -> bool:
+        return store.fingerprint(source) == content_fingerprint([text], chunker)
+
+    def _record_fingerprint(self, store: VectorStore, source: str, fingerprint: str):
+        if store.fingerprint(source) != fingerprint:
+            store.set_fingerprint(source, fingerprint)
+
+    def _remove_stale_chunks(self, business_id: str, source: str, current: set) -> int:
+        """
+        Remove rows of `source` whose hash is not in `current`, and duplicate
+        rows of the same hash, keeping the oldest.
+        """
+        store = self._get_store(business_id)
+        if store is None:
+            return 0
+        rows = store.source_rows(source)
+        if all(chunk_hash in current and len(ids) == 1 for chunk_hash, ids in rows.items()):
+            return 0
+
+        kept = set()
+
+        def is_stale(metadata: Dict) -> bool:
+            if metadata.get("source") != source:
+                return False
+            chunk_hash = metadata.get("hash")
+            if chunk_hash not in current or chunk_hash in kept:
+                return True
+            kept.add(chunk_hash)
+            return False
+
+        removed = store.remove(is_stale)
+        if removed:
+            answer_cache.invalidate(business_id)
+        return removed
+
+    def _source_lock(self, business_id: str, source: str) -> asyncio.Lock:
+        # Serializes re-ingests of one source in this process
+        key = (business_id, source)
+        lock = self._source_locks.get(key)
+        if lock is None:
+            lock = self._source_locks[key] = asyncio.Lock()
+        return lock
 
     def _search_store(self, business_id: str, query_vec: List[float], top_k: int) -> List[Dict]:
-        if business_id not in GLOBAL_VECTOR_STORE:
-            return []
-        
-        store = GLOBAL_VECTOR_STORE[business_id]
-        if not store["vectors"]:
+        store = self._get_store(business_id)
+        if store is None:
             return []
 
-        # Convert to numpy
-        vectors = np.array(store["vectors"])
-        query = np.array(query_vec)
-        
-        # Cosine similarity
-        norm_vectors = np.linalg.norm(vectors, axis=1)
-        norm_query = np.linalg.norm(query)
-        
-        if norm_query == 0:
+        with metrics.stage("vector_search"):
+            return store.search(query_vec, top_k)
+
+    def _lexical_search_store(self, business_id: str, query: str, top_k: int) -> List[Dict]:
+        store = self._get_store(business_id)
+        if store is None:
             return []
 
-        dot_products = np.dot(vectors, query)
-        similarities = dot_products / (norm_vectors * norm_query)
-
-        # Get top K indices
-        # Check if we have less than top_k items
-        k = min(top_k, len(similarities))
-        top_indices = np.argsort(similarities)[-k:][::-1]
-        
-        results = []
-        for idx in top_indices:
-            results.append({
-                "text": store["texts"][idx],
-                "metadata": store["metadata"][idx],
-                "score": similarities[idx]
-            })
-        
-        return results
+        with metrics.stage("lexical_search"):
+            return store.lexical_search(query, top_k)
+
+    def _get_store(self, business_id: str, create: bool = False) -> Optional[VectorStore]:
+        return store_residency.get(business_id, create)
+
+def content_fingerprint(sections: Iterable[str], chunker: BaseChunker) -> str:
+    """Fingerprint of a source's content, as recorded by ingest_stream."""
+    fingerprint = _new_fingerprint(chunker)
+    for section in sections:
+        fingerprint.update(section.encode("utf-8"))
+    return fingerprint.hexdigest()
+
+def chunk_hash(chunk: str) -> str:
+    return hashlib.blake2b(chunk.encode("utf-8"), digest_size=16).hexdigest()
+
+def _new_fingerprint(chunker: BaseChunker):
+    # Same content chunked differently yields different chunks
+    return hashlib.blake2b(chunker.signature.encode("utf-8") + b"\0", digest_size=16)
+
+def _iter_hashed_chunks(sections: Iterable[str], fingerprint, chunker: BaseChunker) -> Iterator[Tuple[str, str]]:
+    """(chunk, content hash) pairs, feeding every section into `fingerprint`."""
+    def fingerprinted():
+        for section in sections:
+            fingerprint.update(section.encode("utf-8"))
+            yield section
+
+    for chunk in chunker.iter_chunks(fingerprinted()):
+        yield chunk, chunk_hash(chunk)
+
+def _exact_hit(query: str, results: List[Dict]) -> bool:
+    """Whether the query names codes/identifiers and the best lexical match contains them all."""
+    terms = exact_terms(query)
+    return bool(terms) and bool(results) and contains_terms(results[0]["text"], terms)
+
+def _estimate_tokens(text: str) -> int:
+    # Conservative estimate (~3 chars per token) so batches stay under the
+    # provider limits without pulling in a tokenizer.
+    return len(text) // 3 + 1
 
 rag_manager = RAGManager()
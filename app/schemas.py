@@ -16,3 +16,23 @@ class IngestResponse(BaseModel):
     status: str
     chunks_processed: int
     message: str
+
+class IngestJobStatus(BaseModel):
+    job_id: str
+    business_id: str
+    kind: str
+    source: str
+    status: str
+    error: Optional[str] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    pages_total: int = 0
+    pages_done: int = 0
+    chunks_total: int = 0
+    chunks_embedded: int = 0
+
+class KnowledgeDeleteResponse(BaseModel):
+    business_id: str
+    source: Optional[str] = None
+    chunks_deleted: int
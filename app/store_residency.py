@@ -0,0 +1,198 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+import numpy as np
+from app.core.config import settings
+from app.vector_store import VectorStore, PersistentVectorStore, business_index_factory, store_path
+
+logger = logging.getLogger(__name__)
+
+# Recent loads kept for the load-time percentiles
+STATS_WINDOW = 1024
+
+class StoreResidency:
+    """
+    The vector stores open in this worker, kept within a memory budget.
+
+    A business' store is opened on first use (search, ingest, delete) and
+    stays resident while it is used. Once the resident stores hold more than
+    VECTOR_STORE_MEMORY_BUDGET_MB, the least recently used ones are dropped;
+    persistent stores lose nothing, since their rows live in
+    VECTOR_STORE_DIR, and are mapped again on their next use. In-memory
+    stores (VECTOR_STORE_PERSIST=false) have no other copy and are never
+    evicted.
+
+    Opening is single-flight per business: threads wait on a per-business
+    lock, and coroutines calling `aget` share one threadpool load, so a
+    burst of chats to a cold business opens its store once. Different
+    businesses load in parallel.
+    """
+
+    def __init__(self, budget_mb: Optional[int] = None):
+        budget_mb = settings.VECTOR_STORE_MEMORY_BUDGET_MB if budget_mb is None else budget_mb
+        self.budget_bytes = max(0, budget_mb) * 1024 * 1024
+        # business_id -> store, least recently used first
+        self._stores: "OrderedDict[str, VectorStore]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Per-business locks of loads in progress
+        self._loading: Dict[str, threading.Lock] = {}
+        # Per-business threadpool loads awaited by coroutines
+        self._loads: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.loads = 0
+        self.coalesced_loads = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+        self._load_times: Deque[float] = deque(maxlen=STATS_WINDOW)
+
+    def __len__(self) -> int:
+        return len(self._stores)
+
+    def __contains__(self, business_id: str) -> bool:
+        return business_id in self._stores
+
+    def items(self) -> List[Tuple[str, VectorStore]]:
+        """Resident (business_id, store) pairs, least recently used first."""
+        with self._lock:
+            return list(self._stores.items())
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(store.nbytes for _, store in self.items())
+
+    def get(self, business_id: str, create: bool = False) -> Optional[VectorStore]:
+        """
+        The store of `business_id`, opened if it is not resident. None if
+        the business has no store and `create` is False.
+        """
+        with self._lock:
+            store = self._stores.get(business_id)
+            if store is not None:
+                self._stores.move_to_end(business_id)
+                self.hits += 1
+                return store
+            loading = self._loading.setdefault(business_id, threading.Lock())
+
+        with loading:
+            with self._lock:
+                store = self._stores.get(business_id)
+                if store is not None:
+                    # Opened by the thread we waited for
+                    self._stores.move_to_end(business_id)
+                    self.coalesced_loads += 1
+                    return store
+
+            started = time.perf_counter()
+            try:
+                store = _open_store(business_id, create)
+            finally:
+                with self._lock:
+                    if store is not None:
+                        self._stores[business_id] = store
+                        self.loads += 1
+                        self._load_times.append(time.perf_counter() - started)
+                    self._loading.pop(business_id, None)
+
+        if store is not None:
+            self.enforce(keep=business_id)
+        return store
+
+    async def aget(self, business_id: str, create: bool = False) -> Optional[VectorStore]:
+        """
+        Like `get`, but opens the store in the threadpool. Coroutines asking
+        for the same business meanwhile await the same load.
+        """
+        from starlette.concurrency import run_in_threadpool
+
+        with self._lock:
+            store = self._stores.get(business_id)
+            if store is not None:
+                self._stores.move_to_end(business_id)
+                self.hits += 1
+                return store
+
+        load = self._loads.get(business_id)
+        if load is None:
+            load = self._loads[business_id] = asyncio.ensure_future(run_in_threadpool(self.get, business_id, create))
+            load.add_done_callback(lambda _: self._loads.pop(business_id, None))
+        else:
+            self.coalesced_loads += 1
+        # A caller timing out must not cancel the load the others wait for
+        store = await asyncio.shield(load)
+        if store is None and create:
+            # Joined a load that did not create the store
+            store = await run_in_threadpool(self.get, business_id, True)
+        return store
+
+    def put(self, business_id: str, store: VectorStore):
+        """Make `store` the resident store of `business_id`."""
+        with self._lock:
+            self._stores[business_id] = store
+            self._stores.move_to_end(business_id)
+        self.enforce(keep=business_id)
+
+    def evict(self, business_id: str) -> bool:
+        """Drop the resident store of `business_id`, if any."""
+        with self._lock:
+            store = self._stores.pop(business_id, None)
+        return store is not None
+
+    def enforce(self, keep: Optional[str] = None):
+        """
+        Evict least recently used persistent stores, except `keep`, until
+        the resident stores fit the budget. Call after a store grew.
+        """
+        if not self.budget_bytes:
+            return
+        with self._lock:
+            sizes = {business_id: store.nbytes for business_id, store in self._stores.items()}
+            total = sum(sizes.values())
+            for business_id in list(self._stores):
+                if total <= self.budget_bytes:
+                    break
+                store = self._stores[business_id]
+                if business_id == keep or not isinstance(store, PersistentVectorStore):
+                    continue
+                # Searches already holding the store finish on it; the next use maps it again
+                del self._stores[business_id]
+                total -= sizes[business_id]
+                self.evictions += 1
+                self.evicted_bytes += sizes[business_id]
+                logger.info(f"Evicted vector store of {business_id} ({sizes[business_id] / 1e6:.1f} MB)")
+
+    def stats(self) -> Dict[str, float]:
+        load_times = list(self._load_times)
+        return {
+            "resident_stores": len(self._stores),
+            "resident_bytes": self.resident_bytes,
+            "budget_bytes": self.budget_bytes,
+            "hits": self.hits,
+            "loads": self.loads,
+            "coalesced_loads": self.coalesced_loads,
+            "evictions": self.evictions,
+            "evicted_bytes": self.evicted_bytes,
+            "avg_load_ms": round(float(np.mean(load_times)) * 1000, 3) if load_times else 0.0,
+            "p95_load_ms": round(float(np.percentile(load_times, 95)) * 1000, 3) if load_times else 0.0,
+            "max_load_ms": round(max(load_times) * 1000, 3) if load_times else 0.0
+        }
+
+
+def _open_store(business_id: str, create: bool) -> Optional[VectorStore]:
+    store = None
+    if settings.VECTOR_STORE_PERSIST:
+        path = store_path(business_id)
+        if create or PersistentVectorStore.exists(path):
+            store = PersistentVectorStore(path, business_index_factory(business_id))
+    elif create:
+        store = VectorStore(business_index_factory(business_id))
+
+    if store is not None and len(store) and settings.RAG_SEARCH_MODE.lower() != "vector":
+        # Part of loading: the first keyword search would build it anyway,
+        # and the budget should see its size
+        store.update_lexical_index()
+    return store
+
+store_residency = StoreResidency()
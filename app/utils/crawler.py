@@ -0,0 +1,260 @@
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Set
+from urllib.parse import urldefrag, urljoin, urlsplit
+from xml.etree import ElementTree
+import httpx
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.redis_client import get_async_redis
+from app.utils.web import web_loader, USER_AGENT
+
+logger = logging.getLogger(__name__)
+
+# Links to these are never HTML pages
+SKIP_EXTENSIONS = (
+    ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".ico", ".css", ".js", ".json", ".xml",
+    ".pdf", ".zip", ".gz", ".mp3", ".mp4", ".avi", ".mov", ".woff", ".woff2", ".ttf", ".doc", ".docx"
+)
+# Child sitemaps followed from a sitemap index
+MAX_SITEMAPS = 10
+
+class CrawledPage(NamedTuple):
+    url: str
+    text: str
+    depth: int
+
+
+class CrawlStats:
+    def __init__(self):
+        self.discovered = 0
+        self.fetched = 0
+        self.not_modified = 0
+        self.skipped = 0
+        self.failed = 0
+
+    @property
+    def done(self) -> int:
+        return self.fetched + self.not_modified + self.skipped + self.failed
+
+    def to_dict(self) -> Dict[str, int]:
+        return {
+            "discovered": self.discovered,
+            "fetched": self.fetched,
+            "not_modified": self.not_modified,
+            "skipped": self.skipped,
+            "failed": self.failed
+        }
+
+
+class WebCrawler:
+    """
+    Crawls one website with a pooled async HTTP client.
+
+    Pages are discovered from robots.txt/sitemap.xml and from same-site
+    links, breadth first, up to a depth and a page limit. CRAWL_CONCURRENCY
+    pages are fetched at once, at most CRAWL_PER_HOST_CONCURRENCY from any
+    one host.
+
+    Each fetched page's ETag/Last-Modified and outgoing links are kept in
+    Redis per business. A re-crawl sends conditional requests for pages the
+    business still has, and a 304 skips download, extraction and ingestion
+    while its remembered links keep the crawl going.
+    """
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers={"User-Agent": USER_AGENT},
+                timeout=settings.CRAWL_TIMEOUT_SECONDS,
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=settings.CRAWL_CONCURRENCY,
+                    max_keepalive_connections=settings.CRAWL_CONCURRENCY
+                ),
+                transport=self._transport
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def crawl(
+        self,
+        business_id: str,
+        start_url: str,
+        on_page: Callable[[CrawledPage], Awaitable[None]],
+        max_pages: Optional[int] = None,
+        max_depth: Optional[int] = None,
+        known: Optional[Set[str]] = None,
+        on_progress: Optional[Callable[[CrawlStats], None]] = None
+    ) -> CrawlStats:
+        """
+        Crawl the site of `start_url`, awaiting `on_page` for every page
+        whose content is new or changed. `known` is the set of URLs whose
+        content the business already has; only those may a 304 skip.
+        """
+        max_pages = max_pages or settings.CRAWL_MAX_PAGES
+        max_depth = settings.CRAWL_MAX_DEPTH if max_depth is None else max_depth
+        site = _site(start_url)
+        client = self.get_client()
+        stats = CrawlStats()
+        seen: Set[str] = set()
+        queue: asyncio.Queue = asyncio.Queue()
+        host_limits: Dict[str, asyncio.Semaphore] = {}
+
+        def enqueue(url: str, depth: int):
+            url = _normalize(url)
+            if url is None or url in seen or len(seen) >= max_pages or _site(url) != site:
+                return
+            seen.add(url)
+            stats.discovered += 1
+            queue.put_nowait((url, depth))
+
+        enqueue(start_url, 0)
+        if settings.CRAWL_USE_SITEMAP:
+            for url in await self._sitemap_urls(client, start_url):
+                enqueue(url, 1)
+
+        async def visit(url: str, depth: int):
+            cached = await self._cached(business_id, url) if known and url in known else None
+            headers = {}
+            if cached and cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached and cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+            host = urlsplit(url).hostname or ""
+            limit = host_limits.setdefault(host, asyncio.Semaphore(max(1, settings.CRAWL_PER_HOST_CONCURRENCY)))
+            async with limit:
+                response = await client.get(url, headers=headers)
+
+            if response.status_code == 304 and cached:
+                stats.not_modified += 1
+                links = cached.get("links", [])
+            else:
+                response.raise_for_status()
+                if "html" not in response.headers.get("content-type", "text/html"):
+                    stats.skipped += 1
+                    return
+                # Parsing is CPU-bound; keep it off the event loop
+                text, links = await run_in_threadpool(web_loader.parse, response.text, str(response.url))
+                await on_page(CrawledPage(url, text, depth))
+                stats.fetched += 1
+                # Only remembered once ingested, so a failed page is fetched in full next time
+                await self._remember(business_id, url, response.headers, links)
+
+            if depth < max_depth:
+                for link in links:
+                    enqueue(link, depth + 1)
+
+        async def worker():
+            while True:
+                url, depth = await queue.get()
+                try:
+                    await visit(url, depth)
+                except Exception as e:
+                    logger.warning(f"Crawl of {url} failed: {e}")
+                    stats.failed += 1
+                finally:
+                    if on_progress:
+                        on_progress(stats)
+                    queue.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(max(1, settings.CRAWL_CONCURRENCY))]
+        try:
+            await queue.join()
+        finally:
+            for task in workers:
+                task.cancel()
+
+        logger.info(f"Crawled {start_url} for {business_id}: {stats.to_dict()}")
+        return stats
+
+    async def _sitemap_urls(self, client: httpx.AsyncClient, start_url: str) -> List[str]:
+        parts = urlsplit(start_url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+
+        sitemaps = []
+        try:
+            response = await client.get(f"{origin}/robots.txt")
+            if response.status_code == 200:
+                sitemaps = [
+                    line.split(":", 1)[1].strip() for line in response.text.splitlines()
+                    if line.lower().startswith("sitemap:")
+                ]
+        except httpx.HTTPError as e:
+            logger.debug(f"No robots.txt for {origin}: {e}")
+        sitemaps = sitemaps or [f"{origin}/sitemap.xml"]
+
+        urls: List[str] = []
+        fetched = 0
+        while sitemaps and fetched < MAX_SITEMAPS:
+            sitemap = sitemaps.pop(0)
+            fetched += 1
+            try:
+                response = await client.get(sitemap)
+                if response.status_code != 200:
+                    continue
+                root = ElementTree.fromstring(response.content)
+            except (httpx.HTTPError, ElementTree.ParseError) as e:
+                logger.debug(f"Unreadable sitemap {sitemap}: {e}")
+                continue
+
+            locations = [el.text.strip() for el in root.iter() if el.tag.endswith("loc") and el.text]
+            if root.tag.endswith("sitemapindex"):
+                sitemaps.extend(locations)
+            else:
+                urls.extend(locations)
+        return urls
+
+    async def _cached(self, business_id: str, url: str) -> Optional[Dict]:
+        try:
+            raw = await get_async_redis().get(_cache_key(business_id, url))
+            return json.loads(raw) if raw else None
+        except Exception as e:
+            logger.warning(f"Crawl cache read failed for {url}: {e}")
+            return None
+
+    async def _remember(self, business_id: str, url: str, headers: httpx.Headers, links: List[str]):
+        entry = {
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+            "links": links
+        }
+        if not entry["etag"] and not entry["last_modified"]:
+            return  # Nothing to revalidate with
+        try:
+            await get_async_redis().set(
+                _cache_key(business_id, url), json.dumps(entry), ex=settings.CRAWL_CACHE_TTL_SECONDS
+            )
+        except Exception as e:
+            logger.warning(f"Crawl cache write failed for {url}: {e}")
+
+
+def _normalize(url: str) -> Optional[str]:
+    url, _ = urldefrag(url.strip())
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        return None
+    if parts.path.lower().endswith(SKIP_EXTENSIONS):
+        return None
+    # "https://site.com" and "https://site.com/" are the same page
+    return url if parts.path else urljoin(url, "/")
+
+def _site(url: str) -> str:
+    host = (urlsplit(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+def _cache_key(business_id: str, url: str) -> str:
+    return f"crawl_cache:{business_id}:{hashlib.blake2b(url.encode('utf-8'), digest_size=16).hexdigest()}"
+
+web_crawler = WebCrawler()
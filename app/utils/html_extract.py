@@ -0,0 +1,214 @@
+import logging
+import re
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple, Type
+from urllib.parse import urljoin
+from bs4 import BeautifulSoup
+from app.core.config import settings
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:  # lxml is optional at runtime; the BeautifulSoup extractor always works
+    lxml = None
+
+logger = logging.getLogger(__name__)
+
+# Never text, whatever the page
+_DROP_TAGS = ("script", "style", "noscript", "template", "svg", "canvas", "iframe", "object", "meta", "link", "head")
+# Page chrome outside the main content
+_CHROME_TAGS = ("nav", "footer", "aside", "form", "button", "select", "dialog")
+_CHROME_ROLES = {"navigation", "banner", "contentinfo", "complementary", "search", "dialog", "alertdialog", "menubar"}
+# class/id words of cookie banners, popups, share bars and the like. "menu" is
+# deliberately absent: for restaurants the menu is the content.
+_CHROME_NAMES = re.compile(
+    r"(?:^|[\s_-])(?:cookies?|consent|gdpr|newsletter|subscribe|popup|modal|overlay|share|sharing|social|"
+    r"breadcrumbs?|sidebar|navbar|nav|footer|skip-link|advert|ads|banner-ad|promo|related|comments?)(?:$|[\s_-])",
+    re.IGNORECASE
+)
+_HIDDEN_STYLE = re.compile(r"display\s*:\s*none|visibility\s*:\s*hidden", re.IGNORECASE)
+_HEADING_TAGS = ("h1", "h2", "h3", "h4", "h5", "h6")
+_PARAGRAPH_TAGS = ("p", "blockquote", "pre", "table", "ul", "ol", "dl", "section", "article", "figure", "address")
+_LINE_TAGS = ("div", "li", "tr", "dt", "dd", "header", "main", "figcaption", "caption", "label")
+_CELL_TAGS = ("td", "th")
+_BREAK_TAGS = ("br", "hr")
+_XML_DECLARATION = re.compile(r"^\s*<\?xml[^>]*\?>")
+_SPACES = re.compile(r"[^\S\n]+")
+_BLANK_LINES = re.compile(r"\n\s*\n\s*")
+
+class BaseHTMLExtractor(ABC):
+    """
+    Turns an HTML page into the text to embed plus the absolute URLs it
+    links to. Links include navigation, even when its text is dropped, so
+    crawls still discover the whole site.
+    """
+
+    name = ""
+
+    @abstractmethod
+    def extract(self, html: str, url: str) -> Tuple[str, List[str]]:
+        pass
+
+
+class SoupExtractor(BaseHTMLExtractor):
+    """
+    BeautifulSoup with the pure-Python parser: all text except scripts,
+    styles, nav and footer, one line per text run. The original extractor.
+    """
+
+    name = "soup"
+
+    def extract(self, html: str, url: str) -> Tuple[str, List[str]]:
+        soup = BeautifulSoup(html, 'html.parser')
+
+        # Links first: navigation is removed from the text below
+        links = [urljoin(url, a["href"]) for a in soup.find_all("a", href=True)]
+
+        # Remove script and style elements
+        for script in soup(["script", "style", "nav", "footer", "meta", "noscript"]):
+            script.extract()
+
+        # Get text
+        text = soup.get_text()
+
+        # Break into lines and remove leading/trailing space on each
+        lines = (line.strip() for line in text.splitlines())
+        # Break multi-headlines into a line each
+        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+        # Drop blank lines
+        text = '\n'.join(chunk for chunk in chunks if chunk)
+
+        return text, links
+
+
+class LxmlExtractor(BaseHTMLExtractor):
+    """
+    lxml (libxml2) parser with main-content detection.
+
+    The page's <main> (or role="main", or its only <article>) is kept when it
+    exists, otherwise the body. Within it, navigation, footers, cookie
+    banners, popups and share bars (found by tag, ARIA role and class/id),
+    link-only lists and hidden elements are dropped.
+
+    Headings come out as Markdown ("## Title") and blocks are separated by
+    blank lines, so the paragraph chunker can follow the page's structure.
+    """
+
+    name = "lxml"
+
+    # A list whose text is mostly link text, with at least this many links, is a menu
+    MENU_MIN_LINKS = 5
+    MENU_LINK_DENSITY = 0.8
+
+    def extract(self, html: str, url: str) -> Tuple[str, List[str]]:
+        root = self._parse(html)
+        if root is None:
+            return "", []
+
+        links = [urljoin(url, href.strip()) for href in root.xpath("//a/@href") if href.strip()]
+
+        title = " ".join((root.findtext(".//title") or "").split())
+        etree.strip_elements(root, *_DROP_TAGS, etree.Comment, etree.ProcessingInstruction, with_tail=False)
+        content = self._main_content(root)
+        self._drop_chrome(content)
+        text = self._text(content)
+        return (f"{title}\n\n{text}" if title and not text.startswith(title) else text), links
+
+    def _parse(self, html: str):
+        if not html or not html.strip():
+            return None
+        try:
+            # lxml refuses str input that declares its own encoding
+            return lxml.html.document_fromstring(_XML_DECLARATION.sub("", html, count=1))
+        except (etree.ParserError, ValueError) as e:
+            logger.warning(f"Unparseable HTML: {e}")
+            return None
+
+    def _main_content(self, root):
+        for query in ("//main", "//*[@role='main']"):
+            found = root.xpath(query)
+            if len(found) == 1:
+                return found[0]
+        articles = root.xpath("//article")
+        if len(articles) == 1:
+            return articles[0]
+        body = root.find("body")
+        return body if body is not None else root
+
+    def _drop_chrome(self, content):
+        total = len(content.text_content())
+        doomed = [
+            el for el in content.iterdescendants()
+            if isinstance(el.tag, str) and (self._is_hidden(el) or self._is_chrome(el, total))
+        ]
+        for el in doomed:
+            el.drop_tree()
+        # Link lists are judged on what is left of them
+        for el in [el for el in content.iterdescendants("ul", "ol") if self._is_menu(el)]:
+            el.drop_tree()
+
+    def _is_hidden(self, el) -> bool:
+        return (
+            el.get("hidden") is not None
+            or el.get("aria-hidden") == "true"
+            or bool(_HIDDEN_STYLE.search(el.get("style", "")))
+        )
+
+    def _is_chrome(self, el, total: int) -> bool:
+        names = f"{el.get('class', '')} {el.get('id', '')}"
+        if el.tag not in _CHROME_TAGS and el.get("role") not in _CHROME_ROLES and not _CHROME_NAMES.search(names):
+            return False
+        # A wrapper around most of the page (e.g. an ASP.NET <form>) is layout, not chrome
+        return len(el.text_content()) < total / 2
+
+    def _is_menu(self, el) -> bool:
+        anchors = el.xpath(".//a")
+        if len(anchors) < self.MENU_MIN_LINKS:
+            return False
+        text = len("".join(el.text_content().split()))
+        link_text = sum(len("".join(a.text_content().split())) for a in anchors)
+        return text == 0 or link_text / text >= self.MENU_LINK_DENSITY
+
+    def _text(self, content) -> str:
+        # Mark block boundaries in the tree, then take all text in one pass
+        for el in content.iter(*_HEADING_TAGS):
+            title = " ".join(el.text_content().split())
+            tail = el.tail
+            el.clear()
+            el.text = f"\n\n{'#' * int(el.tag[1])} {title}\n\n" if title else ""
+            el.tail = tail
+        for tags, mark in ((_PARAGRAPH_TAGS, "\n\n"), (_LINE_TAGS, "\n")):
+            for el in content.iter(*tags):
+                el.text = mark + (el.text or "")
+                el.tail = mark + (el.tail or "")
+        for tags, mark in ((_BREAK_TAGS, "\n"), (_CELL_TAGS, " ")):
+            for el in content.iter(*tags):
+                el.tail = mark + (el.tail or "")
+
+        text = _SPACES.sub(" ", content.text_content())
+        lines = "\n".join(line.strip() for line in text.split("\n"))
+        return _BLANK_LINES.sub("\n\n", lines).strip()
+
+
+EXTRACTORS: Dict[str, Type[BaseHTMLExtractor]] = {
+    "lxml": LxmlExtractor,
+    "soup": SoupExtractor
+}
+
+_extractors: Dict[str, BaseHTMLExtractor] = {}
+
+def get_html_extractor(name: Optional[str] = None) -> BaseHTMLExtractor:
+    """
+    Extractor for a backend name (default HTML_EXTRACTOR).
+    """
+    name = (name or settings.HTML_EXTRACTOR).lower()
+    if name not in EXTRACTORS:
+        raise ValueError(f"Unknown HTML_EXTRACTOR '{name}'. Expected one of {tuple(EXTRACTORS)}")
+
+    if name == "lxml" and lxml is None:
+        logger.warning("HTML_EXTRACTOR=lxml but lxml is not installed. Using soup extractor.")
+        name = "soup"
+
+    if name not in _extractors:
+        _extractors[name] = EXTRACTORS[name]()
+    return _extractors[name]
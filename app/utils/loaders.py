@@ -1,33 +1,69 @@
 import logging
 import json
 from pathlib import Path
+from typing import Callable, Iterator, Optional
 from app.utils.ocr import ocr_processor
 
 logger = logging.getLogger(__name__)
 
+# Plain-text files are streamed in blocks of this many characters
+TEXT_BLOCK_CHARS = 64 * 1024
+
 class DocumentLoader:
-    def load(self, file_path: str, content_type: str = None) -> str:
+    def load(
+        self,
+        file_path: str,
+        content_type: str = None,
+        on_page: Optional[Callable[[int, int], None]] = None
+    ) -> str:
+        """
+        Extract text from a file. `on_page(done, total)` is called as PDF
+        pages are processed. Returns "" if the file cannot be read.
+        """
+        try:
+            return "".join(self.iter_load(file_path, content_type, on_page))
+        except ValueError:
+            return ""
+
+    def iter_load(
+        self,
+        file_path: str,
+        content_type: str = None,
+        on_page: Optional[Callable[[int, int], None]] = None
+    ) -> Iterator[str]:
+        """
+        Extract text from a file piece by piece (a PDF page, a block of a
+        text file), so large documents never have to fit in memory at once.
+        The pieces concatenate to what `load` returns. Raises ValueError if
+        extraction fails, even after some pieces were yielded: a consumer
+        must not take the pieces so far for the whole document.
+        """
         path = Path(file_path)
         ext = path.suffix.lower()
-        
+
         try:
             if ext == ".pdf":
-                return self._load_pdf(path)
+                yield from self._load_pdf(path, on_page)
             elif ext in [".txt", ".md"]:
-                return path.read_text(encoding="utf-8")
+                with path.open(encoding="utf-8") as f:
+                    while True:
+                        block = f.read(TEXT_BLOCK_CHARS)
+                        if not block:
+                            break
+                        yield block
             elif ext == ".json":
-                return json.dumps(json.loads(path.read_text(encoding="utf-8")), indent=2)
+                yield json.dumps(json.loads(path.read_text(encoding="utf-8")), indent=2)
             elif ext in [".jpg", ".png", ".jpeg", ".tiff", ".bmp"]:
-                return ocr_processor.process_image(str(path))
+                yield ocr_processor.process_image(str(path))
             else:
-                return f"Unsupported file type: {ext}"
+                yield f"Unsupported file type: {ext}"
         except Exception as e:
             logger.error(f"Error loading file {file_path}: {e}")
-            return ""
+            raise ValueError(f"Could not extract text from file: {e}") from e
 
-    def _load_pdf(self, path: Path) -> str:
-        # Pypdf logic is now handled inside ocr_processor.process_scanned_pdf 
+    def _load_pdf(self, path: Path, on_page: Optional[Callable[[int, int], None]] = None) -> Iterator[str]:
+        # Pypdf logic is now handled inside ocr_processor
         # which attempts extraction AND OCR on images
-        return ocr_processor.process_scanned_pdf(str(path))
+        return ocr_processor.iter_pdf_pages(str(path), on_page=on_page)
 
 loader = DocumentLoader()
@@ -4,6 +4,15 @@ from PIL import Image
 import shutil
 import os
 import sys
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from io import BytesIO
+from typing import Callable, Deque, Iterator, List, Optional, Tuple
+from app.core.config import settings
+from app.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +26,9 @@ class OCRProcessor:
         # Attempt to find tesseract in common paths (Windows/Linux) if needed,
         # or rely on PATH.
         self._check_tesseract_availability()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._workers = settings.OCR_WORKERS or os.cpu_count() or 1
 
     def _check_tesseract_availability(self):
         try:
@@ -35,7 +47,8 @@ class OCRProcessor:
         """
         try:
             image = Image.open(file_path)
-            text = pytesseract.image_to_string(image)
+            with metrics.stage("ocr_page"):
+                text = pytesseract.image_to_string(image)
             
             if not text.strip():
                 return "[OCR_PROCESSED] No text found in image."
@@ -45,7 +58,7 @@ class OCRProcessor:
             logger.error(f"OCR Failed for {file_path}: {e}")
             return f"[OCR_ERROR] Failed to process image: {str(e)}"
 
-    def process_scanned_pdf(self, file_path: str) -> str:
+    def process_scanned_pdf(self, file_path: str, on_page: Optional[Callable[[int, int], None]] = None) -> str:
         """
         Handle PDF that has no text layer (scanned).
         Uses pdf2image or similar? 
@@ -67,31 +80,12 @@ class OCRProcessor:
         but if I can't convert PDF->Image easily without Poppler, I will note this limitation.
         
         ACTUALLY: I can try to extract images FROM the PDF using pypdf and then OCR them.
+
+        `on_page(done, total)` is called after each page, for progress reporting.
         """
-        text_content = ""
         try:
-            import pypdf
-            from io import BytesIO
-            
-            reader = pypdf.PdfReader(file_path)
-            
-            for i, page in enumerate(reader.pages):
-                # 1. Try text extraction
-                page_text = page.extract_text()
-                if page_text and page_text.strip():
-                     text_content += page_text + "\n"
-                
-                # 2. Extract images for OCR
-                # Loop through images on the page
-                for image_file_object in page.images:
-                    try:
-                        # image_file_object.data is the bytes
-                        image = Image.open(BytesIO(image_file_object.data))
-                        ocr_text = pytesseract.image_to_string(image)
-                        if ocr_text.strip():
-                             text_content += f"\n[Page {i+1} Image OCR]:\n{ocr_text}\n"
-                    except Exception as img_err:
-                        logger.warning(f"Failed to OCR image on page {i}: {img_err}")
+            # Collect pieces and join once instead of repeated string +=
+            text_content = "".join(self.iter_pdf_pages(file_path, on_page))
             
             if not text_content.strip():
                  return "[OCR_EMPTY] Could not extract text or OCR images from PDF."
@@ -104,4 +98,149 @@ class OCRProcessor:
             logger.error(f"PDF OCR Error: {e}")
             return f"[OCR_ERROR] {str(e)}"
 
+    def iter_pdf_pages(self, file_path: str, on_page: Optional[Callable[[int, int], None]] = None) -> Iterator[str]:
+        """
+        Yield the text (and image OCR) of each non-empty PDF page, in order,
+        without holding the whole document in memory.
+        `on_page(done, total)` is called after each page.
+        """
+        import pypdf
+
+        reader = pypdf.PdfReader(file_path)
+        total = len(reader.pages)
+        for done, page_text in enumerate(self._iter_pages(reader), start=1):
+            if page_text:
+                yield page_text
+            if on_page:
+                on_page(done, total)
+
+    def shutdown(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _iter_pages(self, reader) -> Iterator[str]:
+        """
+        Yield the text of each page, in page order.
+
+        With OCR_PARALLEL, images are OCRed in a process pool while later
+        pages are still being read. At most `2 * workers` images are in
+        flight, so memory stays bounded on long documents.
+        Pages whose text layer already has OCR_MIN_PAGE_TEXT_CHARS characters
+        are not OCRed, and images under OCR_MIN_IMAGE_PIXELS are skipped as
+        decorative (logos, bullets, rules). The time from reading an OCRed
+        page to emitting it is recorded as the `ocr_page` stage.
+        """
+        executor = self._get_executor() if settings.OCR_PARALLEL else None
+        max_in_flight = 2 * self._workers
+        # (page index, text and OCR futures, images submitted to the pool, read time)
+        window: Deque[Tuple[int, List, int, float]] = deque()
+        in_flight = 0
+
+        for i, page in enumerate(reader.pages):
+            started = time.perf_counter()
+            # 1. Try text extraction
+            page_text = page.extract_text() or ""
+            parts: List = []
+            submitted = 0
+            if page_text.strip():
+                parts.append(page_text + "\n")
+
+            # 2. Extract images for OCR, unless the text layer is good enough
+            if len(page_text.strip()) < settings.OCR_MIN_PAGE_TEXT_CHARS:
+                try:
+                    images = [image_file_object.data for image_file_object in page.images]
+                except Exception as img_err:
+                    logger.warning(f"Failed to extract images on page {i}: {img_err}")
+                    images = []
+
+                for data in images:
+                    if not _is_worth_ocr(data):
+                        continue
+                    if executor is None:
+                        parts.append(_run_inline(_ocr_image_data, data))
+                    else:
+                        parts.append(executor.submit(_ocr_image_data, data))
+                        submitted += 1
+
+            window.append((i, parts, submitted, started))
+            in_flight += submitted
+
+            # Emit finished pages in order; block on the oldest if too much is in flight
+            while window and (in_flight > max_in_flight or _page_ready(window[0][1])):
+                page_index, page_parts, page_submitted, page_started = window.popleft()
+                in_flight -= page_submitted
+                yield _join_page(page_index, page_parts, page_started)
+
+        while window:
+            page_index, page_parts, _, page_started = window.popleft()
+            yield _join_page(page_index, page_parts, page_started)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                # spawn: forking a threaded server process is not safe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self._workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_ocr_worker
+                )
+                logger.info(f"OCR process pool started with {self._workers} workers")
+            return self._executor
+
+
+def _init_ocr_worker():
+    # One tesseract thread per process; the pool already uses every core
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+
+def _ocr_image_data(data: bytes) -> str:
+    """OCR encoded image bytes. Module-level so process pool workers can run it."""
+    image = Image.open(BytesIO(data))
+    return pytesseract.image_to_string(image)
+
+
+def _is_worth_ocr(data: bytes) -> bool:
+    try:
+        # Only reads the header, not the pixels
+        width, height = Image.open(BytesIO(data)).size
+    except Exception:
+        return True  # Let the OCR step report the problem
+    return width * height >= settings.OCR_MIN_IMAGE_PIXELS
+
+
+def _run_inline(fn, *args) -> Future:
+    # Serial mode wraps results like the pool does, so both share _join_page
+    future = Future()
+    try:
+        future.set_result(fn(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def _page_ready(parts: List) -> bool:
+    return all(part.done() for part in parts if isinstance(part, Future))
+
+
+def _join_page(page_index: int, parts: List, started: float) -> str:
+    ocred = False
+    pieces = []
+    for part in parts:
+        if isinstance(part, Future):
+            ocred = True
+            try:
+                part = part.result()
+            except Exception as img_err:
+                logger.warning(f"Failed to OCR image on page {page_index}: {img_err}")
+                continue
+            if not part.strip():
+                continue
+            part = f"\n[Page {page_index+1} Image OCR]:\n{part}\n"
+        pieces.append(part)
+    if ocred:
+        metrics.observe("ocr_page", time.perf_counter() - started)
+    return "".join(pieces)
+
 ocr_processor = OCRProcessor()
@@ -1,10 +1,12 @@
 import logging
 import requests
-from bs4 import BeautifulSoup
-from typing import List
+from typing import List, Tuple
+from app.utils.html_extract import get_html_extractor
 
 logger = logging.getLogger(__name__)
 
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
 class WebLoader:
     def load(self, url: str) -> str:
         """
@@ -12,31 +14,23 @@ class WebLoader:
         """
         try:
             headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+                'User-Agent': USER_AGENT
             }
             response = requests.get(url, headers=headers, timeout=10)
             response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Remove script and style elements
-            for script in soup(["script", "style", "nav", "footer", "meta", "noscript"]):
-                script.extract()
-            
-            # Get text
-            text = soup.get_text()
-            
-            # Break into lines and remove leading/trailing space on each
-            lines = (line.strip() for line in text.splitlines())
-            # Break multi-headlines into a line each
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            # Drop blank lines
-            text = '\n'.join(chunk for chunk in chunks if chunk)
-            
-            return f"Source URL: {url}\n\n{text}"
-            
+
+            text, _ = self.parse(response.text, url)
+            return text
+
         except Exception as e:
             logger.error(f"Web Scraping Failed for {url}: {e}")
             raise e
 
+    def parse(self, html: str, url: str) -> Tuple[str, List[str]]:
+        """
+        Clean text of a page plus the absolute URLs it links to.
+        """
+        text, links = get_html_extractor().extract(html, url)
+        return f"Source URL: {url}\n\n{text}", links
+
 web_loader = WebLoader()
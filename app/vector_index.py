@@ -0,0 +1,408 @@
+import logging
+import math
+import numpy as np
+from abc import ABC, abstractmethod
+from typing import Tuple
+from app.core.config import settings
+
+try:
+    import faiss
+except ImportError:  # faiss-cpu is optional at runtime; the numpy index always works
+    faiss = None
+
+logger = logging.getLogger(__name__)
+
+# Rows converted to float32 per step of a quantized scan; small enough for
+# the block to stay in cache between the conversion and the dot product
+QUANTIZED_SCAN_ROWS = 256
+# Rows of a memory map quantized per step when a quantized index syncs
+QUANTIZE_BATCH_ROWS = 8192
+
+class BaseVectorIndex(ABC):
+    """
+    Abstract Base Class for nearest-neighbour indexes.
+    Vectors are expected to be L2-normalized float32 rows, so inner product
+    equals cosine similarity. Row ids are insertion positions.
+    """
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    @abstractmethod
+    def add(self, vectors: np.ndarray):
+        """Append normalized rows of shape (n, dim)."""
+        pass
+
+    @abstractmethod
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the k best rows for a normalized query.
+
+        Returns:
+            (scores, ids), both ordered by descending score.
+        """
+        pass
+
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+    @abstractmethod
+    def to_array(self) -> np.ndarray:
+        """Every row, in id order, as a (n, dim) float32 array."""
+        pass
+
+    def sync(self, vectors: np.ndarray):
+        """
+        Bring the index up to date with `vectors`, which holds every row
+        already added followed by any new ones (e.g. a memory-mapped file
+        another worker appended to).
+        """
+        if len(vectors) > len(self):
+            self.add(np.asarray(vectors[len(self):]))
+
+    @property
+    @abstractmethod
+    def nbytes(self) -> int:
+        """Approximate memory held by the index."""
+        pass
+
+
+class NumpyIndex(BaseVectorIndex):
+    """
+    Exact brute-force search over a growable float32 matrix.
+    Capacity doubles when full, which keeps appends amortized O(1).
+    """
+
+    def __init__(self, dim: int, initial_capacity: int = 256):
+        super().__init__(dim)
+        self._matrix = np.empty((max(1, initial_capacity), dim), dtype=np.float32)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """Rows currently stored (a view, not a copy)."""
+        return self._matrix[:self._size]
+
+    @property
+    def nbytes(self) -> int:
+        return self._matrix.nbytes
+
+    def to_array(self) -> np.ndarray:
+        return np.array(self.vectors)
+
+    def add(self, vectors: np.ndarray):
+        needed = self._size + len(vectors)
+        capacity = max(1, self._matrix.shape[0])
+        if needed > capacity or not self._matrix.flags.writeable:
+            while capacity < needed:
+                capacity *= 2
+            grown = np.empty((capacity, self.dim), dtype=np.float32)
+            grown[:self._size] = self._matrix[:self._size]
+            self._matrix = grown
+
+        self._matrix[self._size:needed] = vectors
+        self._size = needed
+
+    def sync(self, vectors: np.ndarray):
+        # Search the caller's matrix in place. For a read-only memory map this
+        # means every worker shares the same page cache instead of a copy.
+        self._matrix = vectors
+        self._size = len(vectors)
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        similarities = self.vectors @ query
+        top_indices = _top_k(similarities, k)
+        return similarities[top_indices], top_indices
+
+
+class QuantizedIndex(BaseVectorIndex):
+    """
+    Brute-force search over rows kept at reduced precision.
+
+    "float16" halves the memory of float32 rows. "int8" quarters it: each
+    row is scaled by its largest absolute component, at 4 bytes per row for
+    the scale. A query first scores every row approximately, converting a
+    block of rows to float32 at a time.
+
+    When full-precision rows are available (the persistent store's memory
+    map, handed over by `sync`) the best `rerank_factor * k` candidates are
+    then re-scored exactly, so only their pages of the float32 file are
+    read. In-memory stores have no such copy and keep the approximate order.
+    """
+
+    def __init__(self, dim: int, precision: str = "int8", rerank_factor: int = None, initial_capacity: int = 256):
+        super().__init__(dim)
+        if precision not in ("float16", "int8"):
+            raise ValueError(f"Unknown quantization: {precision}")
+        self.precision = precision
+        self.rerank_factor = max(0, settings.VECTOR_RERANK_FACTOR if rerank_factor is None else rerank_factor)
+        capacity = max(1, initial_capacity)
+        self._codes = np.empty((capacity, dim), dtype=np.float16 if precision == "float16" else np.int8)
+        self._scales = np.empty(capacity if precision == "int8" else 0, dtype=np.float32)
+        self._size = 0
+        # Full-precision rows for re-ranking, if the caller has them
+        self._exact = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def bytes_per_vector(self) -> int:
+        return self._codes.itemsize * self.dim + self._scales.itemsize * (self.precision == "int8")
+
+    @property
+    def nbytes(self) -> int:
+        return self._codes.nbytes + self._scales.nbytes
+
+    def to_array(self) -> np.ndarray:
+        if self._exact is not None and len(self._exact) >= self._size:
+            return np.array(self._exact[:self._size])
+        vectors = self._codes[:self._size].astype(np.float32)
+        if self.precision == "int8":
+            vectors *= self._scales[:self._size, None]
+        return vectors
+
+    def add(self, vectors: np.ndarray):
+        needed = self._size + len(vectors)
+        capacity = self._codes.shape[0]
+        if needed > capacity:
+            while capacity < needed:
+                capacity *= 2
+            self._reserve(capacity)
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.precision == "float16":
+            self._codes[self._size:needed] = vectors
+        else:
+            scales = np.abs(vectors).max(axis=1) / 127
+            scales[scales == 0] = 1.0
+            self._codes[self._size:needed] = np.rint(vectors / scales[:, None])
+            self._scales[self._size:needed] = scales
+        self._size = needed
+
+    def sync(self, vectors: np.ndarray):
+        if len(vectors) > self._codes.shape[0]:
+            self._reserve(len(vectors))
+        # Quantize new rows a block at a time, so a large memory map is never
+        # copied whole; keep the map itself for re-ranking
+        for start in range(len(self), len(vectors), QUANTIZE_BATCH_ROWS):
+            self.add(np.asarray(vectors[start:start + QUANTIZE_BATCH_ROWS]))
+        self._exact = vectors
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        size, codes = self._size, self._codes
+        scores = np.empty(size, dtype=np.float32)
+        block = np.empty((min(size, QUANTIZED_SCAN_ROWS), self.dim), dtype=np.float32)
+        for start in range(0, size, QUANTIZED_SCAN_ROWS):
+            end = min(size, start + QUANTIZED_SCAN_ROWS)
+            rows = block[:end - start]
+            if self.precision == "float16":
+                _float16_to_float32(codes[start:end], rows)
+            else:
+                np.copyto(rows, codes[start:end], casting="unsafe")
+            np.dot(rows, query, out=scores[start:end])
+        if self.precision == "int8":
+            scores *= self._scales[:size]
+
+        exact = self._exact
+        if not self.rerank_factor or exact is None or len(exact) < size:
+            top_indices = _top_k(scores, k)
+            return scores[top_indices], top_indices
+
+        # Ascending ids read the memory map front to back
+        candidates = np.sort(_top_k(scores, k * self.rerank_factor))
+        exact_scores = np.asarray(exact[candidates], dtype=np.float32) @ query
+        best = _top_k(exact_scores, k)
+        return exact_scores[best], candidates[best]
+
+    def _reserve(self, capacity: int):
+        codes = np.empty((capacity, self.dim), dtype=self._codes.dtype)
+        codes[:self._size] = self._codes[:self._size]
+        self._codes = codes
+        if self.precision == "int8":
+            scales = np.empty(capacity, dtype=np.float32)
+            scales[:self._size] = self._scales[:self._size]
+            self._scales = scales
+
+
+class FaissFlatIndex(BaseVectorIndex):
+    """
+    Exact inner-product search using FAISS' SIMD kernels.
+    """
+
+    def __init__(self, dim: int):
+        super().__init__(dim)
+        self._index = faiss.IndexFlatIP(dim)
+
+    def __len__(self) -> int:
+        return self._index.ntotal
+
+    @property
+    def nbytes(self) -> int:
+        return self._index.ntotal * self.dim * 4
+
+    def to_array(self) -> np.ndarray:
+        return self._index.reconstruct_n(0, self._index.ntotal)
+
+    def add(self, vectors: np.ndarray):
+        self._index.add(np.ascontiguousarray(vectors, dtype=np.float32))
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        return _faiss_search(self._index, query, k)
+
+
+class FaissANNIndex(BaseVectorIndex):
+    """
+    Approximate search with FAISS IVF or HNSW.
+
+    Small tenants are served by an exact flat index. Once a tenant reaches
+    VECTOR_ANN_MIN_VECTORS rows the ANN index is trained on (IVF) or built
+    from (HNSW) the accumulated vectors and takes over. IVF is retrained
+    whenever the tenant has grown 4x since the last training, so the number
+    of lists keeps tracking the corpus size.
+    """
+
+    def __init__(self, dim: int, kind: str = "ivf"):
+        super().__init__(dim)
+        if kind not in ("ivf", "hnsw"):
+            raise ValueError(f"Unknown ANN index kind: {kind}")
+        self.kind = kind
+        self.min_vectors = max(1, settings.VECTOR_ANN_MIN_VECTORS)
+        self._flat = faiss.IndexFlatIP(dim)
+        self._ann = None
+        self._trained_size = 0
+
+    def __len__(self) -> int:
+        return self._flat.ntotal
+
+    @property
+    def is_trained(self) -> bool:
+        return self._ann is not None
+
+    @property
+    def nbytes(self) -> int:
+        # The flat index keeps the raw vectors for retraining
+        size = self._flat.ntotal * self.dim * 4
+        if self._ann is not None:
+            size += self._ann.ntotal * self.dim * 4
+            if self.kind == "hnsw":
+                size += self._ann.ntotal * settings.VECTOR_HNSW_M * 2 * 4
+        return size
+
+    def to_array(self) -> np.ndarray:
+        return self._flat.reconstruct_n(0, self._flat.ntotal)
+
+    def add(self, vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self._flat.add(vectors)
+
+        total = self._flat.ntotal
+        if self._ann is None:
+            if total >= self.min_vectors:
+                self._build()
+        elif self.kind == "ivf" and total >= 4 * self._trained_size:
+            self._build()
+        else:
+            self._ann.add(vectors)
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        index = self._ann if self._ann is not None else self._flat
+        return _faiss_search(index, query, k)
+
+    def _build(self):
+        total = self._flat.ntotal
+        vectors = self._flat.reconstruct_n(0, total)
+
+        if self.kind == "ivf":
+            # Rule of thumb: ~4*sqrt(n) lists, at least 39 training points per list
+            nlist = max(1, min(int(4 * math.sqrt(total)), total // 39))
+            quantizer = faiss.IndexFlatIP(self.dim)
+            ann = faiss.IndexIVFFlat(quantizer, self.dim, nlist, faiss.METRIC_INNER_PRODUCT)
+            ann.train(vectors)
+            ann.nprobe = min(nlist, max(1, settings.VECTOR_IVF_NPROBE))
+        else:
+            ann = faiss.IndexHNSWFlat(self.dim, settings.VECTOR_HNSW_M, faiss.METRIC_INNER_PRODUCT)
+            ann.hnsw.efConstruction = settings.VECTOR_HNSW_EF_CONSTRUCTION
+            ann.hnsw.efSearch = settings.VECTOR_HNSW_EF_SEARCH
+
+        ann.add(vectors)
+        self._ann = ann
+        self._trained_size = total
+        logger.info(f"Built FAISS {self.kind.upper()} index over {total} vectors")
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Ids of the k highest scores, best first."""
+    # Partial selection is O(n); only the k winners get sorted
+    k = min(k, len(scores))
+    if k < len(scores):
+        top_indices = np.argpartition(scores, -k)[-k:]
+    else:
+        top_indices = np.arange(len(scores))
+    return top_indices[np.argsort(scores[top_indices])[::-1]]
+
+
+def _float16_to_float32(codes: np.ndarray, out: np.ndarray):
+    """
+    Widen float16 `codes` into the float32 array `out` with integer ops, a
+    few times faster than numpy's float16 cast. Shifts sign, exponent and
+    mantissa into float32 position and rebiases the exponent (15 -> 127).
+    Zeros and subnormals (below 6.1e-5) come out as tiny normals, off by
+    less than 6.1e-5; fine for an approximate scan.
+    """
+    bits = out.view(np.int32)
+    # Sign-extends, so the sign lands in bit 31 after the shift
+    np.copyto(bits, codes.view(np.int16), casting="unsafe")
+    np.left_shift(bits, 13, out=bits)
+    np.bitwise_and(bits, np.int32(-0x70002000), out=bits)  # keep sign, exponent, mantissa: 0x8FFFE000
+    np.add(bits, 0x38000000, out=bits)
+
+
+def _faiss_search(index, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    k = min(k, index.ntotal)
+    scores, ids = index.search(np.ascontiguousarray(query.reshape(1, -1), dtype=np.float32), k)
+    # FAISS pads with -1 when fewer than k results are reachable
+    valid = ids[0] >= 0
+    return scores[0][valid], ids[0][valid]
+
+
+INDEX_TYPES = ("numpy", "faiss", "faiss_ivf", "faiss_hnsw")
+QUANTIZATIONS = ("none", "float16", "int8")
+
+def create_index(dim: int, index_type: str = None, quantization: str = None) -> BaseVectorIndex:
+    """
+    Build an empty index of the configured VECTOR_DB_TYPE, storing rows at
+    the configured VECTOR_QUANTIZATION.
+    """
+    index_type = (index_type or settings.VECTOR_DB_TYPE).lower()
+    quantization = (quantization or settings.VECTOR_QUANTIZATION).lower()
+
+    if index_type == "redis":
+        # Redis vector search is not wired up; keep the documented default working
+        index_type = "numpy"
+
+    if quantization != "none":
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown VECTOR_QUANTIZATION '{quantization}'. Expected one of {QUANTIZATIONS}")
+        if index_type in ("numpy", "faiss"):
+            return QuantizedIndex(dim, quantization)
+        logger.warning(f"VECTOR_QUANTIZATION={quantization} only applies to exact indexes; {index_type} stores float32.")
+
+    if index_type.startswith("faiss") and faiss is None:
+        logger.warning(f"VECTOR_DB_TYPE={index_type} but faiss is not installed. Using numpy index.")
+        index_type = "numpy"
+
+    if index_type == "numpy":
+        return NumpyIndex(dim)
+    if index_type == "faiss":
+        return FaissFlatIndex(dim)
+    if index_type == "faiss_ivf":
+        return FaissANNIndex(dim, kind="ivf")
+    if index_type == "faiss_hnsw":
+        return FaissANNIndex(dim, kind="hnsw")
+
+    raise ValueError(f"Unknown VECTOR_DB_TYPE '{index_type}'. Expected one of {INDEX_TYPES}")
@@ -0,0 +1,707 @@
+import hashlib
+import json
+import logging
+import mmap
+import os
+import re
+import threading
+import time
+import numpy as np
+from contextlib import contextmanager
+from functools import partial
+from pathlib import Path
+from typing import List, Dict, Iterable, Optional, Sequence, Callable, Set, Tuple
+from app.core.config import settings
+from app.vector_index import BaseVectorIndex, create_index
+from app.lexical_index import BM25Index, tokenize
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process locking only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Rows copied per step when a persistent store is rewritten
+REWRITE_BATCH_ROWS = 4096
+# Rows tokenized per step when the lexical index catches up
+LEXICAL_BATCH_ROWS = 4096
+
+class VectorStore:
+    """
+    Per-business vector store.
+
+    Rows are L2-normalized to float32 on insert and handed to a pluggable
+    index (see app.vector_index), so cosine similarity is a plain inner
+    product. Texts and metadata are kept here, aligned with index row ids.
+
+    A BM25 inverted index over the texts backs `lexical_search`. Like the
+    per-source index it is derived from the rows and caught up incrementally.
+
+    Removing rows only marks them with tombstones, which search skips
+    right away. `compact` later drops them and renumbers the rest; it builds
+    the new state on the side, so searches keep running meanwhile.
+    """
+
+    def __init__(self, index_factory: Callable[[int], BaseVectorIndex] = create_index):
+        self._index_factory = index_factory
+        self.index: Optional[BaseVectorIndex] = None
+        self.texts: List[str] = []
+        self.metadata: List[Dict] = []
+        # Bumped on every change, so caches can tell the knowledge base moved on
+        self.version = 0
+        # source -> fingerprint of the content last ingested from it
+        self.fingerprints: Dict[str, str] = {}
+        # Ids of removed rows. Replaced, never mutated, so readers need no lock.
+        self._tombstones: Set[int] = set()
+        # Serializes writers (add, remove, compact) within this process
+        self._write_lock = threading.Lock()
+        # Odd while row ids are being renumbered; see _consistent_read
+        self._renumbering = 0
+        # Serializes lexical index updates and queries; separate from the write
+        # lock so a long compaction does not stall keyword search
+        self._lexical_lock = threading.RLock()
+        self._reset_row_indexes()
+
+    def __len__(self) -> int:
+        """Rows in the index, including removed rows not yet compacted."""
+        return 0 if self.index is None else len(self.index)
+
+    @property
+    def dim(self) -> int:
+        return 0 if self.index is None else self.index.dim
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate bytes held by the vector and lexical indexes."""
+        return (0 if self.index is None else self.index.nbytes) + self._lexical.nbytes
+
+    @property
+    def dead_fraction(self) -> float:
+        """Share of rows that are removed but still take up space."""
+        total = len(self)
+        return len(self._tombstones) / total if total else 0.0
+
+    def refresh(self):
+        """Pick up changes made outside this process (no-op in memory)."""
+        pass
+
+    def add(self, vectors: Sequence[Sequence[float]], texts: List[str], metadatas: List[Dict]):
+        """
+        Append vectors with their texts and metadata.
+        """
+        rows = _normalize_rows(vectors, texts, metadatas)
+        if len(rows) == 0:
+            return
+
+        with self._write_lock:
+            if self.index is None:
+                self.index = self._index_factory(rows.shape[1])
+            elif rows.shape[1] != self.dim:
+                raise ValueError(f"Vector dimension {rows.shape[1]} does not match store dimension {self.dim}")
+
+            # Texts first: a concurrent search must never see an id without its text
+            self.texts.extend(texts)
+            self.metadata.extend(metadatas)
+            self.index.add(rows)
+            self.version += 1
+
+    def remove(self, predicate: Callable[[Dict], bool]) -> int:
+        """
+        Remove every live row whose metadata matches `predicate`, which sees
+        rows in id order. Returns the number of rows removed.
+        """
+        with self._write_lock:
+            tombstones = self._tombstones
+            dead = [
+                idx for idx, metadata in enumerate(self.metadata)
+                if idx not in tombstones and predicate(metadata)
+            ]
+            if dead:
+                self._tombstones = tombstones.union(dead)
+                self.version += 1
+            return len(dead)
+
+    def compact(self, min_dead_fraction: float = 0.0) -> int:
+        """
+        Drop removed rows and rebuild the index from the live ones, if at
+        least `min_dead_fraction` of the rows are removed. Returns the number
+        of rows reclaimed.
+        """
+        with self._write_lock:
+            tombstones = self._tombstones
+            if not tombstones or self.dead_fraction < min_dead_fraction:
+                return 0
+
+            keep = [idx for idx in range(len(self)) if idx not in tombstones]
+            index = None
+            if keep:
+                index = self._index_factory(self.dim)
+                index.add(self.index.to_array()[keep])
+            texts = [self.texts[idx] for idx in keep]
+            metadata = [self.metadata[idx] for idx in keep]
+
+            self._renumbering += 1
+            self.index, self.texts, self.metadata, self._tombstones = index, texts, metadata, set()
+            self._reset_row_indexes()
+            self._renumbering += 1
+            return len(tombstones)
+
+    def source_rows(self, source: str) -> Dict[Optional[str], List[int]]:
+        """
+        Ids of the live rows holding chunks of `source`, grouped by chunk
+        content hash (None for rows stored without one).
+        """
+        self.refresh()
+        with self._write_lock:
+            # Index rows added since the last call; cheaper than a scan per ingest
+            before = self._renumbering
+            index, count = self._source_index, len(self)
+            added = [(idx, self._record(idx)[1]) for idx in range(self._source_indexed, count)]
+            # Rows of another generation must not reach the fresh index (another
+            # process compacted while we read); _consistent_read retries
+            if before % 2 == 0 and self._renumbering == before and index is self._source_index:
+                for idx, metadata in added:
+                    if metadata.get("source") is not None:
+                        rows = index.setdefault(metadata["source"], {})
+                        rows.setdefault(metadata.get("hash"), []).append(idx)
+                self._source_indexed = count
+
+            tombstones = self._tombstones
+            live = {}
+            for chunk_hash, ids in index.get(source, {}).items():
+                ids = [idx for idx in ids if idx not in tombstones]
+                if ids:
+                    live[chunk_hash] = ids
+            return live
+
+    def fingerprint(self, source: str) -> Optional[str]:
+        return self.fingerprints.get(source)
+
+    def set_fingerprint(self, source: str, fingerprint: str):
+        self.fingerprints[source] = fingerprint
+
+    def sources(self) -> Set[str]:
+        """Sources whose content was fully ingested (they have a fingerprint)."""
+        return set(self.fingerprints)
+
+    def drop_fingerprints(self, sources: Optional[Iterable[str]] = None):
+        """Forget the fingerprints of `sources`, or of every source."""
+        if sources is None:
+            self.fingerprints = {}
+        else:
+            for source in sources:
+                self.fingerprints.pop(source, None)
+
+    def lexical_search(self, query: str, top_k: int) -> List[Dict]:
+        """
+        Return up to top_k entries ordered by BM25 score for the query terms.
+        """
+        self.refresh()
+        terms = tokenize(query)
+        if len(self) == 0 or top_k <= 0 or not terms:
+            return []
+        return self._consistent_read(lambda: self._lexical_search(terms, top_k))
+
+    def update_lexical_index(self):
+        """
+        Index rows added since the last update. Searches do this lazily;
+        calling it after an ingest keeps that cost off the next question.
+        """
+        self.refresh()
+        self._consistent_read(self._update_lexical_index)
+
+    def search(self, query_vec: Sequence[float], top_k: int) -> List[Dict]:
+        """
+        Return up to top_k entries ordered by cosine similarity to the query.
+        """
+        if len(self) == 0 or top_k <= 0:
+            return []
+
+        query = np.asarray(query_vec, dtype=np.float32)
+        norm_query = np.linalg.norm(query)
+        if norm_query == 0 or query.shape[0] != self.dim:
+            return []
+
+        return self._consistent_read(lambda: self._search(query / norm_query, top_k))
+
+    def _search(self, query: np.ndarray, top_k: int) -> List[Dict]:
+        index, tombstones = self.index, self._tombstones
+        if index is None:
+            return []
+        # Over-fetch by the number of removed rows, so top_k live rows are
+        # still found when every removed row would have ranked first
+        scores, ids = index.search(query, min(len(index), top_k + len(tombstones)))
+
+        results = []
+        for score, idx in zip(scores, ids):
+            idx = int(idx)
+            if idx in tombstones:
+                continue
+            text, metadata = self._record(idx)
+            results.append({"text": text, "metadata": metadata, "score": float(score)})
+            if len(results) == top_k:
+                break
+        return results
+
+    def _lexical_search(self, terms: List[str], top_k: int) -> List[Dict]:
+        with self._lexical_lock:
+            lexical = self._update_lexical_index()
+            tombstones = self._tombstones
+            scores, ids = lexical.search(terms, top_k + len(tombstones))
+
+        results = []
+        for score, idx in zip(scores, ids):
+            idx = int(idx)
+            if idx in tombstones:
+                continue
+            text, metadata = self._record(idx)
+            results.append({"text": text, "metadata": metadata, "score": float(score)})
+            if len(results) == top_k:
+                break
+        return results
+
+    def _update_lexical_index(self) -> BM25Index:
+        with self._lexical_lock:
+            lexical = self._lexical
+            while len(lexical) < len(self):
+                before = self._renumbering
+                if before % 2 or lexical is not self._lexical:
+                    break
+                end = min(len(self), len(lexical) + LEXICAL_BATCH_ROWS)
+                texts = [self._record(idx)[0] for idx in range(len(lexical), end)]
+                # Texts of another generation must not reach the index;
+                # the caller's _consistent_read retries
+                if self._renumbering != before:
+                    break
+                lexical.add_many(texts)
+            return lexical
+
+    def _consistent_read(self, read: Callable):
+        """
+        Run `read` without a lock, retrying if row ids were renumbered
+        (compaction) meanwhile, so an id is never resolved against the
+        wrong generation of texts.
+        """
+        while True:
+            before = self._renumbering
+            if before % 2 == 0:
+                try:
+                    result = read()
+                except Exception:
+                    # A torn read can fail outright rather than return garbage
+                    if self._renumbering == before:
+                        raise
+                    continue
+                if self._renumbering == before:
+                    return result
+            time.sleep(0)
+
+    def _record(self, idx: int) -> Tuple[str, Dict]:
+        return self.texts[idx], self.metadata[idx]
+
+    def _reset_row_indexes(self):
+        # Indexes keyed by row id; rebuilt lazily after renumbering
+        self._source_index: Dict[str, Dict[Optional[str], List[int]]] = {}
+        self._source_indexed = 0
+        self._lexical = BM25Index()
+
+
+class PersistentVectorStore(VectorStore):
+    """
+    Vector store persisted in one directory per business.
+
+    Layout:
+        manifest.json  {"dim", "count", "records_bytes", "deleted", "version",
+                       "generation"}, replaced atomically. It is the commit
+                       point: bytes past it are ignored.
+        vectors.f32    normalized float32 rows, append-only
+        records.jsonl  one {"text", "metadata"} line per row, append-only
+        offsets.u64    byte offset of each row's line in records.jsonl
+        tombstones.u64 ids of removed rows, append-only
+        sources.json   {source: fingerprint}
+
+    Every file is memory-mapped read-only, so opening a store costs the same
+    regardless of corpus size, and all uvicorn workers share one copy of the
+    pages through the OS page cache. Writers append under an exclusive file
+    lock; readers notice new rows by re-checking the manifest on each search.
+
+    Compaction writes the live rows to a new generation of data files
+    (e.g. vectors.1.f32) and then switches the manifest over, so readers
+    still mapping the old generation are unaffected until their next refresh.
+    """
+
+    MANIFEST = "manifest.json"
+    VECTORS = "vectors.f32"
+    RECORDS = "records.jsonl"
+    OFFSETS = "offsets.u64"
+    TOMBSTONES = "tombstones.u64"
+    SOURCES = "sources.json"
+    LOCK = ".lock"
+
+    def __init__(self, path: Path, index_factory: Callable[[int], BaseVectorIndex] = create_index):
+        super().__init__(index_factory)
+        self.path = Path(path)
+        self._dim = 0
+        self._count = 0
+        self._deleted = 0
+        self._generation = 0
+        self._manifest_stamp = None
+        self._vectors: Optional[np.ndarray] = None
+        # (offsets, records, records_bytes), replaced as one so a reader never
+        # pairs the offsets of one mapping with the record bytes of another
+        self._rows: Optional[Tuple[np.ndarray, mmap.mmap, int]] = None
+        self._lock = threading.Lock()
+        self.refresh()
+
+    @classmethod
+    def exists(cls, path: Path) -> bool:
+        return (Path(path) / cls.MANIFEST).exists()
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def dim(self) -> int:
+        return self._dim
+
+    def refresh(self):
+        """
+        Map rows committed since the last call, by this or another process.
+        A stat of the manifest is all it costs when nothing changed.
+        """
+        try:
+            stat = os.stat(self.path / self.MANIFEST)
+        except FileNotFoundError:
+            return
+        # os.replace gives every manifest version a fresh inode
+        stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if stamp == self._manifest_stamp:
+            return
+
+        with self._lock:
+            manifest = self._read_manifest()
+            if manifest:
+                try:
+                    self._map(manifest)
+                except FileNotFoundError:
+                    # Another process compacted in between; map its generation
+                    self._map(self._read_manifest())
+            self._manifest_stamp = stamp
+
+    def add(self, vectors: Sequence[Sequence[float]], texts: List[str], metadatas: List[Dict]):
+        rows = _normalize_rows(vectors, texts, metadatas)
+        if len(rows) == 0:
+            return
+
+        lines = [
+            json.dumps({"text": text, "metadata": metadata}).encode("utf-8") + b"\n"
+            for text, metadata in zip(texts, metadatas)
+        ]
+        lengths = np.fromiter((len(line) for line in lines), dtype=np.uint64, count=len(lines))
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        with self._file_lock():
+            # Another worker may have appended since our last refresh
+            manifest = self._read_manifest() or {"dim": rows.shape[1], "count": 0, "records_bytes": 0}
+            dim, count, records_bytes = manifest["dim"], manifest["count"], manifest["records_bytes"]
+            generation = manifest.get("generation", 0)
+            if rows.shape[1] != dim:
+                raise ValueError(f"Vector dimension {rows.shape[1]} does not match store dimension {dim}")
+
+            offsets = np.empty(len(lines), dtype=np.uint64)
+            offsets[0] = records_bytes
+            offsets[1:] = records_bytes + np.cumsum(lengths)[:-1]
+
+            _append(self._file(self.VECTORS, generation), count * dim * 4, rows.tobytes())
+            _append(self._file(self.OFFSETS, generation), count * 8, offsets.tobytes())
+            _append(self._file(self.RECORDS, generation), records_bytes, b"".join(lines))
+
+            self._write_json(self.MANIFEST, {
+                **manifest,
+                "dim": dim,
+                "count": count + len(rows),
+                "records_bytes": records_bytes + int(lengths.sum()),
+                "version": manifest.get("version", 0) + 1,
+                "generation": generation
+            })
+
+        self.refresh()
+
+    def remove(self, predicate: Callable[[Dict], bool]) -> int:
+        with self._file_lock():
+            manifest = self._read_manifest()
+            if not manifest or manifest["count"] == 0:
+                return 0
+            # Decide on the rows as committed right now, not as last refreshed.
+            # Nobody else can write while we hold the file lock.
+            with self._lock:
+                self._map(manifest)
+            tombstones = self._tombstones
+            dead = [
+                idx for idx in range(self._count)
+                if idx not in tombstones and predicate(self._record(idx)[1])
+            ]
+            if dead:
+                deleted = manifest.get("deleted", 0)
+                generation = manifest.get("generation", 0)
+                _append(self._file(self.TOMBSTONES, generation), deleted * 8, np.asarray(dead, dtype=np.uint64).tobytes())
+                self._write_json(self.MANIFEST, {
+                    **manifest,
+                    "deleted": deleted + len(dead),
+                    "version": manifest.get("version", 0) + 1
+                })
+
+        self.refresh()
+        return len(dead)
+
+    def compact(self, min_dead_fraction: float = 0.0) -> int:
+        """
+        Rewrite the live rows into the next generation of files. Writers in
+        every process wait for it (file lock); searches do not.
+        """
+        with self._file_lock():
+            manifest = self._read_manifest()
+            if not manifest or not manifest.get("deleted"):
+                return 0
+            with self._lock:
+                self._map(manifest)
+            tombstones = self._tombstones
+            if self.dead_fraction < min_dead_fraction:
+                return 0
+
+            started = time.perf_counter()
+            keep = [idx for idx in range(self._count) if idx not in tombstones]
+            self._rewrite(manifest, keep)
+
+        self.refresh()
+        logger.info(
+            f"Compacted {self.path}: reclaimed {len(tombstones)} rows, kept {len(keep)} "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+        return len(tombstones)
+
+    def source_rows(self, source: str) -> Dict[Optional[str], List[int]]:
+        return self._consistent_read(lambda: super(PersistentVectorStore, self).source_rows(source))
+
+    def fingerprint(self, source: str) -> Optional[str]:
+        # Read on demand so fingerprints written by other workers are seen
+        return self._read_json(self.SOURCES, {}).get(source)
+
+    def sources(self) -> Set[str]:
+        return set(self._read_json(self.SOURCES, {}))
+
+    def set_fingerprint(self, source: str, fingerprint: str):
+        self.path.mkdir(parents=True, exist_ok=True)
+        with self._file_lock():
+            fingerprints = self._read_json(self.SOURCES, {})
+            fingerprints[source] = fingerprint
+            self._write_json(self.SOURCES, fingerprints)
+
+    def drop_fingerprints(self, sources: Optional[Iterable[str]] = None):
+        if not self.path.exists():
+            return
+        with self._file_lock():
+            fingerprints = {}
+            if sources is not None:
+                fingerprints = self._read_json(self.SOURCES, {})
+                for source in sources:
+                    fingerprints.pop(source, None)
+            self._write_json(self.SOURCES, fingerprints)
+
+    def search(self, query_vec: Sequence[float], top_k: int) -> List[Dict]:
+        self.refresh()
+        return super().search(query_vec, top_k)
+
+    def _record(self, idx: int) -> Tuple[str, Dict]:
+        record = json.loads(self._record_bytes(idx))
+        return record["text"], record["metadata"]
+
+    def _map(self, manifest: Dict):
+        dim, count = manifest["dim"], manifest["count"]
+        deleted = manifest.get("deleted", 0)
+        generation = manifest.get("generation", 0)
+        self.version = manifest.get("version", count)
+        if count == self._count and dim == self._dim and generation == self._generation:
+            if deleted != self._deleted:
+                self._load_tombstones(deleted)
+            return
+
+        renumbered = generation != self._generation
+        if renumbered:
+            # Rows were renumbered by a compaction; readers retry around this
+            self._renumbering += 1
+        try:
+            if renumbered:
+                self.index = None
+                self._reset_row_indexes()
+            if count == 0:
+                self.index, self._vectors, self._rows = None, None, None
+                self._dim, self._count, self._generation = dim, 0, generation
+            else:
+                vectors = np.memmap(self._file(self.VECTORS, generation), dtype=np.float32, mode="r", shape=(count, dim))
+                offsets = np.memmap(self._file(self.OFFSETS, generation), dtype=np.uint64, mode="r", shape=(count,))
+                with open(self._file(self.RECORDS, generation), "rb") as f:
+                    records = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+                index = self.index
+                if index is None or dim != self._dim or count < len(index):
+                    index = self._index_factory(dim)
+                index.sync(vectors)
+
+                # Texts first: a concurrent search must never see an id without its text
+                self._vectors = vectors
+                self._rows = (offsets, records, manifest["records_bytes"])
+                self._dim, self._count, self._generation = dim, count, generation
+                self.index = index
+            if renumbered or deleted != self._deleted:
+                self._load_tombstones(deleted)
+        finally:
+            if renumbered:
+                self._renumbering += 1
+
+    def _load_tombstones(self, deleted: int):
+        tombstones = set()
+        if deleted:
+            ids = np.fromfile(self._file(self.TOMBSTONES, self._generation), dtype=np.uint64, count=deleted)
+            tombstones = set(ids.tolist())
+        self._tombstones, self._deleted = tombstones, deleted
+
+    def _rewrite(self, manifest: Dict, keep: List[int]):
+        """
+        Write rows `keep` of the mapped generation to the next generation and
+        commit it. Must hold the file lock.
+        """
+        old_generation = manifest.get("generation", 0)
+        generation = old_generation + 1
+        keep_ids = np.asarray(keep, dtype=np.int64)
+        offsets = np.empty(len(keep), dtype=np.uint64)
+        records_bytes = 0
+
+        with open(self._file(self.VECTORS, generation), "wb") as vectors_file, \
+                open(self._file(self.RECORDS, generation), "wb") as records_file:
+            # Slices keep memory bounded on large stores
+            for start in range(0, len(keep_ids), REWRITE_BATCH_ROWS):
+                batch = keep_ids[start:start + REWRITE_BATCH_ROWS]
+                vectors_file.write(np.ascontiguousarray(self._vectors[batch]).tobytes())
+                for i, idx in enumerate(batch, start=start):
+                    line = self._record_bytes(int(idx))
+                    offsets[i] = records_bytes
+                    records_file.write(line)
+                    records_bytes += len(line)
+            for f in (vectors_file, records_file):
+                f.flush()
+                os.fsync(f.fileno())
+        with open(self._file(self.OFFSETS, generation), "wb") as f:
+            f.write(offsets.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+        self._write_json(self.MANIFEST, {
+            "dim": manifest["dim"],
+            "count": len(keep),
+            "records_bytes": records_bytes,
+            "deleted": 0,
+            "version": manifest.get("version", 0) + 1,
+            "generation": generation
+        })
+
+        # Processes still mapping the old files keep their pages until they remap
+        for name in (self.VECTORS, self.OFFSETS, self.RECORDS, self.TOMBSTONES):
+            path = self._file(name, old_generation)
+            try:
+                if path.exists():
+                    os.remove(path)
+            except OSError as e:
+                logger.warning(f"Could not remove old store file {path}: {e}")
+
+    def _record_bytes(self, idx: int) -> bytes:
+        # The last row of this mapping ends at its records_bytes, whatever was appended since
+        offsets, records, records_bytes = self._rows
+        start = int(offsets[idx])
+        end = int(offsets[idx + 1]) if idx + 1 < len(offsets) else records_bytes
+        return records[start:end]
+
+    def _file(self, name: str, generation: int) -> Path:
+        # Generation 0 keeps the original file names
+        if not generation:
+            return self.path / name
+        stem, ext = name.split(".", 1)
+        return self.path / f"{stem}.{generation}.{ext}"
+
+    def _read_manifest(self) -> Optional[Dict]:
+        return self._read_json(self.MANIFEST, None)
+
+    def _read_json(self, name: str, default):
+        try:
+            with open(self.path / name, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return default
+
+    def _write_json(self, name: str, data: Dict):
+        tmp = self.path / f"{name}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path / name)
+
+    @contextmanager
+    def _file_lock(self):
+        # The thread lock covers platforms without flock; flock covers other processes
+        with self._write_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.path / self.LOCK, "a") as f:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def store_path(business_id: str) -> Path:
+    """
+    Directory holding a business' persistent store.
+    Ids that are not filesystem-safe get a hash suffix to stay unique.
+    """
+    safe = re.sub(r"[^A-Za-z0-9_.-]", "_", business_id).lstrip(".") or "_"
+    if safe != business_id:
+        safe = f"{safe}-{hashlib.sha1(business_id.encode('utf-8')).hexdigest()[:12]}"
+    return Path(settings.VECTOR_STORE_DIR) / safe
+
+
+def business_index_factory(business_id: str) -> Callable[[int], BaseVectorIndex]:
+    """
+    Index factory for a business, honouring its VECTOR_QUANTIZATION_BUSINESSES
+    override ("id:mode" pairs) over the global VECTOR_QUANTIZATION.
+    """
+    for entry in settings.VECTOR_QUANTIZATION_BUSINESSES.split(","):
+        business, _, quantization = entry.strip().rpartition(":")
+        if business and business == business_id:
+            return partial(create_index, quantization=quantization.strip())
+    return create_index
+
+
+def _normalize_rows(vectors: Sequence[Sequence[float]], texts: List[str], metadatas: List[Dict]) -> np.ndarray:
+    rows = np.array(vectors, dtype=np.float32, ndmin=2) if len(vectors) else np.empty((0, 0), dtype=np.float32)
+    if len(rows) != len(texts) or len(rows) != len(metadatas):
+        raise ValueError("vectors, texts and metadatas must have the same length")
+
+    norms = np.linalg.norm(rows, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    rows /= norms
+    return rows
+
+
+def _append(path: Path, committed_size: int, data: bytes):
+    # Drop any tail a crashed writer left past the last committed manifest
+    mode = "r+b" if path.exists() else "w+b"
+    with open(path, mode) as f:
+        f.truncate(committed_size)
+        f.seek(committed_size)
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
@@ -0,0 +1,173 @@
+"""
+Retrieval recall of each chunking strategy on a synthetic knowledge base.
+
+Generates Markdown documents (headings, paragraphs of filler) that contain
+known facts such as "The Kestrel plan warranty period is 18 months.",
+chunks them with every strategy, embeds chunks and questions with a local
+hashed bag-of-words embedder (no API calls) and checks whether a chunk
+containing the whole fact is among the top-k results. A fact that a
+strategy cuts in two cannot be retrieved whole and counts as a miss.
+Every document also carries a --blob-chars run without any whitespace
+(base64 or a list of URLs glued together), which a strategy must cut by
+characters to stay within its chunk size.
+
+Usage:
+    python -m benchmarks.chunking_recall --docs 40 --target-tokens 256
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import string
+import numpy as np
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from app.chunking import CHUNKERS, FixedChunker, WordWindowChunker, token_counter
+from app.core.config import settings
+from app.vector_store import VectorStore
+
+FILLER = (
+    "our team customers service quality support local community business provide offer help "
+    "available information please contact details new years experience products range "
+    "request visit store online order delivery free standard include every option "
+    "member staff friendly welcome policy process update notice general questions schedule"
+).split()
+ENTITIES = (
+    "Kestrel Harbor Juniper Obsidian Marigold Quartz Saffron Tundra Willow Zephyr "
+    "Aurora Basalt Cobalt Dahlia Ember Falcon Garnet Heron Indigo Jasper"
+).split()
+KINDS = ["plan", "branch", "package", "service", "membership"]
+ATTRIBUTES = {
+    "warranty period": lambda r: f"{r.randint(6, 60)} months",
+    "monthly price": lambda r: f"${r.randint(9, 499)}",
+    "opening time": lambda r: f"{r.randint(6, 11)}:{r.choice(['00', '15', '30', '45'])} am",
+    "support email": lambda r: f"help-{r.randint(100, 999)}@example.com",
+    "cancellation window": lambda r: f"{r.randint(2, 30)} days",
+    "delivery fee": lambda r: f"${r.randint(1, 40)}.{r.randint(0, 99):02d}"
+}
+
+
+def filler_sentence(r: random.Random) -> str:
+    words = r.choices(FILLER, k=r.randint(8, 18))
+    return " ".join(words).capitalize() + "."
+
+
+def make_blob(r: random.Random, chars: int) -> str:
+    if r.random() < 0.5:
+        return "".join(r.choices(string.ascii_letters + string.digits + "+/", k=chars))
+    urls = []
+    while sum(map(len, urls)) < chars:
+        urls.append(f"https://example.com/{r.choice(FILLER)}/{r.randint(1000, 9999)}?ref={r.choice(ENTITIES).lower()}")
+    return "".join(urls)[:chars]
+
+
+def make_corpus(docs: int, seed: int, blob_chars: int = 0):
+    """Documents plus (fact sentence, question) pairs."""
+    r = random.Random(seed)
+    documents, facts = [], []
+    for d in range(docs):
+        parts = [f"# Document {d}"]
+        for s in range(r.randint(4, 8)):
+            entity = f"{r.choice(ENTITIES)} {r.choice(KINDS)} {d}-{s}"
+            parts.append(f"## {entity.title()}")
+            for _ in range(r.randint(2, 5)):
+                sentences = [filler_sentence(r) for _ in range(r.randint(2, 6))]
+                if r.random() < 0.7:
+                    attribute = r.choice(list(ATTRIBUTES))
+                    fact = f"The {entity} {attribute} is {ATTRIBUTES[attribute](r)}."
+                    sentences.insert(r.randint(0, len(sentences)), fact)
+                    facts.append((fact, f"What is the {attribute} of the {entity}?"))
+                parts.append(" ".join(sentences))
+        if blob_chars:
+            parts += [f"## Attachment {d}", make_blob(r, blob_chars)]
+        documents.append("\n\n".join(parts) + "\n")
+    return documents, facts
+
+
+def embed(texts, dim: int = 1024) -> np.ndarray:
+    """Hashed bag of words; deterministic across runs."""
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in re.findall(r"[a-z0-9$@.:-]+", text.lower()):
+            word = word.strip(".:")
+            if len(word) < 2 or word in ("the", "is", "of", "what"):
+                continue
+            digest = hashlib.blake2b(word.encode(), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % dim
+            vectors[row, bucket] += 1.0 if digest[4] & 1 else -1.0
+    return vectors
+
+
+def evaluate(chunker, documents, facts, ks, count) -> dict:
+    # Feed each document as small sections, like pages from a loader
+    chunks = []
+    for document in documents:
+        sections = [document[i:i + 700] for i in range(0, len(document), 700)]
+        chunks.extend(chunker.iter_chunks(sections))
+
+    store = VectorStore()
+    store.add(embed(chunks), chunks, [{} for _ in chunks])
+    normalized = [" ".join(chunk.split()) for chunk in chunks]
+    queries = embed([question for _, question in facts])
+
+    hits = {k: 0 for k in ks}
+    context_tokens = {k: 0 for k in ks}
+    for (fact, _), query in zip(facts, queries):
+        results = store.search(query, max(ks))
+        for k in ks:
+            top = results[:k]
+            context_tokens[k] += sum(count(res["text"]) for res in top)
+            if any(fact in " ".join(res["text"].split()) for res in top):
+                hits[k] += 1
+
+    return {
+        "strategy": chunker.signature,
+        "chunks": len(chunks),
+        "avg_chunk_tokens": round(sum(count(c) for c in chunks) / max(1, len(chunks)), 1),
+        "max_chunk_tokens": max(count(c) for c in chunks),
+        "facts_split": sum(1 for fact, _ in facts if not any(fact in c for c in normalized)),
+        **{f"recall@{k}": round(hits[k] / len(facts), 4) for k in ks},
+        **{f"context_tokens@{k}": round(context_tokens[k] / len(facts), 1) for k in ks}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=40)
+    parser.add_argument("--target-tokens", type=int, default=settings.CHUNK_TARGET_TOKENS)
+    parser.add_argument("--overlap-tokens", type=int, default=settings.CHUNK_OVERLAP_TOKENS)
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5])
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--blob-chars", type=int, default=5000, help="Unbroken text per document; 0 for none")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    documents, facts = make_corpus(args.docs, args.seed, args.blob_chars)
+    count = token_counter(settings.EMBEDDING_MODEL)
+    chunkers = [FixedChunker()] + [
+        cls(args.target_tokens, args.overlap_tokens if cls is WordWindowChunker else 0)
+        for name, cls in CHUNKERS.items() if name != "fixed"
+    ]
+    results = [evaluate(chunker, documents, facts, args.k, count) for chunker in chunkers]
+
+    if args.json:
+        print(json.dumps({"docs": args.docs, "facts": len(facts), "results": results}, indent=2))
+        return
+
+    print(f"{args.docs} documents, {len(facts)} facts")
+    header = f"{'strategy':<20}{'chunks':>8}{'tok/chunk':>11}{'max':>6}{'split':>7}"
+    header += "".join(f"{f'R@{k}':>8}" for k in args.k) + "".join(f"{f'ctx@{k}':>9}" for k in args.k)
+    print(header)
+    for row in results:
+        line = f"{row['strategy']:<20}{row['chunks']:>8}{row['avg_chunk_tokens']:>11}{row['max_chunk_tokens']:>6}"
+        line += f"{row['facts_split']:>7}"
+        line += "".join(f"{row[f'recall@{k}']:>8}" for k in args.k)
+        line += "".join(f"{row[f'context_tokens@{k}']:>9}" for k in args.k)
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
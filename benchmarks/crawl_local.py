@@ -0,0 +1,155 @@
+"""
+Crawl a generated website served from a local HTTP server.
+
+The fixture site has --pages pages linked as a tree, a sitemap.xml listing
+half of them, robots.txt, ETag support (If-None-Match -> 304) and an
+artificial per-request latency, so the effect of concurrency and of
+conditional re-fetching is visible. Pages are not embedded; the benchmark
+measures crawling only. The second crawl should answer every page with 304.
+
+Requires a local redis-server (REDIS_HOST/REDIS_PORT) for the crawl cache.
+
+Usage:
+    python -m benchmarks.crawl_local --pages 200 --latency-ms 50
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from app.core.config import settings
+from app.core.redis_client import async_redis_client
+from app.utils.crawler import WebCrawler
+
+
+def make_site(pages: int) -> dict:
+    """path -> HTML body; page i links to its children 2i+1 and 2i+2."""
+    site = {}
+    for i in range(pages):
+        children = [c for c in (2 * i + 1, 2 * i + 2) if c < pages]
+        links = "".join(f'<li><a href="/page/{c}">Page {c}</a></li>' for c in children)
+        site["/" if i == 0 else f"/page/{i}"] = (
+            f"<html><head><title>Page {i}</title></head><body>"
+            f"<nav><a href='/'>Home</a></nav><h1>Page {i}</h1>"
+            f"<p>{'Content of page %d. ' % i * 40}</p><ul>{links}</ul></body></html>"
+        )
+    return site
+
+
+def serve(site: dict, latency: float) -> ThreadingHTTPServer:
+    sitemap_urls = "".join(f"<url><loc>{{origin}}{path}</loc></url>" for path in list(site)[::2])
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            origin = f"http://{self.headers['Host']}"
+            if self.path == "/robots.txt":
+                return self._send(f"User-agent: *\nSitemap: {origin}/sitemap.xml\n", "text/plain")
+            if self.path == "/sitemap.xml":
+                body = ('<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                        f"{sitemap_urls.replace('{origin}', origin)}</urlset>")
+                return self._send(body, "application/xml")
+            if self.path not in site:
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = site[self.path]
+            etag = '"%s"' % hashlib.md5(body.encode()).hexdigest()
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            self._send(body, "text/html; charset=utf-8", etag)
+
+        def _send(self, body: str, content_type: str, etag: str = None):
+            data = body.encode()
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            if etag:
+                self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def run(url: str, pages: int, concurrency: int) -> list:
+    settings.CRAWL_CONCURRENCY = concurrency
+    settings.CRAWL_PER_HOST_CONCURRENCY = concurrency
+    crawler = WebCrawler()
+    business_id = f"bench-crawl-{time.time_ns()}"
+    results = []
+    stored = set()
+    try:
+        for label in ("first crawl", "re-crawl"):
+            ingested = []
+
+            async def on_page(page):
+                ingested.append(page.url)
+                stored.add(page.url)
+
+            start = time.perf_counter()
+            stats = await crawler.crawl(
+                business_id, url, on_page, max_pages=pages, max_depth=64, known=set(stored)
+            )
+            elapsed = time.perf_counter() - start
+            results.append({
+                "run": label,
+                "concurrency": concurrency,
+                "seconds": round(elapsed, 3),
+                "pages_per_s": round(stats.done / elapsed, 1),
+                "pages_ingested": len(ingested),
+                **stats.to_dict()
+            })
+    finally:
+        await crawler.close()
+    return results
+
+
+async def main_async(args) -> list:
+    server = serve(make_site(args.pages), args.latency_ms / 1000)
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+    try:
+        results = []
+        for concurrency in args.concurrency:
+            results.extend(await run(url, args.pages, concurrency))
+        return results
+    finally:
+        server.shutdown()
+        await async_redis_client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'run':<13}{'conc':>6}{'seconds':>9}{'pages/s':>9}{'fetched':>9}{'304':>6}{'ingested':>10}")
+    for row in results:
+        print(f"{row['run']:<13}{row['concurrency']:>6}{row['seconds']:>9}{row['pages_per_s']:>9}"
+              f"{row['fetched']:>9}{row['not_modified']:>6}{row['pages_ingested']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Load test for query-embedding coalescing against a local mock embeddings API.
+
+N concurrent clients each embed a series of distinct chat questions through
+RAGManager.embed_query, first with coalescing off (one request per
+question, as before) and then with several
+EMBEDDING_QUERY_BATCH_WAIT_MS windows. The embedding cache is disabled so
+every question reaches the API. Reports questions/s, latency, HTTP requests
+sent, batch size, queueing delay and failed embeds; with --rpm the mock
+enforces a rate limit and answers 429 beyond it.
+
+Usage:
+    python -m benchmarks.embedding_batching --clients 200 --queries 10 --latency-ms 40
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+import numpy as np
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+# Every question must reach the API
+os.environ["EMBEDDING_CACHE_SIZE"] = "0"
+os.environ["EMBEDDING_CACHE_REDIS"] = "false"
+
+from app.core.config import settings
+from app.embedding_batcher import EmbeddingBatcher
+from app.rag import rag_manager
+from benchmarks.mock_openai import MockOpenAI
+
+
+async def run_mode(mock: MockOpenAI, wait_ms: float, clients: int, queries: int) -> dict:
+    rag_manager.query_batcher = EmbeddingBatcher(rag_manager._embed_query_batch, max_wait_ms=wait_ms)
+    mock.reset()
+    latencies = []
+    failures = 0
+
+    async def client(c: int):
+        nonlocal failures
+        for q in range(queries):
+            start = time.perf_counter()
+            vector = await rag_manager.embed_query(f"wait {wait_ms} client {c} question {q}: what are your opening hours?")
+            latencies.append(time.perf_counter() - start)
+            failures += not vector
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(c) for c in range(clients)))
+    elapsed = time.perf_counter() - start
+
+    batcher = rag_manager.query_batcher.stats() if rag_manager.query_batcher.enabled else {}
+    return {
+        "wait_ms": wait_ms,
+        "questions": clients * queries,
+        "questions_per_s": round(clients * queries / elapsed, 1),
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 1),
+        "p99_ms": round(float(np.percentile(latencies, 99)) * 1000, 1),
+        "http_requests": mock.requests,
+        "rate_limited": mock.rate_limited,
+        "failed": failures,
+        "avg_batch_size": batcher.get("avg_batch_size", 1.0),
+        "avg_wait_ms": batcher.get("avg_wait_ms", 0.0)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=10, help="Questions per client, one after another")
+    parser.add_argument("--wait-ms", type=float, nargs="+", default=[0, 2, 5, 10], help="0 = coalescing off")
+    parser.add_argument("--latency-ms", type=float, default=40.0, help="Mock API latency per request")
+    parser.add_argument("--rpm", type=int, default=0, help="Mock API rate limit (0 = unlimited)")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    # Rate-limited embeds are counted in the table rather than logged one by one
+    logging.getLogger("app.rag").setLevel(logging.CRITICAL)
+    logging.getLogger("app.llm.scheduler").setLevel(logging.CRITICAL)
+    mock = MockOpenAI(latency_ms=args.latency_ms, rpm=args.rpm).start()
+    settings.OPENAI_BASE_URL = mock.url
+    try:
+        results = [asyncio.run(run_mode(mock, wait, args.clients, args.queries)) for wait in args.wait_ms]
+    finally:
+        mock.stop()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.clients} clients x {args.queries} questions, mock latency {args.latency_ms} ms, rpm {args.rpm or 'unlimited'}")
+    print(f"{'wait ms':>8}{'q/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'requests':>10}{'429s':>7}{'failed':>8}{'batch':>8}{'queue ms':>10}")
+    for row in results:
+        print(f"{row['wait_ms']:>8}{row['questions_per_s']:>9}{row['p50_ms']:>9}{row['p99_ms']:>9}"
+              f"{row['http_requests']:>10}{row['rate_limited']:>7}{row['failed']:>8}"
+              f"{row['avg_batch_size']:>8}{row['avg_wait_ms']:>10}")
+
+
+if __name__ == "__main__":
+    main()
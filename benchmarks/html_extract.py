@@ -0,0 +1,151 @@
+"""
+Throughput and output size of each HTML extractor over a corpus of pages.
+
+By default a corpus of catalog-style pages is generated: a mega-menu of
+links, a cookie banner, a newsletter popup, inline scripts and styles, a
+footer, and a product grid, with half the pages marking their content with
+<main> and half using plain <div> layout. For generated pages the benchmark
+also reports content recall (product facts that survive extraction) and
+boilerplate leakage (menu, banner and footer strings that do too).
+
+Point --dir at a folder of saved .html files to measure a real corpus
+(throughput and size only).
+
+Usage:
+    python -m benchmarks.html_extract --pages 200 --products 60
+    python -m benchmarks.html_extract --dir ./saved_pages
+"""
+import argparse
+import json
+import os
+import random
+import time
+from pathlib import Path
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from app.utils.html_extract import EXTRACTORS, get_html_extractor
+
+CATEGORIES = "Kitchen Garden Bathroom Lighting Storage Outdoor Office Kids Pets Decor Textiles Tools".split()
+WORDS = "durable premium compact handmade classic modern natural eco soft sturdy elegant portable".split()
+BOILERPLATE = [
+    "We use cookies to improve your experience",
+    "Accept all cookies",
+    "Subscribe to our newsletter for 10% off",
+    "Copyright 2024 Example Retail Ltd",
+    "Shipping policy",
+    "Share on Facebook"
+]
+
+
+def make_page(r: random.Random, index: int, products: int):
+    """HTML plus the product facts it contains."""
+    menu = "".join(
+        f"<li><a href='/c/{c.lower()}'>{c}</a><ul>"
+        + "".join(f"<li><a href='/c/{c.lower()}/{s}'>{c} {r.choice(WORDS)} {s}</a></li>" for s in range(12))
+        + "</ul></li>"
+        for c in CATEGORIES
+    )
+    facts, cards = [], []
+    for p in range(products):
+        name = f"{r.choice(WORDS).title()} {r.choice(CATEGORIES)} Item {index}-{p}"
+        price = f"${r.randint(5, 900)}.{r.randint(0, 99):02d}"
+        description = f"A {r.choice(WORDS)} and {r.choice(WORDS)} piece for everyday use, model {index}{p:03d}."
+        facts += [name, price, description]
+        cards.append(
+            f"<div class='product-card' data-sku='{index}-{p}'>"
+            f"<img src='/img/{index}-{p}.jpg' alt=''><h3><a href='/p/{index}-{p}'>{name}</a></h3>"
+            f"<span class='price'>{price}</span><p>{description}</p>"
+            f"<button class='add-to-cart'>Add to cart</button></div>"
+        )
+    content = (
+        f"<h1>{CATEGORIES[index % len(CATEGORIES)]} collection</h1>"
+        f"<p>Browse our {CATEGORIES[index % len(CATEGORIES)].lower()} range of {products} products.</p>"
+        f"<div class='grid'>{''.join(cards)}</div>"
+        f"<div class='share-bar'><a href='#'>{BOILERPLATE[5]}</a></div>"
+    )
+    wrapper = f"<main>{content}</main>" if index % 2 == 0 else f"<div id='content' class='container'>{content}</div>"
+    html = (
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>"
+        f"<title>{CATEGORIES[index % len(CATEGORIES)]} | Example Retail</title>"
+        "<style>" + ".card{margin:0 auto;padding:4px}" * 200 + "</style>"
+        "<script type='application/ld+json'>" + json.dumps({"@type": "ItemList", "items": facts[:30]}) + "</script>"
+        "</head><body>"
+        f"<div class='cookie-consent'><p>{BOILERPLATE[0]}.</p><button>{BOILERPLATE[1]}</button></div>"
+        f"<header class='site-header'><a href='/'>Example Retail</a><nav><ul>{menu}</ul></nav></header>"
+        f"{wrapper}"
+        f"<div class='newsletter-popup' style='display:none'>{BOILERPLATE[2]}</div>"
+        f"<footer><p>{BOILERPLATE[3]}</p><ul><li><a href='/shipping'>{BOILERPLATE[4]}</a></li></ul></footer>"
+        "<script>" + "window.dataLayer=window.dataLayer||[];" * 100 + "</script>"
+        "</body></html>"
+    )
+    return html, facts
+
+
+def load_corpus(args):
+    if args.dir:
+        paths = sorted(Path(args.dir).rglob("*.htm*"))
+        return [(p.read_text(encoding="utf-8", errors="replace"), None) for p in paths]
+    r = random.Random(args.seed)
+    return [make_page(r, i, args.products) for i in range(args.pages)]
+
+
+def evaluate(name: str, corpus, repeat: int) -> dict:
+    extractor = get_html_extractor(name)
+    input_bytes = sum(len(html.encode("utf-8")) for html, _ in corpus)
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        outputs = [extractor.extract(html, "https://shop.example.com/")[0] for html, _ in corpus]
+        best = min(best, time.perf_counter() - start)
+
+    row = {
+        "extractor": name,
+        "pages": len(corpus),
+        "pages_per_s": round(len(corpus) / best, 1),
+        "input_mb_per_s": round(input_bytes / best / 1e6, 2),
+        "avg_output_chars": round(sum(len(text) for text in outputs) / len(corpus)),
+        "output_ratio": round(sum(len(text) for text in outputs) / input_bytes, 4)
+    }
+    if corpus[0][1] is not None:
+        # Compare on collapsed whitespace; extractors break lines differently
+        flat = [" ".join(text.split()) for text in outputs]
+        facts = sum(len(f) for _, f in corpus)
+        row["content_recall"] = round(sum(fact in text for text, (_, f) in zip(flat, corpus) for fact in f) / facts, 4)
+        row["boilerplate_leak"] = round(
+            sum(b in text for text in flat for b in BOILERPLATE) / (len(BOILERPLATE) * len(corpus)), 4
+        )
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--products", type=int, default=60, help="Products per generated page")
+    parser.add_argument("--dir", help="Folder of saved .html pages instead of the generated corpus")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per extractor; the fastest is reported")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args)
+    if not corpus:
+        parser.error(f"No .html files under {args.dir}")
+    results = [evaluate(name, corpus, args.repeat) for name in EXTRACTORS]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    avg_kb = sum(len(html) for html, _ in corpus) / len(corpus) / 1024
+    print(f"{len(corpus)} pages, {avg_kb:.0f} KB average")
+    print(f"{'extractor':<11}{'pages/s':>9}{'MB/s':>8}{'out chars':>11}{'out/in':>8}{'recall':>8}{'leak':>7}")
+    for row in results:
+        print(f"{row['extractor']:<11}{row['pages_per_s']:>9}{row['input_mb_per_s']:>8}"
+              f"{row['avg_output_chars']:>11}{row['output_ratio']:>8}"
+              f"{row.get('content_recall', '-'):>8}{row.get('boilerplate_leak', '-'):>7}")
+
+
+if __name__ == "__main__":
+    main()
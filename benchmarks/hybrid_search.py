@@ -0,0 +1,153 @@
+"""
+Retrieval recall and latency of vector, lexical (BM25) and hybrid search.
+
+Generates a product catalog where every chunk is one product with a SKU
+("KT-4821"), a name and a description, plus two kinds of questions: by SKU
+("Do you have KT-4821 in stock?") and by description. Chunks and questions
+are embedded with a local stand-in embedder (hashed bag of words) that,
+like real embedding models, blurs exact codes: it ignores digits, so all
+"KT-...." SKUs look alike. No API calls.
+
+For each RAG_SEARCH_MODE it reports recall@k per question kind, search
+latency, and how many questions the lexical fast path answers without an
+embeddings call.
+
+Usage:
+    python -m benchmarks.hybrid_search --products 5000 --queries 300
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+import numpy as np
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from app.core.config import settings
+from app.rag import rag_manager, SEARCH_MODES
+from app.store_residency import store_residency
+from app.vector_store import VectorStore
+
+PREFIXES = ["KT", "BL", "TS", "CM", "FR", "MX", "VC", "HD"]
+NOUNS = "kettle blender toaster coffee-maker fryer mixer vacuum heater fan lamp grill juicer".split()
+ADJECTIVES = "compact cordless stainless quiet portable smart vintage heavy-duty slim premium matte glass".split()
+USES = "camping offices dorms families travel cafes bakeries studios boats cabins".split()
+COLORS = "red blue black white green silver copper cream".split()
+
+
+def make_catalog(products: int, seed: int):
+    r = random.Random(seed)
+    chunks, skus = [], []
+    for i in range(products):
+        sku = f"{r.choice(PREFIXES)}-{1000 + i}"
+        adjectives = r.sample(ADJECTIVES, 2)
+        name = f"{adjectives[0].title()} {r.choice(COLORS)} {r.choice(NOUNS)}"
+        chunks.append(
+            f"SKU {sku}: {name}. A {adjectives[1]} model for {r.choice(USES)}, "
+            f"{r.randint(1, 3)} year warranty, ${r.randint(19, 499)}."
+        )
+        skus.append(sku)
+    return chunks, skus
+
+
+def make_queries(chunks, skus, count: int, seed: int):
+    r = random.Random(seed + 1)
+    queries = []
+    for i in r.sample(range(len(chunks)), min(count, len(chunks))):
+        queries.append(("sku", f"Do you have {skus[i]} in stock?", i))
+        # Description words, in another order, without the SKU
+        words = [w for w in re.findall(r"[a-z-]+", chunks[i].lower().split(":", 1)[1]) if len(w) > 3]
+        queries.append(("description", f"I need a {' '.join(r.sample(words, min(4, len(words))))}", i))
+    return queries
+
+
+def embed(texts, dim: int = 256) -> np.ndarray:
+    """Hashed bag of words, digits ignored."""
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in re.findall(r"[a-z]+", text.lower()):
+            digest = hashlib.blake2b(word.encode(), digest_size=8).digest()
+            vectors[row, int.from_bytes(digest[:4], "little") % dim] += 1.0 if digest[4] & 1 else -1.0
+    return vectors
+
+
+async def run(args) -> dict:
+    chunks, skus = make_catalog(args.products, args.seed)
+    queries = make_queries(chunks, skus, args.queries, args.seed)
+    settings.VECTOR_STORE_PERSIST = False
+
+    store = VectorStore()
+    store.add(embed(chunks), chunks, [{"source": "catalog"} for _ in chunks])
+    start = time.perf_counter()
+    store.update_lexical_index()
+    build_s = time.perf_counter() - start
+    store_residency.put("bench-hybrid", store)
+
+    embed_calls = 0
+
+    async def embed_query(text):
+        nonlocal embed_calls
+        embed_calls += 1
+        return embed([text])[0].tolist()
+
+    rag_manager.embed_query = embed_query
+    k = max(args.k)
+    results = []
+    modes = [(mode, False) for mode in SEARCH_MODES] + [("hybrid", True)]
+    for mode, fast_path in modes:
+        settings.RAG_SEARCH_MODE = mode
+        settings.RAG_LEXICAL_FAST_PATH = fast_path
+        embed_calls = 0
+        hits = {(kind, kk): 0 for kind in ("sku", "description") for kk in args.k}
+        latencies = []
+        for kind, question, target in queries:
+            begin = time.perf_counter()
+            found = await rag_manager.retrieve("bench-hybrid", question, k)
+            latencies.append((time.perf_counter() - begin) * 1000)
+            texts = [res["text"] for res in found]
+            for kk in args.k:
+                hits[(kind, kk)] += chunks[target] in texts[:kk]
+
+        per_kind = len(queries) // 2
+        results.append({
+            "mode": mode + (" + fast path" if fast_path else ""),
+            **{f"{kind}_recall@{kk}": round(hits[(kind, kk)] / per_kind, 4) for kind, kk in hits},
+            "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+            "embedding_calls": embed_calls
+        })
+    return {"products": len(chunks), "queries": len(queries), "lexical_build_s": round(build_s, 3), "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=300, help="Products asked about (two questions each)")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 5])
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{report['products']} products, {report['queries']} questions, "
+          f"lexical index built in {report['lexical_build_s']}s")
+    header = f"{'mode':<22}" + "".join(f"{f'sku R@{k}':>10}" for k in args.k)
+    header += "".join(f"{f'desc R@{k}':>11}" for k in args.k) + f"{'p50 ms':>9}{'p95 ms':>9}{'embeds':>8}"
+    print(header)
+    for row in report["results"]:
+        line = f"{row['mode']:<22}" + "".join(f"{row[f'sku_recall@{k}']:>10}" for k in args.k)
+        line += "".join(f"{row[f'description_recall@{k}']:>11}" for k in args.k)
+        line += f"{row['p50_ms']:>9}{row['p95_ms']:>9}{row['embedding_calls']:>8}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Local stand-in for the OpenAI embeddings and chat completions APIs, for
+load tests.
+
+Serves POST /v1/embeddings with deterministic vectors (picked by a hash of
+the input text) after a simulated latency of --latency-ms per request plus
+--per-input-ms per input, and POST /v1/chat/completions (plain or streamed)
+with a canned answer after --chat-latency-ms. With --rpm each endpoint
+answers 429 with Retry-After beyond that many requests per minute,
+enforced over whole seconds like the real limiter (600 RPM = 10 per second).
+GET /stats returns request counters.
+
+Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1.
+Benchmarks start it in-process via MockOpenAI.
+
+Usage:
+    python -m benchmarks.mock_openai --port 8100 --latency-ms 40 --rpm 3000
+"""
+import argparse
+import base64
+import hashlib
+import json
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+# Distinct vectors the mock hands out
+VECTOR_POOL = 1024
+ENDPOINTS = ("embeddings", "chat")
+CHAT_ANSWER = "Thanks for asking! We are open from 9am to 6pm, Monday to Saturday."
+
+
+class MockOpenAI:
+    def __init__(
+        self,
+        port: int = 0,
+        latency_ms: float = 40.0,
+        per_input_ms: float = 0.05,
+        dim: int = 1536,
+        rpm: int = 0,
+        chat_latency_ms: float = 300.0
+    ):
+        self.latency = latency_ms / 1000
+        self.per_input = per_input_ms / 1000
+        self.chat_latency = chat_latency_ms / 1000
+        self.dim = dim
+        self.rpm = rpm
+        self.counts = {endpoint: {"requests": 0, "inputs": 0, "rate_limited": 0} for endpoint in ENDPOINTS}
+        # [second, requests] of the current rate-limit window per endpoint
+        self._windows = {endpoint: [0, 0] for endpoint in ENDPOINTS}
+        vectors = np.random.default_rng(0).standard_normal((VECTOR_POOL, dim)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        self._pool = {
+            "float": [json.dumps(vector.round(6).tolist()) for vector in vectors],
+            # The openai SDK asks for base64 float32 whenever numpy is installed
+            "base64": [json.dumps(base64.b64encode(vector.tobytes()).decode("ascii")) for vector in vectors]
+        }
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def start(self) -> "MockOpenAI":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    @property
+    def requests(self) -> int:
+        return sum(counts["requests"] for counts in self.counts.values())
+
+    @property
+    def rate_limited(self) -> int:
+        return sum(counts["rate_limited"] for counts in self.counts.values())
+
+    def reset(self):
+        with self._lock:
+            for endpoint in ENDPOINTS:
+                self.counts[endpoint] = {"requests": 0, "inputs": 0, "rate_limited": 0}
+                self._windows[endpoint] = [0, 0]
+
+    def stats(self) -> dict:
+        return {endpoint: dict(counts) for endpoint, counts in self.counts.items()}
+
+    def _admit(self, endpoint: str) -> float:
+        """0 if the request may proceed, else seconds until it would."""
+        with self._lock:
+            now = time.monotonic()
+            if self.rpm:
+                # Quantized like the real limiter: a fresh allowance each whole second
+                second = int(now)
+                if self._windows[endpoint][0] != second:
+                    self._windows[endpoint] = [second, 0]
+                if self._windows[endpoint][1] >= max(1, self.rpm // 60):
+                    self.counts[endpoint]["rate_limited"] += 1
+                    return second + 1 - now
+                self._windows[endpoint][1] += 1
+            self.counts[endpoint]["requests"] += 1
+            return 0.0
+
+    def _embedding_json(self, text: str, encoding: str) -> str:
+        # The mock must not be the bottleneck: vectors come pre-serialized
+        # from a fixed pool, picked by a hash of the text
+        pool = self._pool["base64" if encoding == "base64" else "float"]
+        digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+        return pool[int.from_bytes(digest, "little") % len(pool)]
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                if self.path.rstrip("/").endswith("/stats"):
+                    return self._json(200, mock.stats())
+                self._json(404, {"error": {"message": "Not found"}})
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                path = self.path.rstrip("/")
+                endpoint = "embeddings" if path.endswith("/embeddings") else "chat" if path.endswith("/chat/completions") else None
+                if endpoint is None:
+                    return self._json(404, {"error": {"message": "Not found"}})
+                retry_after = mock._admit(endpoint)
+                if retry_after:
+                    return self._json(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                                      {"Retry-After": str(math.ceil(retry_after)),
+                                       "retry-after-ms": str(math.ceil(retry_after * 1000))})
+                if endpoint == "chat":
+                    return self._chat(body)
+
+                inputs = body.get("input", [])
+                inputs = [inputs] if isinstance(inputs, str) else inputs
+                with mock._lock:
+                    mock.counts["embeddings"]["inputs"] += len(inputs)
+                time.sleep(mock.latency + mock.per_input * len(inputs))
+                tokens = sum(len(text) // 4 for text in inputs)
+                encoding = body.get("encoding_format", "float")
+                data = ",".join(
+                    f'{{"object":"embedding","index":{i},"embedding":{mock._embedding_json(text, encoding)}}}'
+                    for i, text in enumerate(inputs)
+                )
+                self._json(200, (
+                    f'{{"object":"list","data":[{data}],"model":{json.dumps(body.get("model", "text-embedding-3-small"))},'
+                    f'"usage":{{"prompt_tokens":{tokens},"total_tokens":{tokens}}}}}'
+                ))
+
+            def _chat(self, body: dict):
+                with mock._lock:
+                    mock.counts["chat"]["inputs"] += len(body.get("messages", []))
+                time.sleep(mock.chat_latency)
+                model = body.get("model", "gpt-4o")
+                prompt_tokens = sum(len(str(m.get("content", ""))) // 4 for m in body.get("messages", []))
+                usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(CHAT_ANSWER) // 4,
+                         "total_tokens": prompt_tokens + len(CHAT_ANSWER) // 4}
+                if not body.get("stream"):
+                    return self._json(200, {
+                        "id": "chatcmpl-mock", "object": "chat.completion", "created": 0, "model": model,
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": CHAT_ANSWER}}],
+                        "usage": usage
+                    })
+
+                # Server-sent events, one word per chunk
+                events = []
+                for word in CHAT_ANSWER.split(" "):
+                    chunk = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": 0, "model": model,
+                             "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]}
+                    events.append(f"data: {json.dumps(chunk)}\n\n")
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    chunk = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": 0, "model": model,
+                             "choices": [], "usage": usage}
+                    events.append(f"data: {json.dumps(chunk)}\n\n")
+                events.append("data: [DONE]\n\n")
+                self._json(200, "".join(events), content_type="text/event-stream")
+
+            def _json(self, status: int, payload, headers: dict = None, content_type: str = "application/json"):
+                data = (payload if isinstance(payload, str) else json.dumps(payload)).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=40.0)
+    parser.add_argument("--per-input-ms", type=float, default=0.05)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--rpm", type=int, default=0, help="Requests per minute per endpoint before 429s (0 = unlimited)")
+    parser.add_argument("--chat-latency-ms", type=float, default=300.0)
+    args = parser.parse_args()
+
+    mock = MockOpenAI(args.port, args.latency_ms, args.per_input_ms, args.dim, args.rpm, args.chat_latency_ms).start()
+    print(f"Mock OpenAI listening on {mock.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        mock.stop()
+
+
+if __name__ == "__main__":
+    main()
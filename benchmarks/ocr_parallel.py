@@ -0,0 +1,78 @@
+"""
+Serial vs process-pool OCR on a generated scanned PDF.
+
+Renders N pages of text to images, saves them as an image-only PDF (no text
+layer, like a scanner produces) and runs OCRProcessor.process_scanned_pdf
+with OCR_PARALLEL off and on. Requires the tesseract binary.
+
+Usage:
+    python -m benchmarks.ocr_parallel --pages 24
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from PIL import Image, ImageDraw
+from app.core.config import settings
+from app.utils.ocr import ocr_processor
+
+
+def make_scanned_pdf(path: str, pages: int):
+    images = []
+    for page in range(pages):
+        image = Image.new("L", (1240, 1754), color=255)  # A4 at 150 dpi
+        draw = ImageDraw.Draw(image)
+        for line in range(40):
+            draw.text((80, 80 + line * 40), f"Page {page + 1} line {line + 1}: opening hours are 9am to 5pm.", fill=0)
+        images.append(image.convert("RGB"))
+    images[0].save(path, save_all=True, append_images=images[1:], resolution=150)
+
+
+def run_mode(path: str, parallel: bool) -> dict:
+    settings.OCR_PARALLEL = parallel
+    if parallel:
+        # Warm up the pool so process start-up is not billed to the run
+        ocr_processor._get_executor().submit(int).result()
+
+    start = time.perf_counter()
+    text = ocr_processor.process_scanned_pdf(path)
+    elapsed = time.perf_counter() - start
+    return {"mode": "parallel" if parallel else "serial", "seconds": round(elapsed, 3), "chars": len(text)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=24)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "scanned.pdf")
+        make_scanned_pdf(path, args.pages)
+        results = [run_mode(path, parallel=False), run_mode(path, parallel=True)]
+    ocr_processor.shutdown()
+
+    serial, parallel = results
+    speedup = serial["seconds"] / parallel["seconds"] if parallel["seconds"] else 0.0
+    report = {
+        "pages": args.pages,
+        "workers": ocr_processor._workers,
+        "results": results,
+        "speedup": round(speedup, 2),
+        "pages_per_s": {r["mode"]: round(args.pages / r["seconds"], 2) for r in results}
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    for r in results:
+        print(f"{r['mode']:<10}{r['seconds']:>8}s {report['pages_per_s'][r['mode']]:>8} pages/s {r['chars']:>8} chars")
+    print(f"speedup: {report['speedup']}x with {report['workers']} workers")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Chat latency during bulk ingestion, against a rate-limited mock OpenAI API.
+
+Several documents are embedded through RAGManager.embed_batch (the bulk
+lane) while chat questions arrive at a steady pace, each embedding its
+query and generating an answer (the interactive lane). The mock enforces
+--rpm per endpoint over one-second windows and answers 429 with
+Retry-After beyond it. Runs three configurations of the shared scheduler:
+
+- blind: no client-side limits; calls go out until the API pushes back
+- limits: OPENAI_EMBEDDING_RPM/OPENAI_CHAT_RPM set to the mock's limit,
+  bulk may use all of it (OPENAI_BULK_SHARE=1.0)
+- reserved: the same limits, with --bulk-share of them for ingestion
+
+Reports chat latency, failed chats, 429s and retries per lane, and
+ingestion throughput. The embedding cache is disabled so every text
+reaches the API.
+
+Usage:
+    python -m benchmarks.openai_scheduler --docs 4 --chunks 1500 --chats 60 --rpm 600
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+import numpy as np
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+# Every text must reach the API
+os.environ["EMBEDDING_CACHE_SIZE"] = "0"
+os.environ["EMBEDDING_CACHE_REDIS"] = "false"
+
+from app.core.config import settings
+from app.llm.openai import OpenAILLM, FALLBACK_MESSAGES
+from app.llm.scheduler import openai_scheduler
+from app.rag import rag_manager
+from benchmarks.mock_openai import MockOpenAI
+
+
+async def run_mode(mock: MockOpenAI, args, rpm: int, bulk_share: float) -> dict:
+    settings.OPENAI_EMBEDDING_RPM = settings.OPENAI_CHAT_RPM = rpm
+    settings.OPENAI_BULK_SHARE = bulk_share
+    # Limiters and the client are recreated on this event loop; lane counters carry on
+    before = openai_scheduler.stats()
+    mock.reset()
+    llm = OpenAILLM()
+    latencies, failed_chats = [], 0
+    embedded = 0
+
+    async def ingest(doc: int):
+        nonlocal embedded
+        texts = [f"rpm {rpm} share {bulk_share} doc {doc} chunk {i}: product details" for i in range(args.chunks)]
+        vectors = await rag_manager.embed_batch(texts)
+        embedded += sum(1 for vector in vectors if vector)
+
+    async def chat(n: int):
+        nonlocal failed_chats
+        await asyncio.sleep(n * args.chat_interval_ms / 1000)
+        start = time.perf_counter()
+        vector = await rag_manager.embed_query(f"rpm {rpm} share {bulk_share} question {n}: do you deliver?")
+        answer = await llm.generate_response("Do you deliver?", context="We deliver within 10 km.") if vector else ""
+        latencies.append(time.perf_counter() - start)
+        failed_chats += not vector or answer in FALLBACK_MESSAGES
+
+    start = time.perf_counter()
+    ingestion = asyncio.gather(*(ingest(d) for d in range(args.docs)))
+    await asyncio.gather(*(chat(n) for n in range(args.chats)))
+    chats_done = time.perf_counter() - start
+    await ingestion
+    elapsed = time.perf_counter() - start
+
+    stats = openai_scheduler.stats()
+    await openai_scheduler.close()
+    return {
+        "mode": "blind" if not rpm else f"bulk share {bulk_share}",
+        "chats": args.chats,
+        "chat_p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 1),
+        "chat_p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 1),
+        "chat_max_ms": round(max(latencies) * 1000, 1),
+        "failed_chats": failed_chats,
+        "chats_s": round(chats_done, 2),
+        "chunks": args.docs * args.chunks,
+        "failed_chunks": args.docs * args.chunks - embedded,
+        "chunks_per_s": round(embedded / elapsed, 1),
+        "rate_limited": mock.rate_limited,
+        "interactive_retries": stats["interactive"]["retries"] - before["interactive"]["retries"],
+        "bulk_retries": stats["bulk"]["retries"] - before["bulk"]["retries"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=4, help="Documents ingested at once")
+    parser.add_argument("--chunks", type=int, default=1500, help="Chunks per document")
+    parser.add_argument("--batch-size", type=int, default=16, help="EMBEDDING_BATCH_SIZE")
+    parser.add_argument("--chats", type=int, default=60)
+    parser.add_argument("--chat-interval-ms", type=float, default=250.0, help="Time between chat arrivals")
+    parser.add_argument("--rpm", type=int, default=600, help="Mock API limit per endpoint")
+    parser.add_argument("--bulk-share", type=float, default=0.8)
+    parser.add_argument("--latency-ms", type=float, default=40.0, help="Mock embeddings latency")
+    parser.add_argument("--chat-latency-ms", type=float, default=300.0, help="Mock chat completion latency")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    settings.EMBEDDING_BATCH_SIZE = args.batch_size
+    # Each chat embeds its own query, as on a quiet worker
+    settings.EMBEDDING_QUERY_BATCH_WAIT_MS = 0
+    rag_manager.query_batcher.max_wait = 0
+    # Retries and rate-limited calls are counted in the table rather than logged
+    for name in ("app.rag", "app.llm.openai", "app.llm.scheduler", "httpx", "httpx2"):
+        logging.getLogger(name).setLevel(logging.CRITICAL)
+
+    mock = MockOpenAI(latency_ms=args.latency_ms, rpm=args.rpm, chat_latency_ms=args.chat_latency_ms).start()
+    settings.OPENAI_BASE_URL = mock.url
+    modes = [(0, 1.0), (args.rpm, 1.0), (args.rpm, args.bulk_share)]
+    try:
+        results = [asyncio.run(run_mode(mock, args, rpm, share)) for rpm, share in modes]
+    finally:
+        mock.stop()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.docs} docs x {args.chunks} chunks (batches of {args.batch_size}) with {args.chats} chats, "
+          f"mock limit {args.rpm} RPM per endpoint, max {settings.OPENAI_MAX_RETRIES} retries")
+    print(f"{'mode':<16}{'chat p50':>9}{'p95':>8}{'max':>8}{'failed':>8}{'chunks/s':>10}{'failed':>8}"
+          f"{'429s':>6}{'retries i/b':>13}")
+    for row in results:
+        print(f"{row['mode']:<16}{row['chat_p50_ms']:>9}{row['chat_p95_ms']:>8}{row['chat_max_ms']:>8}"
+              f"{row['failed_chats']:>8}{row['chunks_per_s']:>10}{row['failed_chunks']:>8}{row['rate_limited']:>6}"
+              f"{str(row['interactive_retries']) + '/' + str(row['bulk_retries']):>13}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Load test for chat memory: sync MemoryManager vs AsyncMemoryManager.
+
+Simulates N concurrent chat sessions on one event loop. Each turn reads the
+history and appends a user and an assistant message, which is what /chat
+does per request. Besides throughput and per-turn latency it reports the
+worst event-loop stall, i.e. how long every other in-flight request was
+frozen while Redis was being waited on.
+
+Requires a local redis-server (REDIS_HOST/REDIS_PORT from the environment).
+
+Usage:
+    python -m benchmarks.redis_memory_load --sessions 200 --turns 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import numpy as np
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from app.core.redis_client import async_redis_client, get_redis
+from app.memory import MemoryManager, AsyncMemoryManager
+
+
+async def sync_turn(business_id: str, session_id: str, message: str):
+    memory = MemoryManager(business_id, session_id)
+    memory.get_history()
+    memory.add_message("user", message)
+    memory.add_message("assistant", message)
+
+
+async def async_turn(business_id: str, session_id: str, message: str):
+    memory = AsyncMemoryManager(business_id, session_id)
+    await memory.get_history()
+    await memory.add_message("user", message)
+    await memory.add_message("assistant", message)
+
+
+async def watch_loop(stop: asyncio.Event, interval: float = 0.001) -> float:
+    """Return the longest time the loop failed to wake a 1ms timer."""
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+
+async def run_mode(mode: str, sessions: int, turns: int, message: str) -> dict:
+    turn = sync_turn if mode == "sync" else async_turn
+    latencies = []
+
+    async def session(i: int):
+        for _ in range(turns):
+            start = time.perf_counter()
+            await turn("bench", f"{mode}-{i}", message)
+            latencies.append(time.perf_counter() - start)
+
+    stop = asyncio.Event()
+    watcher = asyncio.create_task(watch_loop(stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(session(i) for i in range(sessions)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    max_stall = await watcher
+
+    return {
+        "mode": mode,
+        "sessions": sessions,
+        "turns": sessions * turns,
+        "turns_per_s": round(sessions * turns / elapsed, 1),
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 2),
+        "p99_ms": round(float(np.percentile(latencies, 99)) * 1000, 2),
+        "max_loop_stall_ms": round(max_stall * 1000, 2)
+    }
+
+
+async def main_async(args) -> list:
+    message = "x" * args.message_bytes
+    results = []
+    for mode in ("sync", "async"):
+        results.append(await run_mode(mode, args.sessions, args.turns, message))
+
+    # Leave the Redis instance as we found it
+    sync_redis = get_redis()
+    keys = [f"memory:bench:{mode}-{i}" for mode in ("sync", "async") for i in range(args.sessions)]
+    sync_redis.delete(*keys)
+    await async_redis_client.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=200, help="Concurrent chat sessions")
+    parser.add_argument("--turns", type=int, default=20, help="Turns per session")
+    parser.add_argument("--message-bytes", type=int, default=400)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'mode':<8}{'turns/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'max stall ms':>14}")
+    for row in results:
+        print(f"{row['mode']:<8}{row['turns_per_s']:>10}{row['p50_ms']:>10}{row['p99_ms']:>10}"
+              f"{row['max_loop_stall_ms']:>14}")
+
+
+if __name__ == "__main__":
+    main()
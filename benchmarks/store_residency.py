@@ -0,0 +1,117 @@
+"""
+Memory and latency of vector-store residency under a per-worker budget.
+
+Creates many small persistent tenant stores, then replays chat searches
+whose tenants follow a Zipf distribution (a few busy businesses, a long
+tail of quiet ones), in concurrent bursts, once per
+VECTOR_STORE_MEMORY_BUDGET_MB value. Reports resident memory, the share of
+searches served by an already open store, loads (single-flight, so a burst
+to a cold tenant loads it once), evictions, load time and search latency.
+
+Usage:
+    python -m benchmarks.store_residency --tenants 100 --chunks 1000 --searches 2000 --budgets 0 32 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ["VECTOR_STORE_DIR"] = tempfile.mkdtemp(prefix="bench-residency-")
+os.environ["VECTOR_STORE_PERSIST"] = "true"
+
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.store_residency import StoreResidency
+
+WORDS = "kettle blender toaster warranty delivery refund opening hours parking booking menu vegan gift card".split()
+
+
+def make_tenants(args):
+    rng = np.random.default_rng(args.seed)
+    loader = StoreResidency(budget_mb=0)
+    for t in range(args.tenants):
+        store = loader.get(f"tenant-{t}", create=True)
+        vectors = rng.standard_normal((args.chunks, args.dim), dtype=np.float32)
+        texts = [" ".join(rng.choice(WORDS, 12)) + f" item {t}-{i}" for i in range(args.chunks)]
+        store.add(vectors, texts, [{"source": "catalog"} for _ in texts])
+        loader.evict(f"tenant-{t}")
+
+
+async def run_budget(args, budget_mb: int) -> dict:
+    rng = np.random.default_rng(args.seed + 1)
+    residency = StoreResidency(budget_mb=budget_mb)
+    tenants = np.minimum(rng.zipf(args.zipf, args.searches), args.tenants) - 1
+    query = rng.standard_normal(args.dim, dtype=np.float32)
+    latencies, peak = [], 0
+
+    async def chat(tenant: int):
+        start = time.perf_counter()
+        store = await residency.aget(f"tenant-{tenant}")
+        await run_in_threadpool(store.search, query, 5)
+        if settings.RAG_SEARCH_MODE.lower() != "vector":
+            await run_in_threadpool(store.lexical_search, "kettle warranty", 5)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    for offset in range(0, len(tenants), args.concurrency):
+        await asyncio.gather(*(chat(int(t)) for t in tenants[offset:offset + args.concurrency]))
+        peak = max(peak, residency.resident_bytes)
+    elapsed = time.perf_counter() - start
+
+    stats = residency.stats()
+    return {
+        "budget_mb": budget_mb,
+        "searches": len(tenants),
+        "distinct_tenants": int(len(np.unique(tenants))),
+        "peak_resident_mb": round(peak / 1e6, 1),
+        "hit_rate": round(stats["hits"] / len(tenants), 4),
+        "loads": stats["loads"],
+        "coalesced_loads": stats["coalesced_loads"],
+        "evictions": stats["evictions"],
+        "avg_load_ms": stats["avg_load_ms"],
+        "searches_per_s": round(len(tenants) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tenants", type=int, default=100)
+    parser.add_argument("--chunks", type=int, default=1000, help="Chunks per tenant")
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--searches", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32, help="Searches per burst")
+    parser.add_argument("--zipf", type=float, default=1.3, help="Zipf exponent of tenant popularity")
+    parser.add_argument("--budgets", type=int, nargs="+", default=[0, 32, 8], help="Budgets in MB (0 = unlimited)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    try:
+        make_tenants(args)
+        results = [asyncio.run(run_budget(args, budget)) for budget in args.budgets]
+    finally:
+        shutil.rmtree(settings.VECTOR_STORE_DIR, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.tenants} tenants x {args.chunks} chunks, {args.searches} searches (zipf {args.zipf}), "
+          f"RAG_SEARCH_MODE={settings.RAG_SEARCH_MODE}")
+    print(f"{'budget MB':>10}{'peak MB':>9}{'tenants':>9}{'hit rate':>10}{'loads':>7}{'coalesced':>11}"
+          f"{'evicted':>9}{'load ms':>9}{'q/s':>8}{'p50 ms':>9}{'p99 ms':>9}")
+    for row in results:
+        print(f"{row['budget_mb'] or 'none':>10}{row['peak_resident_mb']:>9}{row['distinct_tenants']:>9}"
+              f"{row['hit_rate']:>10}{row['loads']:>7}{row['coalesced_loads']:>11}{row['evictions']:>9}"
+              f"{row['avg_load_ms']:>9}{row['searches_per_s']:>8}{row['p50_ms']:>9}{row['p99_ms']:>9}")
+
+
+if __name__ == "__main__":
+    main()
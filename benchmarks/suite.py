@@ -0,0 +1,335 @@
+"""
+Offline end-to-end benchmark suite: no API key, no Redis server needed.
+
+OpenAI is replaced by the local mock (benchmarks.mock_openai: embeddings
+and chat completions with fixed latency, deterministic vectors); Redis is
+a local redis-server when one answers at REDIS_HOST:REDIS_PORT, else an
+in-process fakeredis (`pip install fakeredis`). The app runs in-process
+and is called through its ASGI interface. Scenarios:
+
+- chat: /chat requests/s, p50 and p99 for N concurrent sessions of
+  consecutive turns, with the average time of each pipeline stage
+- ingest: seconds, chunks/s and KB/s of ingesting documents of several sizes
+- search: RAGManager._search_store latency against corpus size
+- ocr: scanned-PDF pages per second (needs the tesseract binary; skipped otherwise)
+
+--output writes the results with run metadata (commit, settings, mock
+latencies) as JSON; --compare prints the change of every number against
+such a file.
+
+Usage:
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --scenarios chat search --compare results.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+from typing import Dict, List
+import numpy as np
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ["VECTOR_STORE_DIR"] = tempfile.mkdtemp(prefix="bench-suite-")
+
+import httpx
+from app.core.config import settings
+from app.core.redis_client import redis_client, async_redis_client, async_redis_binary_client
+from app.metrics import metrics
+from app.rag import rag_manager
+from app.store_residency import store_residency
+from benchmarks.mock_openai import MockOpenAI
+
+SCENARIOS = ("chat", "ingest", "search", "ocr")
+# Row field identifying a row when comparing runs
+ROW_KEYS = {"chat": "sessions", "ingest": "doc_kb", "search": "vectors", "ocr": "pages"}
+CHAT_STAGES = ("history_read", "query_embedding", "lexical_search", "vector_search", "llm", "history_write", "total")
+TOPICS = ("opening hours", "delivery", "refunds", "warranty", "gift cards", "parking", "vegan options", "booking")
+WORDS = ("kettle blender toaster warranty delivery refund opening hours parking booking menu vegan gift card "
+         "order store online price discount member return exchange size colour stock pickup").split()
+
+
+def use_redis(mode: str) -> str:
+    """Point the app's Redis clients at a local server or an in-process fake."""
+    if mode != "fake" and redis_client.is_alive():
+        return "local"
+    if mode == "local":
+        raise SystemExit(f"No redis-server at {settings.REDIS_HOST}:{settings.REDIS_PORT}")
+    try:
+        import fakeredis
+    except ImportError:
+        raise SystemExit("No redis-server reachable and fakeredis is not installed (pip install fakeredis)")
+
+    server = fakeredis.FakeServer()
+    redis_client.get_connection = lambda: fakeredis.FakeRedis(server=server, decode_responses=True)
+    async_redis_client.get_connection = lambda: fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+    async_redis_binary_client.get_connection = lambda: fakeredis.FakeAsyncRedis(server=server)
+    return "fake"
+
+
+def make_document(kb: int, seed: int) -> str:
+    """About `kb` KB of catalog-like paragraphs."""
+    rng = np.random.default_rng(seed)
+    paragraphs, size, n = [], 0, 0
+    while size < kb * 1024:
+        sentences = [" ".join(rng.choice(WORDS, 12)).capitalize() + f" item {seed}-{n}-{i}." for i in range(5)]
+        paragraphs.append(" ".join(sentences))
+        size += len(paragraphs[-1]) + 2
+        n += 1
+    return "\n\n".join(paragraphs)
+
+
+def percentile_ms(values: List[float], q: float) -> float:
+    return round(float(np.percentile(values, q)) * 1000, 2) if values else 0.0
+
+
+async def run_chat(args) -> List[Dict]:
+    from app.main import app
+
+    await rag_manager.ingest_document("bench-chat", make_document(args.chat_kb, seed=1), "catalog")
+    rows = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        for sessions in args.sessions:
+            latencies, errors = [], 0
+            before = metrics.stage_totals()
+
+            async def session(s: int):
+                nonlocal errors
+                for turn in range(args.turns):
+                    message = f"[{sessions}/{s}/{turn}] What about {TOPICS[(s + turn) % len(TOPICS)]}?"
+                    start = time.perf_counter()
+                    response = await client.post("/chat", json={
+                        "business_id": "bench-chat", "session_id": f"bench-{sessions}-{s}", "message": message
+                    })
+                    latencies.append(time.perf_counter() - start)
+                    errors += response.status_code != 200
+
+            start = time.perf_counter()
+            await asyncio.gather(*(session(s) for s in range(sessions)))
+            elapsed = time.perf_counter() - start
+
+            after = metrics.stage_totals()
+            stages = {}
+            for stage in CHAT_STAGES:
+                count, seconds = after.get(("chat", stage), (0, 0.0))
+                count_before, seconds_before = before.get(("chat", stage), (0, 0.0))
+                if count > count_before:
+                    stages[f"{stage}_avg_ms"] = round((seconds - seconds_before) / (count - count_before) * 1000, 2)
+            rows.append({
+                "sessions": sessions,
+                "requests": len(latencies),
+                "requests_per_s": round(len(latencies) / elapsed, 1),
+                "p50_ms": percentile_ms(latencies, 50),
+                "p99_ms": percentile_ms(latencies, 99),
+                "errors": errors,
+                **stages
+            })
+    return rows
+
+
+async def run_ingest(args, mock: MockOpenAI) -> List[Dict]:
+    rows = []
+    for kb in args.doc_kb:
+        text = make_document(kb, seed=kb)
+        business_id = f"bench-ingest-{kb}"
+        requests_before = mock.counts["embeddings"]["requests"]
+        start = time.perf_counter()
+        await rag_manager.ingest_document(business_id, text, "document")
+        elapsed = time.perf_counter() - start
+        chunks = len(store_residency.get(business_id) or [])
+        rows.append({
+            "doc_kb": kb,
+            "chunks": chunks,
+            "seconds": round(elapsed, 3),
+            "chunks_per_s": round(chunks / elapsed, 1),
+            "kb_per_s": round(kb / elapsed, 1),
+            "embedding_requests": mock.counts["embeddings"]["requests"] - requests_before
+        })
+    return rows
+
+
+def run_search(args) -> List[Dict]:
+    rng = np.random.default_rng(args.seed)
+    rows = []
+    for size in args.corpus:
+        business_id = f"bench-search-{size}"
+        store = store_residency.get(business_id, create=True)
+        for offset in range(0, size, 4096):
+            count = min(4096, size - offset)
+            vectors = rng.standard_normal((count, args.dim), dtype=np.float32)
+            store.add(vectors, [f"chunk {offset + i}" for i in range(count)], [{"source": "corpus"}] * count)
+
+        queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32).tolist()
+        rag_manager._search_store(business_id, queries[0], args.top_k)  # Warm-up
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            rag_manager._search_store(business_id, query, args.top_k)
+            latencies.append(time.perf_counter() - start)
+        rows.append({
+            "vectors": size,
+            "dim": args.dim,
+            "index": f"{settings.VECTOR_DB_TYPE}/{settings.VECTOR_QUANTIZATION}",
+            "store_mb": round(store.nbytes / 1e6, 1),
+            "p50_ms": percentile_ms(latencies, 50),
+            "p99_ms": percentile_ms(latencies, 99),
+            "queries_per_s": round(len(latencies) / sum(latencies), 1)
+        })
+        store_residency.evict(business_id)
+    return rows
+
+
+def run_ocr(args) -> List[Dict]:
+    import pytesseract
+    from app.utils.ocr import ocr_processor
+    from benchmarks.ocr_parallel import make_scanned_pdf
+
+    try:
+        pytesseract.get_tesseract_version()
+    except Exception:
+        return [{"pages": args.pages, "skipped": "tesseract not found"}]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "scanned.pdf")
+        make_scanned_pdf(path, args.pages)
+        if settings.OCR_PARALLEL:
+            # Process start-up is not billed to the run
+            ocr_processor._get_executor().submit(int).result()
+        start = time.perf_counter()
+        text = ocr_processor.process_scanned_pdf(path)
+        elapsed = time.perf_counter() - start
+    ocr_processor.shutdown()
+    return [{
+        "pages": args.pages,
+        "parallel": settings.OCR_PARALLEL,
+        "seconds": round(elapsed, 3),
+        "pages_per_s": round(args.pages / elapsed, 2),
+        "chars": len(text)
+    }]
+
+
+async def run_suite(args, mock: MockOpenAI) -> Dict[str, List[Dict]]:
+    results = {}
+    if "ingest" in args.scenarios:
+        results["ingest"] = await run_ingest(args, mock)
+    if "chat" in args.scenarios:
+        results["chat"] = await run_chat(args)
+    if "search" in args.scenarios:
+        results["search"] = run_search(args)
+    if "ocr" in args.scenarios:
+        results["ocr"] = run_ocr(args)
+    return results
+
+
+def run_metadata(args, redis_mode: str) -> Dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10
+        ).stdout.strip()
+    except Exception:
+        commit = ""
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "machine": f"{platform.machine()}, {os.cpu_count()} CPUs",
+        "redis": redis_mode,
+        "mock": {
+            "embedding_latency_ms": args.latency_ms,
+            "per_input_ms": args.per_input_ms,
+            "chat_latency_ms": args.chat_latency_ms
+        },
+        "settings": {key: getattr(settings, key) for key in (
+            "RAG_SEARCH_MODE", "VECTOR_DB_TYPE", "VECTOR_QUANTIZATION", "VECTOR_STORE_PERSIST",
+            "CHUNK_STRATEGY", "EMBEDDING_BATCH_SIZE", "EMBEDDING_CONCURRENCY", "EMBEDDING_QUERY_BATCH_WAIT_MS",
+            "EMBEDDING_CACHE_SIZE", "OCR_PARALLEL"
+        )}
+    }
+
+
+def print_tables(results: Dict[str, List[Dict]]):
+    for scenario, rows in results.items():
+        print(f"\n{scenario}")
+        columns = list(dict.fromkeys(key for row in rows for key in row))
+        widths = [max(len(column), *(len(str(row.get(column, ""))) for row in rows)) + 2 for column in columns]
+        print("".join(f"{column:>{width}}" for column, width in zip(columns, widths)))
+        for row in rows:
+            print("".join(f"{str(row.get(column, '')):>{width}}" for column, width in zip(columns, widths)))
+
+
+def print_comparison(results: Dict[str, List[Dict]], baseline: Dict):
+    print(f"\nChange against {baseline['meta'].get('commit') or 'baseline'} ({baseline['meta'].get('timestamp', '')})")
+    print(f"{'scenario':<10}{'row':>10}{'metric':>28}{'baseline':>12}{'current':>12}{'change':>9}")
+    for scenario, rows in results.items():
+        key = ROW_KEYS[scenario]
+        previous = {row.get(key): row for row in baseline["results"].get(scenario, [])}
+        for row in rows:
+            old = previous.get(row.get(key))
+            if old is None:
+                continue
+            for metric, value in row.items():
+                before = old.get(metric)
+                if metric == key or isinstance(value, bool) or not isinstance(value, (int, float)) \
+                        or not isinstance(before, (int, float)):
+                    continue
+                change = f"{(value - before) / before * 100:+.1f}%" if before else ""
+                print(f"{scenario:<10}{row[key]:>10}{metric:>28}{before:>12}{value:>12}{change:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--redis", choices=("auto", "local", "fake"), default="auto")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 10, 50], help="Concurrent chat sessions")
+    parser.add_argument("--turns", type=int, default=5, help="Consecutive questions per session")
+    parser.add_argument("--chat-kb", type=int, default=50, help="Size of the chat scenario's knowledge base in KB")
+    parser.add_argument("--doc-kb", type=int, nargs="+", default=[10, 100, 1000], help="Ingested document sizes in KB")
+    parser.add_argument("--corpus", type=int, nargs="+", default=[1000, 10000, 50000], help="Vectors per searched store")
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--pages", type=int, default=8, help="Scanned PDF pages")
+    parser.add_argument("--latency-ms", type=float, default=40.0, help="Mock embeddings latency per request")
+    parser.add_argument("--per-input-ms", type=float, default=0.05, help="Mock embeddings latency per input")
+    parser.add_argument("--chat-latency-ms", type=float, default=300.0, help="Mock chat completion latency")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results and run metadata to this JSON file")
+    parser.add_argument("--compare", help="Results JSON of an earlier run to compare against")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    # Failures are counted in the results rather than logged one by one
+    logging.basicConfig(level=logging.WARNING)
+    redis_mode = use_redis(args.redis)
+    mock = MockOpenAI(
+        latency_ms=args.latency_ms, per_input_ms=args.per_input_ms, chat_latency_ms=args.chat_latency_ms
+    ).start()
+    settings.OPENAI_BASE_URL = mock.url
+    try:
+        results = asyncio.run(run_suite(args, mock))
+    finally:
+        mock.stop()
+        shutil.rmtree(settings.VECTOR_STORE_DIR, ignore_errors=True)
+
+    report = {"meta": run_metadata(args, redis_mode), "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"Redis: {redis_mode}, mock latency {args.latency_ms} ms (embeddings), {args.chat_latency_ms} ms (chat)")
+        print_tables(results)
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Recall-vs-latency report for the vector index backends.
+
+Builds every backend in app.vector_index over the same synthetic, clustered
+corpus and compares each one against the exact numpy index.
+
+Usage:
+    python -m benchmarks.vector_index_recall --vectors 100000 --dim 1536 --queries 200
+"""
+import argparse
+import json
+import os
+import time
+import numpy as np
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from app.core.config import settings
+from app.vector_index import INDEX_TYPES, create_index, faiss
+
+
+def make_corpus(n: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    # Clustered data behaves much more like real embeddings than uniform noise
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=n)
+    data = centers[labels] + 0.5 * rng.normal(size=(n, dim)).astype(np.float32)
+    return data / np.linalg.norm(data, axis=1, keepdims=True)
+
+
+def run(args) -> list:
+    settings.VECTOR_ANN_MIN_VECTORS = min(settings.VECTOR_ANN_MIN_VECTORS, args.vectors)
+    corpus = make_corpus(args.vectors + args.queries, args.dim, args.clusters)
+    data, queries = corpus[:args.vectors], corpus[args.vectors:]
+
+    backends = [t for t in INDEX_TYPES if not t.startswith("faiss") or faiss is not None]
+    truth = None
+    report = []
+
+    for index_type in backends:
+        index = create_index(args.dim, index_type)
+        start = time.perf_counter()
+        for offset in range(0, len(data), 4096):
+            index.add(data[offset:offset + 4096])
+        build_s = time.perf_counter() - start
+
+        latencies, results = [], []
+        for query in queries:
+            start = time.perf_counter()
+            _, ids = index.search(query, args.k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            results.append(set(ids.tolist()))
+
+        if truth is None:
+            truth = results  # numpy is first and exact
+        recall = np.mean([len(r & t) / max(1, len(t)) for r, t in zip(results, truth)])
+
+        report.append({
+            "backend": index_type,
+            "vectors": args.vectors,
+            "dim": args.dim,
+            "k": args.k,
+            "build_s": round(build_s, 3),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 4),
+            "p99_ms": round(float(np.percentile(latencies, 99)), 4),
+            f"recall@{args.k}": round(float(recall), 4),
+            "index_mb": round(index.nbytes / 1e6, 1)
+        })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--clusters", type=int, default=256)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    recall_key = f"recall@{args.k}"
+    print(f"{'backend':<12}{'build s':>10}{'p50 ms':>10}{'p99 ms':>10}{recall_key:>12}{'MB':>8}")
+    for row in report:
+        print(f"{row['backend']:<12}{row['build_s']:>10}{row['p50_ms']:>10}{row['p99_ms']:>10}"
+              f"{row[recall_key]:>12}{row['index_mb']:>8}")
+
+
+if __name__ == "__main__":
+    main()
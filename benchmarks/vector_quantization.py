@@ -0,0 +1,104 @@
+"""
+Memory, recall and latency of quantized vector storage.
+
+Writes a synthetic, clustered corpus to a persistent store once, then opens
+it with each VECTOR_QUANTIZATION mode (float32, float16, int8), with and
+without the exact re-rank from the memory-mapped float32 rows, and compares
+search results against the full-precision store. Bytes per vector and
+index memory show what each mode saves per tenant.
+
+Usage:
+    python -m benchmarks.vector_quantization --vectors 50000 --dim 1536 --queries 200
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from functools import partial
+import numpy as np
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from app.core.config import settings
+from app.vector_index import create_index
+from app.vector_store import PersistentVectorStore
+from benchmarks.vector_index_recall import make_corpus
+
+
+def run(args) -> list:
+    corpus = make_corpus(args.vectors + args.queries, args.dim, args.clusters)
+    data, queries = corpus[:args.vectors], corpus[args.vectors:]
+    path = tempfile.mkdtemp(prefix="bench-quantization-")
+    report = []
+    try:
+        store = PersistentVectorStore(path, partial(create_index, index_type="numpy", quantization="none"))
+        for offset in range(0, len(data), 4096):
+            batch = data[offset:offset + 4096]
+            store.add(batch, [str(offset + i) for i in range(len(batch))], [{} for _ in batch])
+
+        modes = [("none", 0)] + [(q, f) for q in ("float16", "int8") for f in sorted({0, args.rerank_factor})]
+        truth = None
+        for quantization, factor in modes:
+            settings.VECTOR_RERANK_FACTOR = factor
+            start = time.perf_counter()
+            # Opening maps the float32 file and quantizes it
+            store = PersistentVectorStore(path, partial(create_index, index_type="numpy", quantization=quantization))
+            open_s = time.perf_counter() - start
+
+            latencies, results = [], []
+            for query in queries:
+                start = time.perf_counter()
+                found = store.search(query, args.k)
+                latencies.append((time.perf_counter() - start) * 1000)
+                results.append({res["text"] for res in found})
+
+            if truth is None:
+                truth = results  # float32 is first and exact
+            recall = np.mean([len(r & t) / max(1, len(t)) for r, t in zip(results, truth)])
+            index = store.index
+            report.append({
+                "mode": quantization if quantization != "none" else "float32",
+                "rerank": f"{factor}x" if factor else "off",
+                "vectors": args.vectors,
+                "dim": args.dim,
+                "bytes_per_vector": getattr(index, "bytes_per_vector", args.dim * 4),
+                # The float32 index searches the shared memory map in place
+                "index_mb": round((index.nbytes if quantization != "none" else args.vectors * args.dim * 4) / 1e6, 1),
+                "open_s": round(open_s, 3),
+                "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+                "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+                f"recall@{args.k}": round(float(recall), 4)
+            })
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--clusters", type=int, default=256)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rerank-factor", type=int, default=4)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    recall_key = f"recall@{args.k}"
+    print(f"{args.vectors} vectors x {args.dim} dims")
+    print(f"{'mode':<9}{'rerank':>8}{'B/vector':>10}{'MB':>8}{'open s':>9}{'p50 ms':>9}{'p99 ms':>9}{recall_key:>12}")
+    for row in report:
+        print(f"{row['mode']:<9}{row['rerank']:>8}{row['bytes_per_vector']:>10}{row['index_mb']:>8}"
+              f"{row['open_s']:>9}{row['p50_ms']:>9}{row['p99_ms']:>9}{row[recall_key]:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+from app.vector_store import PersistentVectorStore
+
+
+def _add(store: PersistentVectorStore, start: int, count: int):
+    store.add(
+        [[1.0, float(i), 0.5] for i in range(start, start + count)],
+        [f"chunk {i}" for i in range(start, start + count)],
+        [{"source": "doc", "hash": str(i)} for i in range(start, start + count)]
+    )
+
+
+def test_last_row_readable_while_an_append_is_being_mapped(tmp_path):
+    reader = PersistentVectorStore(tmp_path)
+    _add(reader, 0, 3)
+    old_count = len(reader)
+
+    # Another worker appends; the reader maps it, but a concurrent search
+    # still holds the old row count (the window inside _map)
+    _add(PersistentVectorStore(tmp_path), 3, 2)
+    reader.refresh()
+    reader._count = old_count
+
+    assert reader._record(old_count - 1) == ("chunk 2", {"source": "doc", "hash": "2"})
+
+
+def test_appends_from_another_store_are_read_back(tmp_path):
+    reader = PersistentVectorStore(tmp_path)
+    _add(reader, 0, 2)
+    _add(PersistentVectorStore(tmp_path), 2, 2)
+    reader.refresh()
+
+    assert len(reader) == 4
+    assert [reader._record(i)[0] for i in range(4)] == [f"chunk {i}" for i in range(4)]